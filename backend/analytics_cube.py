@@ -0,0 +1,139 @@
+"""Precomputed city x blood_type x month x day_of_week demand cube.
+
+The training frame is reduced once to count and demand/supply/shortage
+sums per cell: every row gets one packed int64 cell key (one factorize
+per dimension) and np.bincount adds up each measure over those keys, so
+there is no groupby per chart. Any slice of the cube (filters on some
+dimensions, grouped by others) is a sum over a few thousand cells, and
+means are sums over counts, so they stay exact however cells are merged.
+
+The cube is saved as one compressed .npz next to the models, where
+app.py's model registry hot-reloads it like any other artifact. Its
+digest covers labels and cells, so every worker derives the same ETag
+for the same cube and query.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+CUBE_PATH = 'models/analytics_cube.npz'
+DIMENSIONS = ('city', 'blood_type', 'month', 'day_of_week')
+MEASURES = ('demand', 'supply', 'shortage')
+# Dimension names in query strings and JSON
+DIMENSION_KEYS = {'city': 'city', 'blood_type': 'bloodType', 'month': 'month', 'day_of_week': 'dayOfWeek'}
+
+class AnalyticsCube:
+    """Row counts and measure sums per (city, blood_type, month, day_of_week) cell"""
+
+    def __init__(self, labels, counts, sums):
+        self.labels = labels    # dimension -> cell labels along that axis
+        self.counts = counts
+        self.sums = sums        # measure -> array shaped like counts
+        self.lookup = {dimension: {str(label).lower(): i for i, label in enumerate(values)}
+                       for dimension, values in labels.items()}
+        self.digest = self.compute_digest()
+
+    @property
+    def nbytes(self):
+        return self.counts.nbytes + sum(array.nbytes for array in self.sums.values())
+
+    def compute_digest(self):
+        digest = hashlib.sha1(json.dumps(self.labels).encode())
+        for array in [self.counts] + [self.sums[measure] for measure in MEASURES]:
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()[:16]
+
+    @classmethod
+    def from_frame(cls, df):
+        """Aggregate every row of df into its cell in one pass"""
+        key = np.zeros(len(df), dtype=np.int64)
+        valid = np.ones(len(df), dtype=bool)
+        labels = {}
+        for dimension in DIMENSIONS:
+            codes, uniques = pd.factorize(df[dimension], sort=True)
+            valid &= codes >= 0
+            key = key * len(uniques) + codes
+            labels[dimension] = uniques.tolist()
+        shape = tuple(len(labels[dimension]) for dimension in DIMENSIONS)
+        size = int(np.prod(shape))
+        key = key[valid]
+
+        counts = np.bincount(key, minlength=size).reshape(shape)
+        sums = {}
+        for measure in MEASURES:
+            values = df[measure].to_numpy()[valid]
+            total = np.bincount(key, weights=values.astype(np.float64), minlength=size).reshape(shape)
+            # Integer measures sum exactly in float64 well past any realistic total
+            sums[measure] = np.rint(total).astype(np.int64) if np.issubdtype(values.dtype, np.integer) else total
+        return cls(labels, counts, sums)
+
+    def save(self, path=CUBE_PATH):
+        """Write the cube atomically as a compressed .npz"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        arrays = {f'sum_{measure}': self.sums[measure] for measure in MEASURES}
+        np.savez_compressed(tmp_path, labels=np.array(json.dumps(self.labels)), counts=self.counts, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=CUBE_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            labels = json.loads(str(data['labels']))
+            return cls(labels, data['counts'], {measure: data[f'sum_{measure}'] for measure in MEASURES})
+
+    def positions(self, dimension, values):
+        """Axis positions of labels (case-insensitive); unknown labels raise ValueError"""
+        lookup = self.lookup[dimension]
+        positions = []
+        for value in values:
+            position = lookup.get(str(value).strip().lower())
+            if position is None:
+                raise ValueError(f"Unknown {DIMENSION_KEYS[dimension]} {value!r}")
+            positions.append(position)
+        return sorted(set(positions))
+
+    def aggregate(self, by=(), filters=None):
+        """(labels per `by` dimension, counts, sums) over the cells the filters keep.
+
+        filters maps dimensions to the labels to keep; the returned arrays
+        have one axis per `by` dimension, in that order.
+        """
+        filters = filters or {}
+        for dimension in list(by) + list(filters):
+            if dimension not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension {dimension!r}")
+        index = [self.positions(dimension, filters[dimension]) if dimension in filters
+                 else list(range(len(self.labels[dimension])))
+                 for dimension in DIMENSIONS]
+        selection = np.ix_(*index)
+
+        # Sum the other axes away, then put the grouped axes in the order asked for
+        kept = [DIMENSIONS.index(dimension) for dimension in by]
+        dropped = tuple(axis for axis in range(len(DIMENSIONS)) if axis not in kept)
+        order = np.argsort(np.argsort(kept))
+
+        def reduce(array):
+            return np.transpose(array[selection].sum(axis=dropped), order) if kept else array[selection].sum()
+
+        labels = [[self.labels[dimension][i] for i in index[DIMENSIONS.index(dimension)]] for dimension in by]
+        return labels, reduce(self.counts), {measure: reduce(array) for measure, array in self.sums.items()}
+
+    def query(self, by=(), filters=None, measures=MEASURES):
+        """JSON rows of count plus sum and mean of each measure, one per non-empty group"""
+        for measure in measures:
+            if measure not in MEASURES:
+                raise ValueError(f"Unknown measure {measure!r}")
+        labels, counts, sums = self.aggregate(by, filters)
+        rows = []
+        for cell in zip(*np.nonzero(counts)) if by else [()]:
+            count = int(counts[cell])
+            row = {DIMENSION_KEYS[dimension]: labels[axis][i] for axis, (dimension, i) in enumerate(zip(by, cell))}
+            row['count'] = count
+            for measure in measures:
+                total = sums[measure][cell].item()
+                row[measure] = {'sum': total, 'mean': total / count if count else None}
+            rows.append(row)
+        return rows
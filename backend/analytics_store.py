@@ -0,0 +1,229 @@
+"""Aggregate store for real-time blood demand analytics.
+
+Real-time events are folded into per-(city, blood_type, day) counters in a
+small SQLite database. Each event is identified by its row number in
+realtime_data.csv and the store remembers how many rows it has applied,
+so feeding it the same rows twice is a no-op. The dashboard JSON is
+rendered from a base snapshot (the output of generate_analytics_data)
+plus these counters instead of being mutated in place.
+"""
+import copy
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+STORE_PATH = 'realtime_aggregates.db'
+RECENT_DAYS = 7
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_counters (
+    city TEXT NOT NULL,
+    blood_type TEXT NOT NULL,
+    day TEXT NOT NULL,
+    epoch INTEGER NOT NULL,
+    demand INTEGER NOT NULL DEFAULT 0,
+    supply INTEGER NOT NULL DEFAULT 0,
+    donations INTEGER NOT NULL DEFAULT 0,
+    requests INTEGER NOT NULL DEFAULT 0,
+    critical INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (city, blood_type, day, epoch)
+);
+CREATE INDEX IF NOT EXISTS daily_counters_day ON daily_counters (day);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+UPSERT = """
+INSERT INTO daily_counters (city, blood_type, day, epoch, demand, supply, donations, requests, critical)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (city, blood_type, day, epoch) DO UPDATE SET
+    demand = demand + excluded.demand,
+    supply = supply + excluded.supply,
+    donations = donations + excluded.donations,
+    requests = requests + excluded.requests,
+    critical = critical + excluded.critical
+"""
+
+class AnalyticsStore:
+    """Per-(city, blood_type, day) counters for real-time events.
+
+    Counters carry an epoch. A retrain starts a new epoch before it reads
+    the log, reads only the rows applied before that, and folds them into
+    the base snapshot, so only counters from the new epoch on are added to
+    the base charts; a snapshot built from historical data alone counts
+    every epoch again. The recent-activity insights always read every epoch.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        # The real-time worker creates the store on one thread and uses it on another
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, json.dumps(value))
+        )
+
+    @property
+    def applied_rows(self):
+        """Number of real-time log rows already folded into the counters"""
+        return self.get_meta('applied_rows', 0)
+
+    @property
+    def epoch(self):
+        return self.get_meta('epoch', 0)
+
+    @property
+    def base_epoch(self):
+        """First epoch whose counters are added to the base charts"""
+        return self.get_meta('base_epoch', 0)
+
+    def has_base(self):
+        return self.get_meta('base') is not None
+
+    def start_epoch(self):
+        """Send later rows to a new epoch, for a retrain about to read the log.
+
+        Returns (epoch, applied_rows): the rows before applied_rows are the
+        ones counted in earlier epochs. Until set_base receives the epoch the
+        charts still add every epoch since the current base.
+        """
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            epoch = self.epoch + 1
+            self.set_meta('epoch', epoch)
+            return epoch, self.applied_rows
+
+    def set_base(self, analytics_data, epoch=0):
+        """Store the dashboard snapshot that counters are rendered on top of.
+
+        `epoch` is the first epoch whose counters the snapshot does not
+        contain: 0 for historical data alone, the start_epoch() epoch for a
+        snapshot built from the rows applied before it (a retrain).
+        """
+        with self.conn:
+            self.set_meta('base', analytics_data)
+            self.set_meta('base_epoch', epoch)
+
+    def set_predictions(self, regions):
+        """Replace the base snapshot's forecast, e.g. after the model learned from new rows"""
+        analytics_data = self.get_meta('base')
+        analytics_data['predictions'].update({'nextMonth': regions[0], 'regions': regions})
+        with self.conn:
+            self.set_meta('base', analytics_data)
+
+    def reset(self):
+        """Drop all counters, e.g. after the real-time log was rotated"""
+        with self.conn:
+            self.conn.execute("DELETE FROM daily_counters")
+            self.set_meta('applied_rows', 0)
+
+    def apply_events(self, rows, first_row):
+        """Fold processed real-time rows into the counters.
+
+        `first_row` is the log row number of rows.iloc[0]. Rows at positions
+        the store has already applied are skipped, which makes replays and
+        overlapping batches harmless. Cost is O(len(rows)).
+        """
+        skip = max(0, self.applied_rows - first_row)
+        rows = rows.iloc[skip:]
+        if rows.empty:
+            return 0
+
+        frame = pd.DataFrame({
+            'city': rows['city'].to_numpy(),
+            'blood_type': rows['blood_type'].to_numpy(),
+            'day': pd.to_datetime(rows['date'], format='mixed').dt.strftime('%Y-%m-%d').to_numpy(),
+            'demand': rows['demand'].to_numpy(),
+            'supply': rows['supply'].to_numpy(),
+            'donations': (rows['supply'] > 0).to_numpy(),
+            'requests': (rows['demand'] > 0).to_numpy(),
+            'critical': rows['is_critical'].to_numpy()
+        })
+        counters = frame.groupby(['city', 'blood_type', 'day'], sort=False).sum().reset_index()
+
+        with self.conn:
+            # Read the epoch under the write lock, so no row lands in an epoch start_epoch closed
+            self.conn.execute("BEGIN IMMEDIATE")
+            epoch = self.epoch
+            self.conn.executemany(UPSERT, [
+                (city, blood_type, day, epoch, int(demand), int(supply), int(donations), int(requests), int(critical))
+                for city, blood_type, day, demand, supply, donations, requests, critical
+                in counters.itertuples(index=False)
+            ])
+            self.set_meta('applied_rows', first_row + skip + len(rows))
+        return len(rows)
+
+    def totals_by(self, column, since=None, min_epoch=None):
+        """Summed counters grouped by 'city', 'blood_type' or 'day'"""
+        if column not in ('city', 'blood_type', 'day'):
+            raise ValueError(f"Cannot group counters by {column}")
+        where, params = [], []
+        if since is not None:
+            where.append("day >= ?")
+            params.append(since)
+        if min_epoch is not None:
+            where.append("epoch >= ?")
+            params.append(min_epoch)
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        query = (f"SELECT {column}, SUM(demand), SUM(supply), SUM(donations), SUM(requests), SUM(critical) "
+                 f"FROM daily_counters {clause} GROUP BY {column}")
+        return {
+            key: {'demand': demand, 'supply': supply, 'donations': donations, 'requests': requests, 'critical': critical}
+            for key, demand, supply, donations, requests, critical in self.conn.execute(query, params)
+        }
+
+    def render(self, recent_days=RECENT_DAYS):
+        """Dashboard JSON: base snapshot plus the real-time counters"""
+        analytics_data = copy.deepcopy(self.get_meta('base'))
+        base_epoch = self.base_epoch
+
+        # Regional demand: base totals plus real-time demand not yet in the base
+        regional = analytics_data['regionalDemand']
+        labels = regional['labels']
+        values = regional['datasets'][0]['data']
+        base_total = sum(values)
+        for city, totals in sorted(self.totals_by('city', min_epoch=base_epoch).items()):
+            if city in labels:
+                values[labels.index(city)] += totals['demand']
+            else:
+                labels.append(city)
+                values.append(totals['demand'])
+
+        # Blood type distribution: percentages over base plus real-time demand
+        distribution = analytics_data['bloodTypeDistribution']
+        type_labels = distribution['labels']
+        type_values = distribution['datasets'][0]['data']
+        type_demand = {label: pct / 100 * base_total for label, pct in zip(type_labels, type_values)}
+        for blood_type, totals in self.totals_by('blood_type', min_epoch=base_epoch).items():
+            if blood_type in type_demand:
+                type_demand[blood_type] += totals['demand']
+        total_demand = sum(type_demand.values())
+        if total_demand:
+            distribution['datasets'][0]['data'] = [round(type_demand[label] / total_demand * 100, 1) for label in type_labels]
+
+        # Recent activity across every epoch
+        since = (datetime.now().date() - timedelta(days=recent_days)).isoformat()
+        recent = self.totals_by('day', since=since).values()
+        analytics_data['realTimeInsights'] = {
+            **analytics_data.get('realTimeInsights', {}),
+            'lastUpdated': datetime.now().isoformat(),
+            'totalRealTimeRecords': self.applied_rows,
+            'recentDonations': sum(day['supply'] for day in recent),
+            'recentRequests': sum(day['demand'] for day in recent),
+            'criticalRequests': sum(day['critical'] for day in recent)
+        }
+        return analytics_data
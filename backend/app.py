@@ -1,146 +1,416 @@
+import time
+APP_IMPORT_STARTED = time.perf_counter()
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import pandas as pd
-import numpy as np
-import joblib
+import hashlib
+import json
 import os
+import threading
 from dotenv import load_dotenv
-import google.generativeai as genai
-import traceback
+import metrics
+from model_registry import ModelRegistry, ModelUnavailable
+from inference_cache import InferenceCache, LatencyTracker
+from startup import Startup
+
+# Heavy imports (pandas, sklearn, Gemini) and artifact loads are deferred to
+# components built on first use or by the warm-up thread (APP_STARTUP_MODE)
+startup = Startup(started=APP_IMPORT_STARTED)
 
 # Load environment variables
 load_dotenv()
-API_KEY = os.getenv("GOOGLE_API_KEY")
-if not API_KEY:
-    raise ValueError("GOOGLE_API_KEY not set in environment variables.")
-
-# Configure Gemini model
-genai.configure(api_key=API_KEY)
-chat_model = genai.GenerativeModel("gemini-1.5-pro")
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)
 
+# --- Request Metrics ---
+# Per-route request counts and latency for /metrics; no hooks at all when METRICS_ENABLED=0
+if metrics.METRICS_ENABLED:
+    @app.before_request
+    def start_request_timer():
+        request.environ["metrics.started"] = time.perf_counter()
+
+    def record_request(status):
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        metrics.registry.inc("http_requests_total", (("route", route), ("method", request.method), ("status", str(status))))
+        started = request.environ.get("metrics.started")
+        if started is not None:
+            metrics.registry.observe("http_request_seconds", time.perf_counter() - started, (("route", route),))
+
+    # Unhandled errors become 500 responses first, so this sees every request once
+    @app.after_request
+    def record_response(response):
+        record_request(response.status_code)
+        return response
+
+# --- Chat Setup ---
+# CHAT_BACKEND picks Gemini or the local stub; see chat_service.py
+# A waiting /chat request holds a server thread, so by default chat may hold
+# half of them (SERVE_THREADS, set by serve.py) and further chats get a 503
+def create_chat_service():
+    chat_service = startup.import_module("chat_service")
+    threads = int(os.getenv("SERVE_THREADS", 8))
+    return chat_service.ChatService(
+        chat_service.create_backend(),
+        max_concurrency=int(os.getenv("CHAT_MAX_CONCURRENCY", 8)),
+        max_pending=int(os.getenv("CHAT_MAX_PENDING", max(1, threads // 2))),
+        timeout_seconds=float(os.getenv("CHAT_TIMEOUT", 20))
+    )
+
+chat = startup.component('chat', create_chat_service)
+
+# --- Model Registry ---
+# Models load in the background and are hot-reloaded when their files change
+MODEL_WAIT_SECONDS = 30
+
+def load_demand_predictor(path):
+    predictor = startup.import_module('train_model').BloodDemandPredictor()
+    predictor.load_model(path)
+    if predictor.feature_store is None:
+        raise ValueError(f"{path} predates the online feature store; retrain it")
+    return predictor
+
+def load_analytics_cube(path):
+    return startup.import_module('analytics_cube').AnalyticsCube.load(path)
+
+models = ModelRegistry()
+models.register('donor_prediction', 'donor_prediction_model.pkl')
+models.register('donor_scaler', 'scaler.pkl')
+# Artifact directories are replaced manifest-last, so watching the manifest sees whole versions
+models.register('blood_demand', 'blood_demand_model/manifest.json', loader=load_demand_predictor)
+models.register('blood_demand_realtime', 'blood_demand_model_realtime/manifest.json', loader=load_demand_predictor)
+models.register('analytics_cube', 'analytics_cube.npz', loader=load_analytics_cube)
+
+def start_models():
+    """Start the registry and wait for every model's first load attempt"""
+    models.start()
+    if not models.wait_settled(MODEL_WAIT_SECONDS):
+        raise TimeoutError(f"Models still loading after {MODEL_WAIT_SECONDS}s")
+    return models
+
+model_store = startup.component('models', start_models)
+
 # --- Blood Demand Prediction Setup ---
-demand_model = joblib.load('models/blood_donation_model.pkl')
-demand_df = pd.read_csv("blood_demand_data.csv")
-mean_values = {
-    "Temperature": demand_df['Temperature'].mean(),
-    "HistoricalBloodUsage": demand_df['HistoricalBloodUsage'].mean(),
-    "HospitalAdmissions": demand_df['HospitalAdmissions'].mean(),
-    "BloodDonorsAvailable": demand_df['BloodDonorsAvailable'].mean()
-}
+# /predict results are memoized per model version; dashboards poll with identical inputs
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", 10000))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", 300))
+prediction_cache = InferenceCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+prediction_latency = LatencyTracker()
+
+# --- Batch Demand Forecast Setup ---
+MAX_BATCH_QUERIES = 100000
+MAX_FORECAST_DAYS = 366
+
+def current_demand_predictor():
+    """(name, predictor, version): the realtime-retrained model when there is one, else the base model"""
+    model_store.get()
+    try:
+        name = 'blood_demand_realtime'
+        predictor, version = models.get_versioned(name, MODEL_WAIT_SECONDS)
+    except ModelUnavailable:
+        name = 'blood_demand'
+        predictor, version = models.get_versioned(name, MODEL_WAIT_SECONDS)
+    return name, predictor, version
 
 # --- Top Donors Setup ---
-donor_model = joblib.load('models/donor_prediction_model.pkl')
-scaler = joblib.load('models/scaler.pkl')
-donor_df = pd.read_csv('updated_transfusion.csv')
+# Donors are kept as DonorStore columns and scored once; /api/top-donors ranks a group's scores
+DEFAULT_TOP_DONORS = 5
+MAX_TOP_DONORS = 100
+donor_index = None
+donor_index_lock = threading.Lock()
+
+def current_donor_index():
+    """Donor ranking for the current donor model and scaler, rebuilt when either is swapped"""
+    global donor_index
+    model_store.get()
+    donor_model = models.get('donor_prediction', MODEL_WAIT_SECONDS)
+    scaler = models.get('donor_scaler', MODEL_WAIT_SECONDS)
+    with donor_index_lock:
+        if donor_index is None or donor_index.model is not donor_model or donor_index.scaler is not scaler:
+            donor_index = startup.import_module('donor_index').TopDonorIndex(donor_model, scaler)
+    return donor_index
+
+# /api/top-donors builds it through the component, so a lazy first build shows in /ready
+donor_ranking = startup.component('donor_index', current_donor_index)
+
+# --- Analytics Cube Setup ---
+# Dashboard slices of the precomputed demand cube; rendered bodies are cached per cube digest
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", 1000))
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", 3600))
+analytics_cache = InferenceCache(ANALYTICS_CACHE_SIZE, ANALYTICS_CACHE_TTL)
+
+def analytics_query_key(args):
+    """Normalized (by, filters, measures) of a cube query string; unknown names raise ValueError"""
+    analytics_cube = startup.import_module('analytics_cube')
+    dimensions = {key: dimension for dimension, key in analytics_cube.DIMENSION_KEYS.items()}
+
+    def values(name):
+        return [value for value in ",".join(args.getlist(name)).split(",") if value.strip()]
 
-def calculate_normalized_score(df):
-    df = df.copy()
-    df['Normalized Recency'] = (df['Recency (months)'] - df['Recency (months)'].min()) / (df['Recency (months)'].max() - df['Recency (months)'].min())
-    df['Normalized Frequency'] = (df['Frequency (times)'] - df['Frequency (times)'].min()) / (df['Frequency (times)'].max() - df['Frequency (times)'].min())
-    df['Normalized Monetary'] = (df['Monetary (c.c. blood)'] - df['Monetary (c.c. blood)'].min()) / (df['Monetary (c.c. blood)'].max() - df['Monetary (c.c. blood)'].min())
-    df['Normalized Donor Score'] = (df['Normalized Frequency'] * 0.4 + df['Normalized Monetary'] * 0.4 + (1 - df['Normalized Recency']) * 0.2) * 100
-    return df
+    by = []
+    for name in values("by"):
+        if name.strip() not in dimensions:
+            raise ValueError(f"Unknown dimension {name!r}")
+        if dimensions[name.strip()] not in by:
+            by.append(dimensions[name.strip()])
+    filters = []
+    for key, dimension in dimensions.items():
+        if key in args:
+            labels = values(key)
+            if dimension == 'blood_type':
+                # An unencoded "+" in a query string arrives as a space (O+ -> "O ")
+                labels = [label.replace(" ", "+") for label in labels]
+            filters.append((dimension, tuple(sorted({label.strip().lower() for label in labels}))))
+    measures = tuple(name.strip() for name in values("measures")) or analytics_cube.MEASURES
+    return tuple(by), tuple(filters), measures
 
-donor_df = calculate_normalized_score(donor_df)
+def render_analytics_query(cube, key):
+    """(JSON body, ETag) of a cube query"""
+    by, filters, measures = key
+    dimension_keys = startup.import_module('analytics_cube').DIMENSION_KEYS
+    body = json.dumps({
+        "by": [dimension_keys[dimension] for dimension in by],
+        "measures": list(measures),
+        "cube": cube.digest,
+        "rows": cube.query(by, dict(filters), measures)
+    })
+    return body, hashlib.sha1(body.encode()).hexdigest()[:20]
 
 # --- Routes ---
 @app.route("/")
 def home():
-    return "✅ Unified Flask server is running. Endpoints: /predict, /api/top-donors, /chat"
+    return "✅ Unified Flask server is running. Endpoints: /predict, /predict/stats, /api/predict-batch, /api/top-donors, /api/analytics/cube, /api/analytics/cube/stats, /api/models, /metrics, /ready, /chat, /chat/stats"
+
+def prediction_key(data, predictor):
+    """Normalized (date, city, blood type, population) for caching and prediction.
+
+    city and blood_type are optional; a missing one covers every known value.
+    """
+    import pandas as pd
+    date = pd.Timestamp(data["Date"]).strftime("%Y-%m-%d")
+    known_cities = {city.lower(): city for city, _ in predictor.feature_store.series}
+    city = data.get("city")
+    if city is not None:
+        city = known_cities.get(str(city).strip().lower(), str(city).strip())
+    blood_type = data.get("blood_type", data.get("bloodType"))
+    if blood_type is not None:
+        blood_type = str(blood_type).strip().upper()
+    population = data.get("Population")
+    # Population is a per-city input; without a city every city keeps its own profile
+    population = int(population) if population not in (None, "") and city is not None else None
+    return date, city, blood_type, population
+
+def compute_prediction(predictor, key):
+    """Total predicted demand over the cities and blood types the key covers"""
+    import pandas as pd
+    date, city, blood_type, population = key
+    series = predictor.feature_store.series
+    cities = [city] if city is not None else sorted({c for c, _ in series})
+    blood_types = [blood_type] if blood_type is not None else sorted({b for _, b in series})
+    queries = pd.DataFrame([
+        {"city": c, "blood_type": b, "date": date, "population": population}
+        for c in cities for b in blood_types
+    ])
+    return int(predictor.predict_batch(queries)["predicted_demand"].sum())
 
 @app.route("/predict", methods=["POST"])
 def predict_demand():
-    data = request.get_json()
-    date = pd.to_datetime(data.get("Date"))
-    population = data.get("Population")
+    """Blood demand for a date from the trained BloodDemandPredictor.
 
-    input_data = pd.DataFrame([{
-        "DayOfWeek": date.dayofweek,
-        "Month": date.month,
-        "Population": population,
-        "Events": 0,
-        "HistoricalBloodUsage": mean_values["HistoricalBloodUsage"],
-        "HospitalAdmissions": mean_values["HospitalAdmissions"],
-        "BloodDonorsAvailable": mean_values["BloodDonorsAvailable"],
-        "Temperature": mean_values["Temperature"]
-    }])
+    Body: {"Date", "city"?, "blood_type"?, "Population"?}. Results are cached
+    per model version on the normalized inputs.
+    """
+    started = time.perf_counter()
+    try:
+        name, predictor, version = current_demand_predictor()
+    except ModelUnavailable:
+        return jsonify({"error": "Blood demand model not trained yet. Run train_model.py."}), 503
 
-    prediction = demand_model.predict(input_data)
-    return jsonify({"PredictedBloodDemand": prediction[0]})
+    data = request.get_json() or {}
+    try:
+        key = prediction_key(data, predictor)
+        prediction, cached = prediction_cache.get_or_compute(
+            key, (name, version), lambda: compute_prediction(predictor, key)
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid request: {e}"}), 400
+    finally:
+        prediction_latency.record(time.perf_counter() - started)
+
+    date, city, blood_type, _ = key
+    return jsonify({
+        "PredictedBloodDemand": prediction,
+        "date": date,
+        "city": city,
+        "bloodType": blood_type,
+        "model": name,
+        "modelVersion": version,
+        "cached": cached
+    })
+
+@app.route("/predict/stats", methods=["GET"])
+def predict_stats():
+    """Cache hit rate and size plus p50/p99 /predict latency"""
+    return jsonify({"cache": prediction_cache.stats(), "latency": prediction_latency.stats()})
+
+@app.route("/api/predict-batch", methods=["POST"])
+def predict_batch():
+    """Bulk demand predictions with one model call.
+
+    Body is either {"queries": [{"city", "bloodType", "date", "population"?, "hospitals"?}, ...]}
+    or a grid {"cities"?, "bloodTypes"?, "startDate"?, "days"?} (defaults: every
+    known series, 30 days from tomorrow).
+    """
+    import pandas as pd
+    try:
+        _, demand_predictor, _ = current_demand_predictor()
+    except ModelUnavailable:
+        return jsonify({"error": "Blood demand model not trained yet. Run train_model.py."}), 503
+
+    data = request.get_json() or {}
+    try:
+        if "queries" in data:
+            if len(data["queries"]) > MAX_BATCH_QUERIES:
+                return jsonify({"error": f"At most {MAX_BATCH_QUERIES} queries per request."}), 400
+            queries = pd.DataFrame(data["queries"]).rename(columns={"bloodType": "blood_type"})
+            result = demand_predictor.predict_batch(queries)
+        else:
+            days = int(data.get("days", 30))
+            if not 1 <= days <= MAX_FORECAST_DAYS:
+                return jsonify({"error": f"days must be between 1 and {MAX_FORECAST_DAYS}."}), 400
+            result = demand_predictor.forecast(data.get("startDate"), days, data.get("cities"), data.get("bloodTypes"))
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"Invalid request: {e}"}), 400
+
+    return jsonify({
+        "predictions": [
+            {"city": city, "bloodType": blood_type, "date": date.strftime("%Y-%m-%d"), "predictedDemand": int(demand)}
+            for city, blood_type, date, demand in zip(
+                result["city"], result["blood_type"], pd.to_datetime(result["date"]), result["predicted_demand"]
+            )
+        ]
+    })
 
 @app.route("/api/top-donors", methods=["POST"])
 def top_donors():
+    """Top `k` donors of a blood group (default 5), paginated with `page` (1-based).
+
+    The body stays a list of donors; X-Total-Count and X-Page carry the paging info.
+    """
     data = request.get_json()
-    blood_group = data.get('bloodGroup', '').lower()
+    blood_group = data.get('bloodGroup', '')
+    try:
+        k = int(data.get('k', DEFAULT_TOP_DONORS))
+        page = int(data.get('page', 1))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'k and page must be integers.'}), 400
+    if not 1 <= k <= MAX_TOP_DONORS or page < 1:
+        return jsonify({'error': f'k must be between 1 and {MAX_TOP_DONORS} and page at least 1.'}), 400
 
-    filtered = donor_df[donor_df['Blood Group'].str.lower() == blood_group]
-    if filtered.empty:
+    try:
+        donor_ranking.get()
+        # Rebuilt here when the donor model or scaler was swapped since
+        index = current_donor_index()
+    except ModelUnavailable as e:
+        return jsonify({'error': str(e)}), 503
+    index.refresh()
+    result, total = index.top(blood_group, k, page)
+    if total == 0:
         return jsonify({'error': 'No donors found for the given blood group.'}), 404
 
-    X = filtered[['Recency (months)', 'Frequency (times)', 'Monetary (c.c. blood)']]
-    X_scaled = scaler.transform(X)
+    response = jsonify(result)
+    response.headers['X-Total-Count'] = str(total)
+    response.headers['X-Page'] = str(page)
+    return response
+
+@app.route("/api/analytics/cube", methods=["GET"])
+def analytics_cube_query():
+    """Count plus sum/mean demand, supply and shortage per group of the aggregate cube.
 
-    filtered = filtered.copy()
-    filtered['Predicted Donor Score'] = donor_model.predict(X_scaled)
+    Query string: by=city,month (any of city, bloodType, month, dayOfWeek;
+    none gives one total row), comma-separated labels per dimension to
+    filter on (e.g. bloodType=O%2B,AB-&month=5,6) and measures=demand,...
+    Responses carry an ETag; a matching If-None-Match gets 304.
+    """
+    try:
+        model_store.get()
+        cube = models.get('analytics_cube', MODEL_WAIT_SECONDS)
+    except ModelUnavailable:
+        return jsonify({"error": "Analytics cube not built yet. Run train_model.py."}), 503
+
+    try:
+        key = analytics_query_key(request.args)
+        (body, etag), _ = analytics_cache.get_or_compute(key, cube.digest, lambda: render_analytics_query(cube, key))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query: {e}"}), 400
+
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+@app.route("/api/analytics/cube/stats", methods=["GET"])
+def analytics_cube_stats():
+    """Query cache hit rate and size"""
+    return jsonify(analytics_cache.stats())
+
+@app.route("/metrics", methods=["GET"])
+def metrics_text():
+    """Stage timings and per-route request metrics in the Prometheus text format"""
+    if not metrics.METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled (METRICS_ENABLED=0)"}), 404
+    return metrics.registry.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Readiness: per-component warm state plus import and startup timings"""
+    status = startup.status()
+    return jsonify(status), 200 if status["ready"] else 503
 
-    top_5 = filtered.sort_values(by='Predicted Donor Score', ascending=False).head(5)
-    result = top_5[['ID', 'Blood Group', 'Predicted Donor Score']].to_dict(orient='records')
-    return jsonify(result)
+@app.route("/api/models", methods=["GET"])
+def model_status():
+    """Version, load time and state of every registered model"""
+    return jsonify(models.status())
+
+@app.route("/api/models/<name>/rollback", methods=["POST"])
+def rollback_model(name):
+    if name not in models.entries:
+        return jsonify({"error": f"Unknown model {name}"}), 404
+    try:
+        version = models.rollback(name)
+    except ModelUnavailable as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify({"model": name, "version": version})
 
 @app.route("/chat", methods=["POST"])
-def chat():
+def chat_reply():
     try:
         data = request.get_json()
         user_message = data.get("message", "")
 
-        allowed_topics = [
-            "Smart Blood Banking", "Blood Demand Prediction", "Blood Supply Chain Optimization",
-            "Real-Time Blood Monitoring", "Smart Blood Donation System", "Automated Blood Management",
-            "Data-Driven Blood Bank", "Blood Inventory Forecasting",
-            "Blood Demand Forecasting", "Predictive Analytics for Blood Banking",
-            "Machine Learning Blood Demand Prediction", "Data-Driven Blood Demand Planning",
-            "Blood Usage Patterns", "Demand Prediction Models", "Time Series Analysis for Blood Demand",
-            "Potential Donor Identification", "Donor Prediction Algorithms",
-            "Donor Pattern Recognition", "Machine Learning Donor Prediction",
-            "Donor Database Management", "Predictive Donor Analytics",
-            "Donor Availability Prediction",
-            "Donor Matching Algorithms", "Blood Group Matching", "Recipient Compatibility Analysis",
-            "Blood Type Compatibility", "Donor-Recipient Matching System",
-            "Optimized Blood Matching", "Cross-Matching Blood Types",
-            "Blood Donation Camp Management", "Camp Promotion Strategies",
-            "Donation Camp Scheduling", "Donor Outreach Programs", "Community Blood Drives",
-            "Camp Location Optimization", "Volunteer Management",
-            "Donor Engagement", "Blood Donation Promotion", "Social Media Promotion for Blood Donation",
-            "Awareness Campaigns", "Blood Donation Drive Promotion",
-            "Promotional Strategies for Blood Banks",
-            "Donor Database Management", "Donor Retention Strategies", "Donor Communication",
-            "Tracking Donor History", "Managing Donor Data", "Donor Record Maintenance",
-            "Donation Frequency Monitoring",
-            "Artificial Intelligence in Blood Banking", "Data Analytics for Blood Banks",
-            "Integration with Health Databases", "Data-Driven Decision Making",
-            "Smart Blood Bank Management System", "Mobile App for Blood Donation",
-            "Donor Health Monitoring", "Blood Safety and Quality Control", "Post-Donation Health Tracking",
-            "Compliance with Blood Safety Standards", "Emergency Blood Availability",
-            "Health Data Privacy",
-            "Time Series Analysis", "Regression Models", "Clustering Techniques",
-            "Anomaly Detection", "Deep Learning Models", "Classification Algorithms",
-            "Feature Engineering", "Data Visualization for Blood Trends"
-        ]
-
-        if not any(topic.lower() in user_message.lower() for topic in allowed_topics):
-            return jsonify({"response": "Sorry, I can only answer questions about Blood Banking."})
-
-        response = chat_model.generate_content(user_message, generation_config={"max_output_tokens": 300})
-        text = response.candidates[0].content.parts[0].text
-        return jsonify({"response": text})
+        chat_service = startup.import_module("chat_service")
+        try:
+            text, cached = chat.get().reply(user_message)
+        except chat_service.ChatBusy:
+            return jsonify({"error": "Chat is busy, please retry shortly."}), 503
+        except TimeoutError as e:
+            return jsonify({"error": str(e)}), 504
+        return jsonify({"response": text, "cached": cached})
 
     except Exception as e:
-        traceback.print_exc()
+        app.logger.exception("Chat request failed")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/chat/stats", methods=["GET"])
+def chat_stats():
+    """Backend, pending calls and reply cache hit rate"""
+    if chat.state != 'ready':
+        return jsonify({"state": chat.state, "error": chat.error}), 503
+    return jsonify(chat.get().stats())
+
+startup.record("app import", APP_IMPORT_STARTED)
+startup.start()
+
 if __name__ == "__main__":
     app.run(port=5000, debug=True)
@@ -0,0 +1,628 @@
+"""Performance benchmarks for the blood demand pipeline.
+
+Usage:
+    python benchmarks.py ingestion [--sizes 10000 100000 1000000]
+    python benchmarks.py generate [--sizes 8 32 128]
+    python benchmarks.py storage [--sizes 8 64]
+    python benchmarks.py features [--sizes 100000 1000000 2000000]
+    python benchmarks.py online [--sizes 1000 10000]
+    python benchmarks.py donors [--sizes 10000 100000]
+    python benchmarks.py donor-store [--sizes 100000 1000000]
+    python benchmarks.py chat [--sizes 10000 100000]
+    python benchmarks.py engines [--sizes 100000 400000]
+    python benchmarks.py artifacts [--sizes 100000]
+
+The suite runs the whole pipeline (generate -> features -> train -> save/load
+-> predict -> real-time ingestion -> Flask endpoints) per data size, in a
+scratch directory and fully offline (stub chat backend, Flask test client).
+It writes wall time, peak traced memory and throughput per stage to a JSON
+file and fails, exit status 1, when a stage is slower or bigger than
+--tolerance times the stored baseline. Without a baseline it exits with
+status 1 unless --save-baseline records one:
+
+    python benchmarks.py suite --sizes 8 16 --save-baseline   # on the reference build
+    python benchmarks.py suite --sizes 8 16                   # later: compare
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from analytics_cube import CUBE_PATH, AnalyticsCube
+from chat_service import ALLOWED_TOPICS, ChatService, StubBackend, is_on_topic
+from dataset_io import load_dataset, save_dataset_frame
+from donor_index import TopDonorIndex, DONOR_FEATURES
+from donor_store import DonorStore
+from feature_engine import add_demand_features, OnlineFeatureStore
+from generate_dataset import generate_blood_demand_dataset
+from model_selection import CANDIDATES, build_estimator, regression_metrics
+from train_model import BloodDemandPredictor, generate_analytics_data
+from update_realtime_model import (
+    REALTIME_CSV, load_realtime_data, update_analytics_with_realtime, process_realtime_rows, get_city_population, get_city_hospitals,
+    get_season, get_seasonal_multiplier, get_weather_factor
+)
+
+CITIES = ['Delhi', 'Mumbai', 'Bangalore', 'Chennai', 'Kolkata', 'Hyderabad', 'Pune', 'Ahmedabad', 'Jaipur']
+BLOOD_TYPES = ['O+', 'A+', 'B+', 'AB+', 'O-', 'A-', 'B-', 'AB-']
+WEATHER = ['sunny', 'rainy', 'cloudy', 'stormy', 'cold', 'unknown']
+URGENCY = ['normal', 'high', 'critical']
+
+def make_realtime_frame(n, seed=42):
+    """Synthetic raw realtime_data.csv rows"""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 730, n), unit='D')
+    return pd.DataFrame({
+        'type': rng.choice(['donation', 'request'], n),
+        'blood_type': rng.choice(BLOOD_TYPES, n),
+        'units': rng.integers(1, 5, n),
+        'city': rng.choice(CITIES, n),
+        'date': dates.strftime('%Y-%m-%d'),
+        'urgency': rng.choice(URGENCY, n),
+        'weather': rng.choice(WEATHER, n)
+    })
+
+def process_realtime_rows_rowwise(realtime_df):
+    """Original per-row ingestion, kept as the benchmark reference"""
+    processed_data = []
+    for _, row in realtime_df.iterrows():
+        if row['type'] == 'donation':
+            supply = row['units']
+            demand = 0
+        else:
+            supply = 0
+            demand = row['units']
+        date_obj = pd.to_datetime(row['date'])
+        processed_data.append({
+            'date': row['date'],
+            'city': row['city'],
+            'blood_type': row['blood_type'],
+            'demand': demand,
+            'supply': supply,
+            'population': get_city_population(row['city']),
+            'hospitals': get_city_hospitals(row['city']),
+            'month': date_obj.month,
+            'day_of_week': date_obj.weekday(),
+            'season': get_season(date_obj.month),
+            'seasonal_multiplier': get_seasonal_multiplier(date_obj.month),
+            'weather_factor': get_weather_factor(row.get('weather', 'unknown')),
+            'is_critical': row.get('urgency', 'normal') in ['high', 'critical'],
+            'shortage': max(0, demand - supply)
+        })
+    return pd.DataFrame(processed_data)
+
+def add_demand_features_groupby(df):
+    """groupby/lambda lag and rolling code (as prepare_features had it), kept as the benchmark reference"""
+    df = df.sort_values(['city', 'blood_type', 'date'])
+    df['demand_lag_1'] = df.groupby(['city', 'blood_type'])['demand'].shift(1)
+    df['demand_lag_7'] = df.groupby(['city', 'blood_type'])['demand'].shift(7)
+    df['demand_lag_30'] = df.groupby(['city', 'blood_type'])['demand'].shift(30)
+    df = df.sort_values(['city', 'blood_type', 'date']).reset_index(drop=True)
+    df['demand_ma_7'] = df.groupby(['city', 'blood_type'])['demand'].transform(lambda x: x.shift(1).rolling(7, min_periods=1).mean())
+    df['demand_ma_30'] = df.groupby(['city', 'blood_type'])['demand'].transform(lambda x: x.shift(1).rolling(30, min_periods=1).mean())
+    return df
+
+def dataset_with_rows(n_rows):
+    """Synthetic training data with at least n_rows rows (4 years, daily)"""
+    rows_per_city = 1461 * 8
+    return generate_blood_demand_dataset(cities=max(1, -(-n_rows // rows_per_city)))
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+def bench_ingestion(sizes):
+    """Row-wise vs vectorized realtime ingestion"""
+    print(f"{'rows':>10} {'row-wise (s)':>14} {'vectorized (s)':>16} {'speedup':>9}")
+    for n in sizes:
+        raw = make_realtime_frame(n)
+        expected, rowwise_time = timed(process_realtime_rows_rowwise, raw)
+        result, vector_time = timed(process_realtime_rows, raw)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+        print(f"{n:>10} {rowwise_time:>14.3f} {vector_time:>16.4f} {rowwise_time / vector_time:>8.0f}x")
+
+def bench_generate(city_counts):
+    """Row-by-row vs vectorized dataset generation (4 years, daily)"""
+    _, legacy_time = timed(lambda: generate_blood_demand_dataset(legacy=True))
+    print(f"legacy generator, 8 cities: {legacy_time:.3f}s")
+    print(f"{'cities':>8} {'rows':>10} {'vectorized (s)':>16} {'rows/s':>12}")
+    for n_cities in city_counts:
+        df, vector_time = timed(lambda: generate_blood_demand_dataset(cities=n_cities, categorical=True))
+        print(f"{n_cities:>8} {len(df):>10} {vector_time:>16.3f} {len(df) / vector_time:>12.0f}")
+
+def bench_storage(city_counts):
+    """Training-set load time and in-memory size for CSV vs columnar files"""
+    print(f"{'cities':>8} {'rows':>10} {'format':>8} {'file MB':>9} {'load (s)':>10} {'frame MB':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_cities in city_counts:
+            df = generate_blood_demand_dataset(cities=n_cities)
+            for extension in ['csv', 'parquet', 'feather']:
+                path = os.path.join(tmp, f"dataset.{extension}")
+                save_dataset_frame(df, path)
+                if extension == 'csv':
+                    # Baseline: what train_model used to do
+                    loaded, load_time = timed(pd.read_csv, path)
+                else:
+                    loaded, load_time = timed(load_dataset, path)
+                print(f"{n_cities:>8} {len(df):>10} {extension:>8} {os.path.getsize(path) / 1e6:>9.1f} "
+                      f"{load_time:>10.3f} {loaded.memory_usage(deep=True).sum() / 1e6:>10.1f}")
+
+def bench_features(sizes):
+    """groupby/lambda lag and rolling features vs the one-pass feature engine"""
+    print(f"{'rows':>10} {'groupby (s)':>12} {'engine (s)':>11} {'speedup':>9}")
+    for n in sizes:
+        df = dataset_with_rows(n)
+        df['date'] = pd.to_datetime(df['date'])
+        expected, groupby_time = timed(add_demand_features_groupby, df)
+        result, engine_time = timed(add_demand_features, df)
+        pd.testing.assert_frame_equal(result, expected)
+        print(f"{len(df):>10} {groupby_time:>12.3f} {engine_time:>11.3f} {groupby_time / engine_time:>8.1f}x")
+
+def bench_online(sizes):
+    """Serving-time lag/rolling features: DataFrame rebuild vs online store"""
+    df = generate_blood_demand_dataset()
+    df['date'] = pd.to_datetime(df['date'])
+    store = OnlineFeatureStore.from_frame(df)
+    history = df[df['date'] > df['date'].max() - pd.Timedelta(days=60)]
+    keys = list(store.series)
+
+    def rebuild(n):
+        for i in range(n):
+            city, blood_type = keys[i % len(keys)]
+            series = history[(history['city'] == city) & (history['blood_type'] == blood_type)]
+            add_demand_features(series)
+
+    def online(n):
+        for i in range(n):
+            store.features(*keys[i % len(keys)])
+
+    print(f"{'requests':>10} {'DataFrame (ms/req)':>19} {'online (us/req)':>16}")
+    for n in sizes:
+        _, rebuild_time = timed(rebuild, min(n, 1000))
+        _, online_time = timed(online, n)
+        print(f"{n:>10} {rebuild_time / min(n, 1000) * 1e3:>19.3f} {online_time / n * 1e6:>16.2f}")
+
+def bench_donors(sizes):
+    """/api/top-donors: filter + score + sort per request vs the precomputed index"""
+    model = joblib.load('models/donor_prediction_model.pkl')
+    scaler = joblib.load('models/scaler.pkl')
+    print(f"{'donors':>10} {'index build (s)':>16} {'per request (ms)':>17} {'indexed (ms)':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            rng = np.random.default_rng(42)
+            donors = pd.DataFrame({
+                'Recency (months)': rng.integers(0, 40, n),
+                'Frequency (times)': rng.integers(1, 50, n),
+                'Monetary (c.c. blood)': rng.integers(1, 50, n) * 250,
+                'Blood Group': rng.choice(BLOOD_TYPES, n),
+                'ID': np.arange(n)
+            })
+            path = os.path.join(tmp, 'donors.csv')
+            donors.to_csv(path, index=False)
+
+            def per_request():
+                filtered = donors[donors['Blood Group'].str.lower() == 'o+'].copy()
+                filtered['Predicted Donor Score'] = model.predict(scaler.transform(filtered[DONOR_FEATURES]))
+                return filtered.sort_values(by='Predicted Donor Score', ascending=False).head(5)
+
+            index, build_time = timed(TopDonorIndex, model, scaler, path)
+            _, request_time = timed(per_request)
+            _, indexed_time = timed(index.top, 'O+')
+            print(f"{n:>10} {build_time:>16.3f} {request_time * 1e3:>17.2f} {indexed_time * 1e3:>13.3f}")
+
+def calculate_normalized_score(df):
+    """Original app.py donor scoring on a full DataFrame, kept as the benchmark reference"""
+    df = df.copy()
+    df['Normalized Recency'] = (df['Recency (months)'] - df['Recency (months)'].min()) / (df['Recency (months)'].max() - df['Recency (months)'].min())
+    df['Normalized Frequency'] = (df['Frequency (times)'] - df['Frequency (times)'].min()) / (df['Frequency (times)'].max() - df['Frequency (times)'].min())
+    df['Normalized Monetary'] = (df['Monetary (c.c. blood)'] - df['Monetary (c.c. blood)'].min()) / (df['Monetary (c.c. blood)'].max() - df['Monetary (c.c. blood)'].min())
+    df['Normalized Donor Score'] = (df['Normalized Frequency'] * 0.4 + df['Normalized Monetary'] * 0.4 + (1 - df['Normalized Recency']) * 0.2) * 100
+    return df
+
+def traced_peak(func):
+    """Most memory traced while func runs"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def bench_donor_store(sizes):
+    """Donor scores: read_csv + calculate_normalized_score vs the chunked DonorStore.
+
+    Resident is what each keeps after loading, peak the most traced memory
+    while loading (in a second, traced load), both per million donors;
+    append is adding 100 donors.
+    """
+    print(f"{'donors':>10} {'method':<12} {'load (s)':>9} {'resident MB/M':>14} {'peak MB/M':>10} "
+          f"{'append (ms)':>12} {'max diff':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            rng = np.random.default_rng(42)
+            donors = pd.DataFrame({
+                'Recency (months)': rng.integers(0, 40, n),
+                'Frequency (times)': rng.integers(1, 50, n),
+                'Monetary (c.c. blood)': rng.integers(1, 50, n) * 250,
+                'Blood Group': rng.choice(BLOOD_TYPES, n),
+                'ID': [f"{i:024x}" for i in rng.integers(0, 2 ** 62, n)]
+            })
+            path = os.path.join(tmp, 'donors.csv')
+            donors.to_csv(path, index=False)
+            new_rows = ''.join(f"\n{i % 40},{i % 50 + 1},{(i % 50 + 1) * 250},O+,{i:024x}" for i in range(100))
+
+            frame, frame_time = timed(lambda: calculate_normalized_score(pd.read_csv(path)))
+            frame_peak = traced_peak(lambda: calculate_normalized_score(pd.read_csv(path)))
+            extra = pd.read_csv(io.StringIO(new_rows), header=None, names=list(donors.columns))
+            _, frame_append = timed(lambda: calculate_normalized_score(pd.concat([frame, extra], ignore_index=True)))
+
+            store, store_time = timed(DonorStore.from_csv, path)
+            store_peak = traced_peak(lambda: DonorStore.from_csv(path))
+            diff = np.abs(store.scores() - frame['Normalized Donor Score'].to_numpy()).max()
+            with open(path, 'a') as f:
+                f.write(new_rows)
+            _, store_append = timed(store.refresh)
+
+            per_million = 1e6 / n / 1e6
+            print(f"{n:>10} {'DataFrame':<12} {frame_time:>9.2f} "
+                  f"{frame.memory_usage(deep=True).sum() * per_million:>14.1f} {frame_peak * per_million:>10.1f} "
+                  f"{frame_append * 1e3:>12.1f} {'':>9}")
+            print(f"{n:>10} {'DonorStore':<12} {store_time:>9.2f} {store.nbytes * per_million:>14.1f} "
+                  f"{store_peak * per_million:>10.1f} {store_append * 1e3:>12.1f} {diff:>9.1e}")
+
+def bench_chat(sizes):
+    """/chat topic guard (substring scan vs one regex) and stub-backed reply throughput"""
+    words = ['how', 'do', 'i', 'plan', 'for', 'the', 'monsoon', 'season', 'with', 'our', 'hospital']
+    rng = np.random.default_rng(42)
+    print(f"{'messages':>10} {'scan (s)':>10} {'regex (s)':>10} {'speedup':>9}")
+    for n in sizes:
+        messages = [' '.join(rng.choice(words, 30)) + (' ' + ALLOWED_TOPICS[i % len(ALLOWED_TOPICS)] if i % 2 else '')
+                    for i in range(n)]
+        scanned, scan_time = timed(lambda: [any(t.lower() in m.lower() for t in ALLOWED_TOPICS) for m in messages])
+        matched, regex_time = timed(lambda: [is_on_topic(m) for m in messages])
+        assert scanned == matched
+        print(f"{n:>10} {scan_time:>10.3f} {regex_time:>10.3f} {scan_time / regex_time:>8.1f}x")
+
+    # 64 concurrent callers, 0.1s backend latency, 8 calls in flight
+    service = ChatService(StubBackend(latency=0.1), max_concurrency=8, max_pending=64)
+    with ThreadPoolExecutor(64) as pool:
+        _, cold_time = timed(lambda: list(pool.map(service.reply, [f"Regression Models {i}" for i in range(64)])))
+        _, warm_time = timed(lambda: list(pool.map(service.reply, [f"regression models {i}?" for i in range(64)])))
+    print(f"64 replies: {cold_time:.2f}s uncached (8 at a time), {warm_time * 1e3:.1f}ms cached")
+
+def bench_engines(sizes):
+    """Model engines: fit time, predict latency, pickle size and MAE on the last 20% of days"""
+    print(f"{'rows':>10} {'engine':<22} {'fit (s)':>8} {'1 row (ms)':>11} {'batch (us/row)':>15} "
+          f"{'file MB':>8} {'MAE':>7}")
+    for n in sizes:
+        predictor = BloodDemandPredictor()
+        frame = predictor.feature_frame(dataset_with_rows(n))
+        X = frame[predictor.feature_columns].to_numpy(dtype=np.float64)
+        y = frame['demand'].to_numpy(dtype=np.float64)
+        test = (frame['date'] > frame['date'].quantile(0.8)).to_numpy()
+
+        for name, (_, _, grid, scaled) in CANDIDATES.items():
+            model = build_estimator(name, {key: values[0] for key, values in grid.items()},
+                                    predictor.feature_columns, n_jobs=os.cpu_count())
+            X_train, X_test = X[~test], X[test]
+            if scaled:
+                scaler = predictor.scaler.fit(X_train)
+                X_train, X_test = scaler.transform(X_train), scaler.transform(X_test)
+            _, fit_time = timed(model.fit, X_train, y[~test])
+
+            single = X_test[:1]
+            _, one_time = timed(lambda: [model.predict(single) for _ in range(50)])
+            y_pred, batch_time = timed(model.predict, X_test)
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'model.pkl')
+                joblib.dump(model, path)
+                size = os.path.getsize(path)
+            print(f"{len(frame):>10} {name:<22} {fit_time:>8.2f} {one_time / 50 * 1e3:>11.3f} "
+                  f"{batch_time / len(X_test) * 1e6:>15.2f} {size / 1e6:>8.1f} "
+                  f"{regression_metrics(y[test], y_pred)['mae']:>7.2f}")
+
+def directory_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+def bench_artifacts(sizes):
+    """Model files: joblib pickle vs compact artifact (memory-mapped, eager, float32, compressed).
+
+    Heap is what tracemalloc sees allocated while loading; memory-mapped
+    node arrays are page cache, not heap. Diff is the largest difference
+    from the sklearn model's predictions.
+    """
+    formats = [
+        ('pickle', {}, {}),
+        ('artifact', {}, {'mmap': True}),
+        ('artifact eager', {}, {'mmap': False}),
+        ('artifact float32', {'float32': True}, {'mmap': True}),
+        ('artifact compressed', {'compress': True}, {})
+    ]
+    print(f"{'rows':>10} {'engine':<22} {'format':<20} {'disk MB':>8} {'load (ms)':>10} {'heap MB':>8} "
+          f"{'1st row (ms)':>13} {'batch (us/row)':>15} {'diff':>9}")
+    for n in sizes:
+        df = dataset_with_rows(n)
+        predictor = BloodDemandPredictor()
+        frame = predictor.feature_frame(df)
+        X = frame[predictor.feature_columns]
+        predictor.feature_store = OnlineFeatureStore.from_frame(df)
+        predictor.metrics = {}
+
+        for name, (_, _, grid, scaled) in CANDIDATES.items():
+            predictor.model_name, predictor.scaled = name, scaled
+            predictor.model_params = {key: values[0] for key, values in grid.items()}
+            model = build_estimator(name, predictor.model_params, predictor.feature_columns, n_jobs=os.cpu_count())
+            if scaled:
+                predictor.scaler.fit(X)
+            predictor.model = model.fit(predictor.scaler.transform(X) if scaled else X, frame['demand'])
+            expected = predictor.predict_matrix(X)
+
+            with tempfile.TemporaryDirectory() as tmp:
+                for label, save_options, load_options in formats:
+                    path = os.path.join(tmp, label.replace(' ', '_') + ('.pkl' if label == 'pickle' else ''))
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        predictor.save_model(path, **save_options)
+                        loaded = BloodDemandPredictor()
+                        tracemalloc.start()
+                        _, load_time = timed(loaded.load_model, path, *load_options.values())
+                        heap = tracemalloc.get_traced_memory()[1]
+                        tracemalloc.stop()
+                    _, first_time = timed(loaded.predict_matrix, X[:1])
+                    predictions, batch_time = timed(loaded.predict_matrix, X)
+                    print(f"{len(frame):>10} {name:<22} {label:<20} {directory_size(path) / 1e6:>8.1f} "
+                          f"{load_time * 1e3:>10.1f} {heap / 1e6:>8.1f} {first_time * 1e3:>13.2f} "
+                          f"{batch_time / len(X) * 1e6:>15.2f} {np.abs(predictions - expected).max():>9.2g}")
+
+SUITE_RESULTS = 'benchmark_results.json'
+SUITE_BASELINE = 'benchmark_baseline.json'
+SUITE_TOLERANCE = 1.5
+# Differences below these are noise, whatever the ratio
+SUITE_MIN_SECONDS = 0.05
+SUITE_MIN_MB = 1.0
+SUITE_ENGINE = 'HistGradientBoosting'
+SUITE_PREDICTIONS = 200
+SUITE_REQUESTS = 100
+
+def pipeline_stages(n_cities, state):
+    """(stage, setup, run) for one data size; run returns (items processed, unit).
+
+    Stages hand data on through `state`; setup runs untimed before each run.
+    """
+    def generate():
+        state['df'] = generate_blood_demand_dataset(cities=n_cities)
+        return len(state['df']), 'rows'
+
+    def features():
+        X, _ = BloodDemandPredictor().prepare_features(state['df'])
+        return len(X), 'rows'
+
+    def train():
+        predictor = BloodDemandPredictor()
+        predictor.train_model(state['df'], folds=2, max_workers=1, engines=[SUITE_ENGINE])
+        state['predictor'] = predictor
+        return len(state['df']), 'rows'
+
+    def save_load():
+        state['predictor'].save_model('models/blood_demand_model')
+        BloodDemandPredictor().load_model('models/blood_demand_model')
+        return 1, 'models'
+
+    def predict_demand():
+        predictor = state['predictor']
+        series = list(predictor.feature_store.series)
+        for i in range(SUITE_PREDICTIONS):
+            city, blood_type = series[i % len(series)]
+            predictor.predict_demand(city, blood_type, '2025-01-01', 5000000, 50)
+        return SUITE_PREDICTIONS, 'predictions'
+
+    def forecast():
+        return len(state['predictor'].forecast('2025-01-01', days=30)), 'rows'
+
+    def analytics_cube():
+        AnalyticsCube.from_frame(state['df']).save(CUBE_PATH)
+        return len(state['df']), 'rows'
+
+    def write_realtime():
+        make_realtime_frame(len(state['df']) // 10).to_csv(REALTIME_CSV, index=False)
+        with open('analytics_data.json', 'w') as f:
+            json.dump(generate_analytics_data(state['df'], state['predictor']), f)
+
+    def realtime_load():
+        return len(load_realtime_data()), 'rows'
+
+    def realtime_analytics():
+        ingest_state = update_analytics_with_realtime(full_rescan=True)
+        if ingest_state is None:
+            raise RuntimeError("update_analytics_with_realtime failed")
+        return ingest_state['rows'], 'rows'
+
+    def start_app():
+        if 'app' not in state:
+            state['app'] = importlib.import_module('app')
+        # Serve the model this size trained, not whatever the registry saw last
+        state['app'].models.load('blood_demand')
+        state['app'].models.load('analytics_cube')
+        state['client'] = state['app'].app.test_client()
+
+    def serve_predict():
+        dates = pd.date_range('2025-01-01', periods=SUITE_REQUESTS).strftime('%Y-%m-%d')
+        for date in dates:
+            response = state['client'].post('/predict', json={'Date': date, 'city': 'Delhi', 'blood_type': 'O+'})
+            if response.status_code != 200:
+                raise RuntimeError(f"/predict returned {response.status_code}: {response.get_data(as_text=True)}")
+        return SUITE_REQUESTS, 'requests'
+
+    def serve_batch():
+        response = state['client'].post('/api/predict-batch', json={'startDate': '2025-01-01', 'days': 30})
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/predict-batch returned {response.status_code}")
+        return len(response.get_json()['predictions']), 'rows'
+
+    def serve_analytics():
+        # A dashboard's handful of distinct slices, polled over and over with If-None-Match
+        queries = ['by=city', 'by=month', 'by=bloodType', 'by=city,month&bloodType=O%2B', 'by=dayOfWeek&month=5,6']
+        etags = {}
+        for i in range(SUITE_REQUESTS):
+            query = queries[i % len(queries)]
+            headers = {'If-None-Match': etags[query]} if query in etags else {}
+            response = state['client'].get(f'/api/analytics/cube?{query}', headers=headers)
+            if response.status_code not in (200, 304):
+                raise RuntimeError(f"/api/analytics/cube returned {response.status_code}")
+            etags[query] = response.headers['ETag']
+        return SUITE_REQUESTS, 'requests'
+
+    return [
+        ('generate', None, generate),
+        ('features', None, features),
+        ('train', None, train),
+        ('save_load', None, save_load),
+        ('predict_demand', None, predict_demand),
+        ('forecast', None, forecast),
+        ('analytics_cube', None, analytics_cube),
+        ('realtime_load', write_realtime, realtime_load),
+        ('realtime_analytics', None, realtime_analytics),
+        ('serve_predict', start_app, serve_predict),
+        ('serve_batch', None, serve_batch),
+        ('serve_analytics', None, serve_analytics)
+    ]
+
+def run_suite(sizes):
+    """Results of every pipeline stage for every size (number of cities)"""
+    results = []
+    state = {}
+    print(f"{'cities':>7} {'stage':<20} {'items':>9} {'seconds':>9} {'peak MB':>9} {'per second':>12}")
+    for n_cities in sizes:
+        for stage, setup, run in pipeline_stages(n_cities, state):
+            with contextlib.redirect_stdout(io.StringIO()):
+                if setup:
+                    setup()
+                (items, unit), seconds = timed(run)
+                # Tracing slows allocation-heavy code, so memory gets its own run
+                peak = traced_peak(run)
+            result = {
+                'stage': stage, 'cities': n_cities, 'items': items, 'unit': unit,
+                'seconds': round(seconds, 4), 'peakMB': round(peak / 1e6, 2),
+                'throughput': round(items / seconds, 1) if seconds > 0 else None
+            }
+            results.append(result)
+            print(f"{n_cities:>7} {stage:<20} {items:>9} {seconds:>9.3f} {result['peakMB']:>9.1f} "
+                  f"{result['throughput'] or 0:>12.1f} {unit}/s")
+    return results
+
+def compare_to_baseline(results, baseline, tolerance=SUITE_TOLERANCE):
+    """Print each stage against the baseline; returns the regressions"""
+    previous = {(r['stage'], r['cities']): r for r in baseline['results']}
+    regressions = []
+    print(f"\n{'cities':>7} {'stage':<20} {'seconds':>9} {'baseline':>9} {'ratio':>6} "
+          f"{'peak MB':>9} {'baseline':>9} {'ratio':>6}")
+    for result in results:
+        before = previous.get((result['stage'], result['cities']))
+        if before is None:
+            continue
+        time_ratio = result['seconds'] / max(before['seconds'], 1e-9)
+        memory_ratio = result['peakMB'] / max(before['peakMB'], 1e-9)
+        slower = time_ratio > tolerance and result['seconds'] - before['seconds'] > SUITE_MIN_SECONDS
+        bigger = memory_ratio > tolerance and result['peakMB'] - before['peakMB'] > SUITE_MIN_MB
+        flag = ' REGRESSION' if slower or bigger else ''
+        if flag:
+            regressions.append(result)
+        print(f"{result['cities']:>7} {result['stage']:<20} {result['seconds']:>9.3f} {before['seconds']:>9.3f} "
+              f"{time_ratio:>5.2f}x {result['peakMB']:>9.1f} {before['peakMB']:>9.1f} {memory_ratio:>5.2f}x{flag}")
+    return regressions
+
+def bench_suite(sizes, output=SUITE_RESULTS, baseline_path=SUITE_BASELINE, tolerance=SUITE_TOLERANCE,
+                save_baseline=False):
+    """Run the pipeline suite, write the results and check them against the baseline"""
+    output, baseline_path = os.path.abspath(output), os.path.abspath(baseline_path)
+    # Checked up front so a missing baseline fails before the run, not after it
+    if not save_baseline and not os.path.exists(baseline_path):
+        raise SystemExit(f"No baseline at {baseline_path}; run with --save-baseline to record one")
+    # No network: canned chat replies, models loaded only when a stage asks
+    os.environ.setdefault('CHAT_BACKEND', 'stub')
+    os.environ.setdefault('APP_STARTUP_MODE', 'lazy')
+
+    cwd = os.getcwd()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as tmp:
+        # Every file the pipeline writes (models, real-time log, analytics) lands here
+        os.chdir(tmp)
+        try:
+            os.makedirs('models')
+            results = run_suite(sizes)
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        'createdAt': datetime.now().isoformat(timespec='seconds'),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'sizes': sizes,
+        'results': results
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if save_baseline:
+        with open(baseline_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+        return
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(results, baseline, tolerance)
+    if regressions:
+        stages = ', '.join(f"{r['stage']} ({r['cities']} cities)" for r in regressions)
+        raise SystemExit(f"\nPerformance regression beyond {tolerance}x the baseline: {stages}")
+    print(f"\nNo stage regressed beyond {tolerance}x the baseline")
+
+def main():
+    parser = argparse.ArgumentParser(description="Blood demand pipeline benchmarks")
+    parser.add_argument('benchmark', choices=['ingestion', 'generate', 'storage', 'features', 'online', 'donors', 'donor-store', 'chat', 'engines', 'artifacts', 'suite'])
+    parser.add_argument('--sizes', type=int, nargs='+', default=None)
+    parser.add_argument('--output', default=SUITE_RESULTS, help="suite: results file")
+    parser.add_argument('--baseline', default=SUITE_BASELINE, help="suite: baseline results to compare with")
+    parser.add_argument('--tolerance', type=float, default=SUITE_TOLERANCE,
+                        help="suite: fail when a stage takes more than this times the baseline time or memory")
+    parser.add_argument('--save-baseline', action='store_true', help="suite: store these results as the baseline")
+    args = parser.parse_args()
+
+    if args.benchmark == 'ingestion':
+        bench_ingestion(args.sizes or [10000, 100000, 1000000])
+    elif args.benchmark == 'generate':
+        bench_generate(args.sizes or [8, 32, 128])
+    elif args.benchmark == 'storage':
+        bench_storage(args.sizes or [8, 64])
+    elif args.benchmark == 'features':
+        bench_features(args.sizes or [100000, 1000000, 2000000])
+    elif args.benchmark == 'online':
+        bench_online(args.sizes or [1000, 10000])
+    elif args.benchmark == 'donors':
+        bench_donors(args.sizes or [10000, 100000])
+    elif args.benchmark == 'donor-store':
+        bench_donor_store(args.sizes or [100000, 1000000])
+    elif args.benchmark == 'chat':
+        bench_chat(args.sizes or [10000, 100000])
+    elif args.benchmark == 'engines':
+        bench_engines(args.sizes or [100000, 400000])
+    elif args.benchmark == 'artifacts':
+        bench_artifacts(args.sizes or [100000])
+    elif args.benchmark == 'suite':
+        bench_suite(args.sizes or [8, 16], args.output, args.baseline, args.tolerance, args.save_baseline)
+
+if __name__ == "__main__":
+    main()
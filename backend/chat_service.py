@@ -0,0 +1,193 @@
+"""Blood-banking chat for app.py /chat.
+
+The topic guard is one precompiled regex (a prefix trie of every allowed
+topic) run once over the lower-cased message, instead of a substring scan
+per topic per request. Replies come from a pluggable backend:
+
+    CHAT_BACKEND=gemini   Gemini via google.generativeai (default)
+    CHAT_BACKEND=stub     canned local replies, for tests and benchmarks
+
+Backend calls run as coroutines on one event loop thread, but the caller
+(a server request thread) waits for the reply. Concurrency is bounded by a
+semaphore, each call has a timeout, callers beyond max_pending are
+rejected at once instead of waiting, and replies are cached on the
+normalized question. Keep max_pending below the server's request threads
+(app.py does), so a slow backend cannot occupy all of them.
+"""
+import asyncio
+import os
+import re
+import threading
+
+from inference_cache import InferenceCache
+from metrics import stage
+
+ALLOWED_TOPICS = [
+    "Smart Blood Banking", "Blood Demand Prediction", "Blood Supply Chain Optimization",
+    "Real-Time Blood Monitoring", "Smart Blood Donation System", "Automated Blood Management",
+    "Data-Driven Blood Bank", "Blood Inventory Forecasting",
+    "Blood Demand Forecasting", "Predictive Analytics for Blood Banking",
+    "Machine Learning Blood Demand Prediction", "Data-Driven Blood Demand Planning",
+    "Blood Usage Patterns", "Demand Prediction Models", "Time Series Analysis for Blood Demand",
+    "Potential Donor Identification", "Donor Prediction Algorithms",
+    "Donor Pattern Recognition", "Machine Learning Donor Prediction",
+    "Donor Database Management", "Predictive Donor Analytics",
+    "Donor Availability Prediction",
+    "Donor Matching Algorithms", "Blood Group Matching", "Recipient Compatibility Analysis",
+    "Blood Type Compatibility", "Donor-Recipient Matching System",
+    "Optimized Blood Matching", "Cross-Matching Blood Types",
+    "Blood Donation Camp Management", "Camp Promotion Strategies",
+    "Donation Camp Scheduling", "Donor Outreach Programs", "Community Blood Drives",
+    "Camp Location Optimization", "Volunteer Management",
+    "Donor Engagement", "Blood Donation Promotion", "Social Media Promotion for Blood Donation",
+    "Awareness Campaigns", "Blood Donation Drive Promotion",
+    "Promotional Strategies for Blood Banks",
+    "Donor Database Management", "Donor Retention Strategies", "Donor Communication",
+    "Tracking Donor History", "Managing Donor Data", "Donor Record Maintenance",
+    "Donation Frequency Monitoring",
+    "Artificial Intelligence in Blood Banking", "Data Analytics for Blood Banks",
+    "Integration with Health Databases", "Data-Driven Decision Making",
+    "Smart Blood Bank Management System", "Mobile App for Blood Donation",
+    "Donor Health Monitoring", "Blood Safety and Quality Control", "Post-Donation Health Tracking",
+    "Compliance with Blood Safety Standards", "Emergency Blood Availability",
+    "Health Data Privacy",
+    "Time Series Analysis", "Regression Models", "Clustering Techniques",
+    "Anomaly Detection", "Deep Learning Models", "Classification Algorithms",
+    "Feature Engineering", "Data Visualization for Blood Trends"
+]
+
+def trie_pattern(words):
+    """Regex source matching any of `words`, factored into a prefix trie.
+
+    A flat `a|b|c` alternation retries every topic at each position; the
+    trie form branches on one character at a time, like an Aho-Corasick scan.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if '' in node else body
+
+    return build(trie)
+
+# Matched against the lower-cased message: same result as `topic.lower() in message.lower()` for any topic
+TOPIC_PATTERN = re.compile(trie_pattern(sorted({topic.lower() for topic in ALLOWED_TOPICS})))
+OFF_TOPIC_REPLY = "Sorry, I can only answer questions about Blood Banking."
+MAX_OUTPUT_TOKENS = 300
+
+def is_on_topic(message):
+    return TOPIC_PATTERN.search(message.lower()) is not None
+
+def normalize_message(message):
+    """Cache key for a question: case, surrounding punctuation and repeated whitespace ignored"""
+    return ' '.join(message.lower().split()).strip(' ?!.')
+
+class ChatBusy(Exception):
+    """More chat requests are pending than the service accepts"""
+
+class GeminiBackend:
+    name = 'gemini'
+
+    def __init__(self, model_name="gemini-1.5-pro", max_output_tokens=MAX_OUTPUT_TOKENS):
+        import google.generativeai as genai  # Deferred: slow to import
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY not set in environment variables.")
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+        self.max_output_tokens = max_output_tokens
+
+    async def generate(self, message):
+        response = await self.model.generate_content_async(
+            message, generation_config={"max_output_tokens": self.max_output_tokens}
+        )
+        return response.candidates[0].content.parts[0].text
+
+class StubBackend:
+    """Local stand-in for Gemini: echoes the question after `latency` seconds"""
+    name = 'stub'
+
+    def __init__(self, latency=float(os.getenv("CHAT_STUB_LATENCY", 0))):
+        self.latency = latency
+        self.calls = 0
+
+    async def generate(self, message):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return f"[stub] You asked about: {message}"
+
+BACKENDS = {'gemini': GeminiBackend, 'stub': StubBackend}
+
+def create_backend(name=None):
+    name = name or os.getenv("CHAT_BACKEND", "gemini")
+    if name not in BACKENDS:
+        raise ValueError(f"CHAT_BACKEND must be one of {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+class ChatService:
+    """Topic guard, reply cache and bounded async calls to a chat backend"""
+
+    def __init__(self, backend, max_concurrency=8, max_pending=64, timeout_seconds=20,
+                 cache_size=1000, cache_ttl_seconds=3600):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.timeout_seconds = timeout_seconds
+        self.cache = InferenceCache(cache_size, cache_ttl_seconds)
+        self.pending = 0
+        self.pending_lock = threading.Lock()
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='chat-loop', daemon=True)
+        self.thread.start()
+        # Created on the loop so it binds to it
+        self.semaphore = asyncio.run_coroutine_threadsafe(self.create_semaphore(), self.loop).result()
+
+    async def create_semaphore(self):
+        return asyncio.Semaphore(self.max_concurrency)
+
+    async def call_backend(self, message):
+        async with self.semaphore:
+            with stage(f"chat.{self.backend.name}"):
+                return await self.backend.generate(message)
+
+    def generate(self, message):
+        """Backend reply, blocking the calling thread for at most timeout_seconds (queueing included).
+
+        Raises ChatBusy when max_pending callers are already waiting and
+        TimeoutError when the reply does not arrive in time.
+        """
+        with self.pending_lock:
+            if self.pending >= self.max_pending:
+                raise ChatBusy(f"{self.pending} chat requests pending")
+            self.pending += 1
+        try:
+            future = asyncio.run_coroutine_threadsafe(
+                asyncio.wait_for(self.call_backend(message), self.timeout_seconds), self.loop
+            )
+            try:
+                return future.result()
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Chat backend did not reply within {self.timeout_seconds}s")
+        finally:
+            with self.pending_lock:
+                self.pending -= 1
+
+    def reply(self, message):
+        """(reply text, cached) for a user message; off-topic messages never reach the backend"""
+        if not is_on_topic(message):
+            return OFF_TOPIC_REPLY, False
+        return self.cache.get_or_compute(normalize_message(message), self.backend.name,
+                                         lambda: self.generate(message))
+
+    def stats(self):
+        return {'backend': self.backend.name, 'pending': self.pending, 'maxConcurrency': self.max_concurrency,
+                'maxPending': self.max_pending, 'timeoutSeconds': self.timeout_seconds, 'cache': self.cache.stats()}
@@ -0,0 +1,111 @@
+"""Load and save the blood demand dataset in CSV, Parquet or Feather.
+
+Columnar files store city, blood_type and season as categoricals and date
+as a native datetime, so training does not re-parse strings on every run.
+CSV stays supported for import/export:
+
+    python dataset_io.py convert blood_demand_dataset.csv blood_demand_dataset.parquet
+"""
+import argparse
+import os
+
+import pandas as pd
+
+from generate_dataset import BLOOD_TYPES, SEASONS
+
+DATASET_STEM = 'blood_demand_dataset'
+# Preferred order among equally new files when no explicit path is given
+DATASET_FORMATS = [('parquet', '.parquet'), ('feather', '.feather'), ('csv', '.csv')]
+FORMAT_BY_EXTENSION = {'.parquet': 'parquet', '.feather': 'feather', '.arrow': 'feather', '.csv': 'csv'}
+
+def dataset_format(path):
+    """File format from the extension, defaulting to CSV"""
+    return FORMAT_BY_EXTENSION.get(os.path.splitext(path)[1], 'csv')
+
+def find_dataset(stem=DATASET_STEM):
+    """Path of the most recently written dataset file.
+
+    A stale Parquet file left next to a freshly generated CSV (or the other
+    way round) is not picked just for its format.
+    """
+    paths = [stem + extension for _, extension in DATASET_FORMATS if os.path.exists(stem + extension)]
+    if not paths:
+        raise FileNotFoundError(f"No {stem}.parquet, .feather or .csv found")
+    # max() keeps the first of equal mtimes, i.e. the preferred format
+    return max(paths, key=os.path.getmtime)
+
+def to_columnar_types(df, cities=None):
+    """Categorical city/blood_type/season and datetime date.
+
+    Category lists are fixed (all blood types and seasons, and `cities` when
+    given) so chunks written separately share one dictionary. Values outside
+    a fixed list become missing and are reported.
+    """
+    df = df.copy()
+    df['date'] = pd.to_datetime(df['date'])
+    categories = {'city': cities, 'blood_type': BLOOD_TYPES, 'season': SEASONS}
+    for column, values in categories.items():
+        if column in df:
+            converted = pd.Categorical(df[column], categories=values)
+            unknown = df[column][pd.isna(converted) & df[column].notna()]
+            if len(unknown):
+                print(f"Warning: {len(unknown)} rows with unknown {column} {sorted(map(str, unknown.unique()))}")
+            df[column] = converted
+    return df
+
+def load_dataset(path=None, columns=None):
+    """Load the dataset with columnar dtypes, whatever format it is stored in"""
+    path = path or find_dataset()
+    fmt = dataset_format(path)
+
+    if fmt == 'parquet':
+        df = pd.read_parquet(path, columns=columns)
+    elif fmt == 'feather':
+        from pyarrow import feather
+        # Memory-mapped when the file is uncompressed
+        df = feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+    else:
+        dtypes = {'city': 'category', 'blood_type': 'category', 'season': 'category'}
+        df = pd.read_csv(path, usecols=columns, dtype=dtypes, parse_dates=['date'])
+
+    return to_columnar_types(df) if fmt == 'csv' else df
+
+def save_dataset_frame(df, path, compression=None, fmt=None, cities=None):
+    """Write the dataset; columnar formats get categorical/datetime dtypes.
+
+    The format comes from the extension unless `fmt` is given; `cities`
+    fixes the city categories (default: df's own, if categorical).
+    """
+    fmt = fmt or dataset_format(path)
+    if fmt == 'csv':
+        frame = df.copy()
+        if pd.api.types.is_datetime64_any_dtype(frame['date']):
+            hourly = (frame['date'] != frame['date'].dt.normalize()).any()
+            frame['date'] = frame['date'].dt.strftime('%Y-%m-%d %H:%M' if hourly else '%Y-%m-%d')
+        frame.to_csv(path, index=False)
+        return
+
+    if cities is None and isinstance(df['city'].dtype, pd.CategoricalDtype):
+        cities = list(df['city'].cat.categories)
+    frame = to_columnar_types(df, cities)
+    if fmt == 'parquet':
+        frame.to_parquet(path, index=False, compression=compression or 'snappy')
+    else:
+        frame.reset_index(drop=True).to_feather(path, compression=compression or 'uncompressed')
+
+def convert(source, destination):
+    """Convert between CSV, Parquet and Feather"""
+    df = load_dataset(source)
+    save_dataset_frame(df, destination)
+    print(f"Converted {len(df)} records from {source} to {destination}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the blood demand dataset between storage formats")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    convert_parser = subparsers.add_parser('convert')
+    convert_parser.add_argument('source')
+    convert_parser.add_argument('destination')
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        convert(args.source, args.destination)
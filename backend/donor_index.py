@@ -0,0 +1,73 @@
+"""Precomputed top-donor ranking for /api/top-donors.
+
+Donors live in a DonorStore (numpy columns, chunk-loaded). A donor's
+predicted score depends only on their own row, so every donor is scored
+once (one batched scaler.transform + model.predict) into a column parallel
+to the store's. A lookup takes the group's rows and picks the
+page with np.partition, so it never sorts the whole group. Donors
+appended to updated_transfusion.csv (routes/auth.js does this on every
+donation) are picked up by refresh(), which reads and scores only the
+bytes added since the last read.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from donor_store import DONOR_CSV, NUMERIC_COLUMNS, DonorStore
+
+DONOR_FEATURES = NUMERIC_COLUMNS
+
+class TopDonorIndex:
+    """Predicted scores for every donor in a DonorStore, ranked per blood group on lookup"""
+
+    def __init__(self, model, scaler, csv_path=DONOR_CSV):
+        self.model = model
+        self.scaler = scaler
+        self.lock = threading.Lock()
+        self.store = DonorStore.from_csv(csv_path)
+        self.predicted = np.empty(0)
+        self.score_new()
+
+    def score_new(self):
+        """Score the store's donors that have no predicted score yet"""
+        start, end = len(self.predicted), len(self.store)
+        if end == start:
+            return 0
+        # float32 holds the raw values exactly; the scaler and model were fitted on float64
+        features = pd.DataFrame({column: self.store.numeric[column][start:end].astype(np.float64)
+                                 for column in DONOR_FEATURES})
+        scores = self.model.predict(self.scaler.transform(features))
+        self.predicted = np.concatenate([self.predicted, scores])
+        return end - start
+
+    def refresh(self):
+        """Pick up donors appended to the CSV since the last read.
+
+        Rescores everything if the store reloaded a replaced or truncated
+        file. Returns the number of donors scored.
+        """
+        with self.lock:
+            loads = self.store.loads
+            self.store.refresh()
+            if self.store.loads != loads:
+                self.predicted = np.empty(0)
+            return self.score_new()
+
+    def top(self, blood_group, k=5, page=1):
+        """(donors on the page, total donors in the group) for one blood group"""
+        with self.lock:
+            rows = self.store.group_rows(blood_group)
+            total, needed = len(rows), page * k
+            scores = self.predicted[rows]
+            if needed < total:
+                # Keep every donor tied with the needed-th best so ties still rank by position
+                cutoff = np.partition(-scores, needed - 1)[needed - 1]
+                kept = np.flatnonzero(-scores <= cutoff)
+                rows, scores = rows[kept], scores[kept]
+            order = np.lexsort((rows, -scores))[needed - k:needed]
+            rows, scores = rows[order], scores[order]
+            return [
+                {'ID': donor_id, 'Blood Group': self.store.groups[code], 'Predicted Donor Score': float(score)}
+                for donor_id, code, score in zip(self.store.ids_of(rows).tolist(), self.store.group_codes[rows], scores)
+            ], total
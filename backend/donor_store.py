@@ -0,0 +1,204 @@
+"""Compact in-memory donor table behind the top-donor index (donor_index.py).
+
+updated_transfusion.csv is read in blocks of whole rows into growable
+numpy columns: float32 recency/frequency/monetary, uint8 blood-group codes
+and a fixed-width bytes ID column, instead of a DataFrame of Python
+objects. Running min/max per feature are updated block by block, so the
+whole file is never held as a DataFrame.
+
+The normalized donor score is an affine function of the three raw
+features once min/max are known, so it is not stored: appending donors
+only updates min/max, and scores() evaluates it for the rows asked for.
+Donors appended to the CSV (routes/auth.js does this on every donation)
+are picked up by refresh(), which reads only the bytes added since the
+last read.
+"""
+import io
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+DONOR_CSV = 'updated_transfusion.csv'
+DONOR_CHUNK_BYTES = 8 << 20
+RECENCY, FREQUENCY, MONETARY = 'Recency (months)', 'Frequency (times)', 'Monetary (c.c. blood)'
+NUMERIC_COLUMNS = [RECENCY, FREQUENCY, MONETARY]
+# Score = 100 * (0.4 frequency + 0.4 monetary + 0.2 (1 - recency)), each min/max normalized
+SCORE_WEIGHTS = {FREQUENCY: 0.4, MONETARY: 0.4, RECENCY: -0.2}
+SCORE_OFFSET = 0.2
+
+class DonorStore:
+    """Donors as parallel numpy columns, grown by doubling"""
+
+    def __init__(self, capacity=1024):
+        self.lock = threading.Lock()
+        self.loads = 0          # CSV (re)loads, so dependents can tell a reload from an append
+        self.clear(capacity)
+
+    def clear(self, capacity=1024):
+        self.size = 0
+        self.numeric = {column: np.empty(capacity, dtype=np.float32) for column in NUMERIC_COLUMNS}
+        self.group_codes = np.empty(capacity, dtype=np.uint8)
+        self.ids = np.empty(capacity, dtype='S1')
+        self.groups = []        # blood group labels by code, as first seen
+        self.group_index = {}   # lower-cased label -> code
+        self.minimum = {column: np.inf for column in NUMERIC_COLUMNS}
+        self.maximum = {column: -np.inf for column in NUMERIC_COLUMNS}
+        self.csv_path = None
+        self.columns = None
+        self.offset = 0
+        self.inode = None
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        """Bytes held by the donor columns (used part only)"""
+        per_row = sum(array.itemsize for array in self.numeric.values()) + self.group_codes.itemsize + self.ids.itemsize
+        return self.size * per_row
+
+    def reserve(self, size):
+        capacity = len(self.group_codes)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for column, array in self.numeric.items():
+            self.numeric[column] = np.resize(array, capacity)
+        self.group_codes = np.resize(self.group_codes, capacity)
+        self.ids = np.resize(self.ids, capacity)
+
+    def encode_groups(self, blood_groups):
+        """uint8 codes for blood group labels, adding new labels as they appear"""
+        inverse, labels = pd.factorize(pd.Series(blood_groups).astype(str))
+        codes = np.empty(len(labels), dtype=np.uint8)
+        for i, label in enumerate(labels):
+            key = label.strip().lower()
+            if key not in self.group_index:
+                if len(self.groups) == 256:
+                    raise ValueError("DonorStore supports at most 256 blood groups")
+                self.group_index[key] = len(self.groups)
+                self.groups.append(label.strip())
+            codes[i] = self.group_index[key]
+        return codes[inverse]
+
+    def append(self, donors):
+        """Add a DataFrame of donors; returns how many were added"""
+        n = len(donors)
+        if n == 0:
+            return 0
+        start, end = self.size, self.size + n
+        self.reserve(end)
+
+        for column in NUMERIC_COLUMNS:
+            values = donors[column].to_numpy(dtype=np.float32)
+            self.numeric[column][start:end] = values
+            self.minimum[column] = min(self.minimum[column], float(np.nanmin(values)))
+            self.maximum[column] = max(self.maximum[column], float(np.nanmax(values)))
+        self.group_codes[start:end] = self.encode_groups(donors['Blood Group'])
+
+        ids = donors['ID'].astype(str).to_numpy(dtype=object)
+        try:
+            ids = ids.astype('S')
+        except UnicodeEncodeError:
+            ids = np.char.encode(ids.astype(str), 'utf-8')
+        if ids.itemsize > self.ids.itemsize:
+            self.ids = self.ids.astype(ids.dtype)
+        self.ids[start:end] = ids
+        self.size = end
+        return n
+
+    def normalized(self, column, rows=slice(None)):
+        """Min/max-normalized values of a feature (0 where every donor has the same value)"""
+        low, high = self.minimum[column], self.maximum[column]
+        values = self.numeric[column][:self.size][rows]
+        return (values - np.float32(low)) / np.float32(high - low if high > low else 1)
+
+    def scores(self, rows=slice(None)):
+        """Normalized donor score (0-100) of the donors selected by rows"""
+        total = np.full(len(self.group_codes[:self.size][rows]), SCORE_OFFSET, dtype=np.float32)
+        for column, weight in SCORE_WEIGHTS.items():
+            total += np.float32(weight) * self.normalized(column, rows)
+        return total * np.float32(100)
+
+    def group_rows(self, blood_group):
+        """Positions of the donors of one blood group (case-insensitive)"""
+        code = self.group_index.get(str(blood_group).strip().lower())
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self.group_codes[:self.size] == code)
+
+    def ids_of(self, rows=slice(None)):
+        """IDs of the selected donors as strings"""
+        return np.char.decode(self.ids[:self.size][rows], 'utf-8')
+
+    def frame(self, rows=slice(None)):
+        """DataFrame of the selected donors with their normalized columns and score"""
+        frame = pd.DataFrame({column: self.numeric[column][:self.size][rows] for column in NUMERIC_COLUMNS})
+        frame['Blood Group'] = pd.Categorical.from_codes(self.group_codes[:self.size][rows], self.groups)
+        frame['ID'] = self.ids_of(rows)
+        frame['Normalized Recency'] = self.normalized(RECENCY, rows)
+        frame['Normalized Frequency'] = self.normalized(FREQUENCY, rows)
+        frame['Normalized Monetary'] = self.normalized(MONETARY, rows)
+        frame['Normalized Donor Score'] = self.scores(rows)
+        return frame
+
+    @classmethod
+    def from_csv(cls, csv_path=DONOR_CSV, chunk_bytes=DONOR_CHUNK_BYTES):
+        """Load a donor CSV a block of rows at a time"""
+        store = cls()
+        store.load(csv_path, chunk_bytes)
+        return store
+
+    def load(self, csv_path, chunk_bytes=DONOR_CHUNK_BYTES):
+        """Append every donor in a CSV with a header row, chunk_bytes of rows at a time"""
+        with open(csv_path, 'rb') as f:
+            end = os.fstat(f.fileno()).st_size
+            header = b''
+            while not header.strip() and f.tell() < end:
+                header = f.readline()
+            self.columns = list(pd.read_csv(io.BytesIO(header)).columns)
+            while f.tell() < end:
+                block = f.read(min(chunk_bytes, end - f.tell()))
+                if f.tell() < end:
+                    # Finish the row the block stopped in
+                    block += f.readline()
+                self.append_csv(block)
+        self.csv_path = csv_path
+        self.loads += 1
+        # Rows appended later start with a newline at or after end
+        self.offset = end
+        self.inode = os.stat(csv_path).st_ino
+
+    def append_csv(self, content):
+        """Append header-less CSV rows"""
+        if not content.strip():
+            return 0
+        donors = pd.read_csv(io.BytesIO(content), header=None, names=self.columns,
+                             dtype={'ID': str, 'Blood Group': str})
+        return self.append(donors)
+
+    def refresh(self):
+        """Pick up donors appended to the CSV since the last read.
+
+        Reloads everything if the file was replaced or truncated. Returns the
+        number of donors added (all of them after a reload).
+        """
+        with self.lock:
+            stat = os.stat(self.csv_path)
+            if stat.st_ino != self.inode or stat.st_size < self.offset:
+                csv_path = self.csv_path
+                self.clear()
+                self.load(csv_path)
+                return self.size
+            if stat.st_size == self.offset:
+                return 0
+
+            with open(self.csv_path, 'rb') as f:
+                f.seek(self.offset)
+                appended = f.read(stat.st_size - self.offset)
+            # routes/auth.js writes each row as one "\n<row>" append, so the tail is whole rows
+            self.offset += len(appended)
+            return self.append_csv(appended)
@@ -0,0 +1,278 @@
+"""Lag and rolling-window demand features for BloodDemandPredictor.
+
+All series are handled in one pass over a frame sorted by (city,
+blood_type, date): lags are shifted reads within each series and moving
+averages come from differences of one cumulative sum, so there is no
+per-group Python callback.
+"""
+import numpy as np
+import pandas as pd
+
+SERIES_COLUMNS = ['city', 'blood_type']
+DEMAND_LAGS = (1, 7, 30)
+DEMAND_WINDOWS = (7, 30)
+
+def sort_series(df):
+    """Sort by (city, blood_type, date) and return (sorted df, position in series).
+
+    The three columns are factorized (sorted codes) and packed into one
+    int64 key; a stable argsort of that key gives the same order as
+    sort_values on the raw columns at a fraction of the cost.
+    """
+    key = np.zeros(len(df), dtype=np.int64)
+    for column in SERIES_COLUMNS + ['date']:
+        codes, uniques = pd.factorize(df[column], sort=True)
+        if column == 'date':
+            series_key = key
+        key = key * len(uniques) + codes
+    order = np.argsort(key, kind='stable')
+    df = df.take(order).reset_index(drop=True)
+
+    series_key = series_key[order]
+    starts = np.ones(len(df), dtype=bool)
+    starts[1:] = series_key[1:] != series_key[:-1]
+    index = np.arange(len(df))
+    series_start = np.maximum.accumulate(np.where(starts, index, 0))
+    return df, index - series_start
+
+def lagged(values, positions, lag):
+    """values shifted by `lag` rows within each series, NaN where out of range"""
+    out = np.full(len(values), np.nan)
+    valid = positions >= lag
+    out[valid] = values[np.flatnonzero(valid) - lag]
+    return out
+
+def rolling_mean(values, positions, window):
+    """Mean of up to `window` earlier rows of the series, NaN for its first row.
+
+    The row itself is left out, like its target in the serving-time features.
+    """
+    cumulative = np.concatenate([[0], np.cumsum(values, dtype=np.float64)])
+    end = np.arange(len(values))
+    count = np.minimum(positions, window)
+    out = np.full(len(values), np.nan)
+    valid = count > 0
+    out[valid] = (cumulative[end[valid]] - cumulative[end[valid] - count[valid]]) / count[valid]
+    return out
+
+def add_demand_features(df):
+    """Sort by series and date, then add demand_lag_* and demand_ma_* columns"""
+    df, positions = sort_series(df)
+    demand = df['demand'].to_numpy()
+
+    for lag in DEMAND_LAGS:
+        df[f'demand_lag_{lag}'] = lagged(demand, positions, lag)
+    for window in DEMAND_WINDOWS:
+        df[f'demand_ma_{window}'] = rolling_mean(demand, positions, window)
+    return df
+
+class OnlineFeatureStore:
+    """Recent demand per (city, blood_type) for serving-time features.
+
+    Each series keeps a ring buffer of its last max(DEMAND_LAGS) daily
+    observations plus running sums for every moving-average window, so
+    observe() and features() are O(1) and need no DataFrame.
+
+    Features describe the next, not yet observed day: demand_lag_k is the
+    k-th most recent observation and demand_ma_w the mean of the last w.
+    Lags beyond the available history fall back to the longest available
+    mean.
+
+    Observations are daily totals. A series remembers its newest day, so
+    demand replayed for that day again (real-time events arriving over
+    several updates) is added to it instead of starting a new day.
+    """
+
+    def __init__(self, history=max(DEMAND_LAGS), windows=DEMAND_WINDOWS):
+        self.history = history
+        self.windows = windows
+        self.series = {}
+
+    def observe(self, city, blood_type, demand, day=None):
+        """Append one day of demand to a series; `day` (YYYY-MM-DD) marks it as the newest day"""
+        state = self.series.get((city, blood_type))
+        if state is None:
+            state = self.series[(city, blood_type)] = {
+                'buffer': [0.0] * self.history, 'head': 0, 'count': 0,
+                'sums': {window: 0.0 for window in self.windows}, 'day': None, 'before': None, 'range': None
+            }
+        state['before'] = self.past_features(state)
+        state['day'] = day
+        buffer, head, count = state['buffer'], state['head'], state['count']
+        for window in self.windows:
+            if count >= window:
+                state['sums'][window] -= buffer[(head - window) % self.history]
+            state['sums'][window] += demand
+        buffer[head] = demand
+        state['head'] = (head + 1) % self.history
+        state['count'] = count + 1
+
+    def add_to_newest(self, city, blood_type, demand):
+        """Add demand to a series' newest day; returns that day's new total"""
+        state = self.series[(city, blood_type)]
+        newest = (state['head'] - 1) % self.history
+        state['buffer'][newest] += demand
+        for window in self.windows:
+            state['sums'][window] += demand
+        return state['buffer'][newest]
+
+    def newest_day(self):
+        """Newest observed day (YYYY-MM-DD) over every series, or None if no day was recorded"""
+        days = [state['day'] for state in self.series.values() if state['day'] is not None]
+        return max(days) if days else None
+    
+    def past_features(self, state):
+        """Training-style lag/rolling features for a series' next day: NaN where history is too short"""
+        count = state['count']
+        features = {f'demand_lag_{lag}': state['buffer'][(state['head'] - lag) % self.history] if count >= lag else np.nan
+                    for lag in DEMAND_LAGS}
+        for window in self.windows:
+            features[f'demand_ma_{window}'] = state['sums'][window] / min(count, window) if count else np.nan
+        return features
+
+    def recent(self, city, blood_type, n):
+        """Up to n most recent observations of a series, newest last"""
+        state = self.series[(city, blood_type)]
+        n = min(n, state['count'], self.history)
+        head, buffer = state['head'], state['buffer']
+        return [buffer[(head - n + i) % self.history] for i in range(n)]
+
+    def features(self, city, blood_type):
+        """demand_lag_* and demand_ma_* for the next day of a series"""
+        state = self.series.get((city, blood_type))
+        if state is None or state['count'] == 0:
+            raise ValueError(f"No demand history for {city} {blood_type}")
+        count, head, buffer = state['count'], state['head'], state['buffer']
+
+        features = {}
+        for window in self.windows:
+            features[f'demand_ma_{window}'] = state['sums'][window] / min(count, window)
+        fallback = features[f'demand_ma_{max(self.windows)}']
+        for lag in DEMAND_LAGS:
+            features[f'demand_lag_{lag}'] = buffer[(head - lag) % self.history] if count >= lag else fallback
+        return features
+
+    def replay(self, df):
+        """add_demand_features for daily rows that continue the store's series, observing each.
+
+        Gives the columns add_demand_features would give if the full history
+        were prepended (lags and moving averages from earlier days only)
+        while touching only the new rows. A row for a series' newest day is
+        added to that day: it gets the day's features and its demand becomes
+        the day's new total. Rows for days before the newest are left
+        without features (dropped as missing history) and not observed.
+        """
+        df, _ = sort_series(df)
+        days = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d').to_numpy()
+        demand = df['demand'].to_numpy().copy()
+        columns = {f'demand_lag_{lag}': np.full(len(df), np.nan) for lag in DEMAND_LAGS}
+        columns.update({f'demand_ma_{window}': np.full(len(df), np.nan) for window in self.windows})
+
+        for i, (city, blood_type, day) in enumerate(zip(df['city'], df['blood_type'], days)):
+            state = self.series.get((city, blood_type))
+            newest = state['day'] if state is not None else None
+            if newest is not None and day < newest:
+                continue
+            if day == newest:
+                features = state['before']
+                demand[i] = self.add_to_newest(city, blood_type, float(demand[i]))
+            else:
+                features = self.past_features(state) if state is not None else None
+                self.observe(city, blood_type, float(demand[i]), day)
+            if features is not None:
+                for name, value in features.items():
+                    columns[name][i] = value
+
+        df['demand'] = demand
+        for name, values in columns.items():
+            df[name] = values
+        return df
+
+    def to_dict(self):
+        """JSON-serializable state, for model artifact manifests"""
+        return {
+            'history': self.history,
+            'windows': list(self.windows),
+            'series': [{'city': city, 'bloodType': blood_type, 'buffer': state['buffer'], 'head': state['head'],
+                        'count': state['count'], 'sums': [state['sums'][window] for window in self.windows],
+                        'day': state['day'], 'before': state['before'], 'range': state['range']}
+                       for (city, blood_type), state in self.series.items()]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Store rebuilt from to_dict() output"""
+        store = cls(data['history'], tuple(data['windows']))
+        for entry in data['series']:
+            store.series[(entry['city'], entry['bloodType'])] = {
+                'buffer': list(entry['buffer']), 'head': entry['head'], 'count': entry['count'],
+                'sums': dict(zip(store.windows, entry['sums'])),
+                # Stores saved before days were tracked treat the next row as a new day
+                'day': entry.get('day'), 'before': entry.get('before'), 'range': entry.get('range')
+            }
+        return store
+
+    @classmethod
+    def from_frame(cls, df):
+        """Seed every series with the tail of its demand history in df and its (min, max) demand"""
+        store = cls()
+        df, _ = sort_series(df[SERIES_COLUMNS + ['date', 'demand']])
+        grouped = df.groupby(SERIES_COLUMNS, sort=False, observed=True)
+        tails = grouped.tail(store.history)
+        days = pd.to_datetime(tails['date']).dt.strftime('%Y-%m-%d')
+        for city, blood_type, day, demand in zip(tails['city'], tails['blood_type'], days, tails['demand']):
+            store.observe(city, blood_type, float(demand), day)
+        ranges = grouped['demand'].agg(['min', 'max'])
+        for (city, blood_type), low, high in zip(ranges.index, ranges['min'], ranges['max']):
+            store.series[(city, blood_type)]['range'] = [float(low), float(high)]
+        return store
+
+class SeriesBuffer:
+    """Recent demand of many series as one matrix, rolled forward a day at a time.
+
+    The vectorized counterpart of OnlineFeatureStore for recursive
+    forecasting: row i holds series i's history (oldest first) followed by
+    room for `days` more values, and features()/observe() work on every
+    series at once with the store's lag and moving-average rules.
+    clip() holds values to each series' historical range, where known.
+    """
+
+    def __init__(self, store, keys, days):
+        self.windows = store.windows
+        self.values = np.zeros((len(keys), store.history + days))
+        self.counts = np.empty(len(keys), dtype=np.int64)
+        self.low = np.full(len(keys), -np.inf)
+        self.high = np.full(len(keys), np.inf)
+        for i, (city, blood_type) in enumerate(keys):
+            state = store.series.get((city, blood_type))
+            if state is None or state['count'] == 0:
+                raise ValueError(f"No demand history for {city} {blood_type}")
+            recent = store.recent(city, blood_type, store.history)
+            self.values[i, store.history - len(recent):store.history] = recent
+            self.counts[i] = state['count']
+            if state.get('range') is not None:
+                self.low[i], self.high[i] = state['range']
+        self.end = store.history
+
+    def features(self):
+        """demand_lag_* and demand_ma_* arrays for the next day of every series"""
+        features = {}
+        for window in self.windows:
+            # Slots before a short series' first value are zero, so they add nothing to the sum
+            total = self.values[:, max(self.end - window, 0):self.end].sum(axis=1)
+            features[f'demand_ma_{window}'] = total / np.minimum(self.counts, window)
+        fallback = features[f'demand_ma_{max(self.windows)}']
+        for lag in DEMAND_LAGS:
+            features[f'demand_lag_{lag}'] = np.where(self.counts >= lag, self.values[:, self.end - lag], fallback)
+        return features
+
+    def clip(self, demand):
+        """(demand held to each series' historical range, number of values that were outside it)"""
+        clipped = np.clip(demand, self.low, self.high)
+        return clipped, int(np.count_nonzero(clipped != demand))
+
+    def observe(self, demand):
+        """Append one day of demand to every series"""
+        self.values[:, self.end] = demand
+        self.end += 1
+        self.counts += 1
@@ -1,50 +1,168 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+import argparse
 import random
 
-# Set random seed for reproducibility
-np.random.seed(42)
-random.seed(42)
+# Define cities and their characteristics
+CITIES = {
+    'Delhi': {'population': 32000000, 'hospitals': 150, 'base_demand': 1200},
+    'Mumbai': {'population': 25000000, 'hospitals': 180, 'base_demand': 1500},
+    'Bangalore': {'population': 13000000, 'hospitals': 120, 'base_demand': 800},
+    'Chennai': {'population': 11000000, 'hospitals': 100, 'base_demand': 600},
+    'Kolkata': {'population': 15000000, 'hospitals': 110, 'base_demand': 900},
+    'Hyderabad': {'population': 10000000, 'hospitals': 90, 'base_demand': 700},
+    'Pune': {'population': 7000000, 'hospitals': 70, 'base_demand': 500},
+    'Ahmedabad': {'population': 8000000, 'hospitals': 60, 'base_demand': 450}
+}
 
-def generate_blood_demand_dataset():
+BLOOD_TYPES = ['O+', 'A+', 'B+', 'AB+', 'O-', 'A-', 'B-', 'AB-']
+BLOOD_TYPE_DISTRIBUTION = [0.35, 0.25, 0.20, 0.08, 0.07, 0.03, 0.015, 0.005]
+
+# Indexed by month number (index 0 unused)
+SEASONAL_MULTIPLIER_BY_MONTH = np.array([np.nan, 0.9, 0.9, 1.0, 1.0, 1.4, 1.4,
+                                         1.2, 1.2, 1.2, 1.6, 1.6, 0.9])
+SEASONS = ['Spring', 'Summer', 'Autumn', 'Winter']
+SEASON_CODE_BY_MONTH = np.array([-1, 3, 3, 0, 0, 0, 1, 1, 1, 2, 2, 2, 3])
+
+# Rows per day for each supported granularity
+PERIODS_PER_DAY = {'D': 1, 'h': 24}
+DATE_FORMATS = {'D': '%Y-%m-%d', 'h': '%Y-%m-%d %H:%M'}
+
+def scaled_cities(n_cities):
+    """First n_cities of CITIES, padded with numbered copies for load tests"""
+    names = list(CITIES)
+    cities = {}
+    for i in range(n_cities):
+        name = names[i % len(names)]
+        cities[name if i < len(names) else f"{name}-{i // len(names)}"] = CITIES[name]
+    return cities
+
+def resolve_cities(cities):
+    """City profiles from None (built-in), a count or an explicit dict"""
+    if cities is None:
+        return CITIES
+    if isinstance(cities, int):
+        return scaled_cities(cities)
+    return cities
+
+def generate_blood_demand_dataset(start_date='2021-01-01', end_date='2024-12-31', cities=None,
+                                  freq='D', seed=42, legacy=False, categorical=False):
     """
     Generate a comprehensive blood demand dataset for machine learning
+
+    Builds the date x city x blood type grid with array operations and draws
+    all noise in batched calls on a Generator seeded with `seed`, so the same
+    arguments always give the same frame. `cities` is a dict like CITIES or a
+    number of cities; `freq` is 'D' (daily) or 'h' (hourly, demand scaled to
+    the hour). `categorical=True` keeps string columns as categoricals, which
+    is much smaller at load-test scale.
+
+    legacy=True runs the original row-by-row generator, which reproduces
+    datasets generated before vectorization bit for bit. It only knows the
+    daily 2021-2024 dataset for the built-in cities; other scale arguments
+    raise ValueError.
     """
-    
-    # Define cities and their characteristics
-    cities = {
-        'Delhi': {'population': 32000000, 'hospitals': 150, 'base_demand': 1200},
-        'Mumbai': {'population': 25000000, 'hospitals': 180, 'base_demand': 1500},
-        'Bangalore': {'population': 13000000, 'hospitals': 120, 'base_demand': 800},
-        'Chennai': {'population': 11000000, 'hospitals': 100, 'base_demand': 600},
-        'Kolkata': {'population': 15000000, 'hospitals': 110, 'base_demand': 900},
-        'Hyderabad': {'population': 10000000, 'hospitals': 90, 'base_demand': 700},
-        'Pune': {'population': 7000000, 'hospitals': 70, 'base_demand': 500},
-        'Ahmedabad': {'population': 8000000, 'hospitals': 60, 'base_demand': 450}
-    }
-    
-    blood_types = ['O+', 'A+', 'B+', 'AB+', 'O-', 'A-', 'B-', 'AB-']
-    blood_type_distribution = [0.35, 0.25, 0.20, 0.08, 0.07, 0.03, 0.015, 0.005]
-    
+    if legacy:
+        if (start_date, end_date, freq) != ('2021-01-01', '2024-12-31', 'D') or resolve_cities(cities) != CITIES:
+            raise ValueError("The legacy generator only produces the daily 2021-2024 dataset for the built-in cities")
+        return generate_blood_demand_dataset_legacy(seed)
+
+    cities = resolve_cities(cities)
+    if freq not in PERIODS_PER_DAY:
+        raise ValueError(f"Unsupported granularity {freq!r}; use one of {list(PERIODS_PER_DAY)}")
+
+    rng = np.random.default_rng(seed)
+    last_period = pd.Timestamp(end_date) + (pd.Timedelta(hours=23) if freq == 'h' else pd.Timedelta(0))
+    periods = pd.date_range(start_date, last_period, freq=freq)
+    period_fraction = 1 / PERIODS_PER_DAY[freq]
+
+    n_periods, n_cities, n_types = len(periods), len(cities), len(BLOOD_TYPES)
+    n = n_periods * n_cities * n_types
+
+    # Grid indices in date -> city -> blood type order
+    period_idx = np.repeat(np.arange(n_periods), n_cities * n_types)
+    city_idx = np.tile(np.repeat(np.arange(n_cities), n_types), n_periods)
+    type_idx = np.tile(np.arange(n_types), n_periods * n_cities)
+
+    city_info = list(cities.values())
+    populations = np.array([info['population'] for info in city_info])
+    hospitals = np.array([info['hospitals'] for info in city_info])
+    base_demands = np.array([info['base_demand'] for info in city_info], dtype=float)
+
+    # Base demand influenced by population and blood type distribution
+    base_demand = (base_demands[:, None] * np.array(BLOOD_TYPE_DISTRIBUTION)[None, :]).ravel()
+    base_demand = np.tile(base_demand, n_periods) * period_fraction
+
+    # Seasonal and day of week factors (weekends have different patterns)
+    months = periods.month.to_numpy().astype(np.int64)
+    days_of_week = periods.weekday.to_numpy().astype(np.int64)
+    seasonal_multiplier = SEASONAL_MULTIPLIER_BY_MONTH[months][period_idx]
+    day_multiplier = np.where(days_of_week >= 5, 1.1, 1.0)[period_idx]
+
+    # Random events (accidents, emergencies), weather and supply noise in batched draws
+    emergency_factor = np.where(rng.random(n) < 0.05, rng.exponential(0.1, n), 0.0)
+    weather_factor = rng.normal(1.0, 0.1, n)
+    supply_ratio = rng.uniform(0.8, 1.2, n)
+
+    # Calculate final demand, ensuring a minimum per period
+    demand = np.trunc(base_demand * seasonal_multiplier * day_multiplier * weather_factor
+                      + emergency_factor * 100 * period_fraction).astype(np.int64)
+    demand = np.maximum(demand, max(1, int(5 * period_fraction)))
+
+    # Supply availability (80-120% of demand typically)
+    supply = np.trunc(demand * supply_ratio).astype(np.int64)
+
+    city_codes = pd.Categorical.from_codes(city_idx, categories=list(cities))
+    type_codes = pd.Categorical.from_codes(type_idx, categories=BLOOD_TYPES)
+    season_codes = pd.Categorical.from_codes(SEASON_CODE_BY_MONTH[months][period_idx], categories=SEASONS)
+    date_codes = pd.Categorical.from_codes(period_idx, categories=periods.strftime(DATE_FORMATS[freq]))
+
+    df = pd.DataFrame({
+        'date': date_codes,
+        'city': city_codes,
+        'blood_type': type_codes,
+        'population': populations[city_idx],
+        'hospitals': hospitals[city_idx],
+        'month': months[period_idx],
+        'day_of_week': days_of_week[period_idx],
+        'season': season_codes,
+        'demand': demand,
+        'supply': supply,
+        'shortage': np.maximum(0, demand - supply),
+        'is_critical': supply < demand * 0.7,
+        'seasonal_multiplier': seasonal_multiplier,
+        'weather_factor': weather_factor
+    })
+
+    if not categorical:
+        for column in ['date', 'city', 'blood_type', 'season']:
+            df[column] = df[column].astype(str)
+    return df
+
+def generate_blood_demand_dataset_legacy(seed=42):
+    """Original row-by-row generator, kept for bit-exact reproduction"""
+    np.random.seed(seed)
+    random.seed(seed)
+
     # Generate data for 3 years
     start_date = datetime(2021, 1, 1)
     end_date = datetime(2024, 12, 31)
-    
+
     data = []
-    
+
     current_date = start_date
     while current_date <= end_date:
-        for city, city_info in cities.items():
-            for i, blood_type in enumerate(blood_types):
-                
+        for city, city_info in CITIES.items():
+            for i, blood_type in enumerate(BLOOD_TYPES):
+
                 # Base demand influenced by population and blood type distribution
-                base_demand = city_info['base_demand'] * blood_type_distribution[i]
-                
+                base_demand = city_info['base_demand'] * BLOOD_TYPE_DISTRIBUTION[i]
+
                 # Seasonal factors
                 month = current_date.month
                 seasonal_multiplier = 1.0
-                
+
                 # Summer peak (May-June)
                 if month in [5, 6]:
                     seasonal_multiplier = 1.4
@@ -57,33 +175,33 @@ def generate_blood_demand_dataset():
                 # Monsoon (July-September)
                 elif month in [7, 8, 9]:
                     seasonal_multiplier = 1.2
-                
+
                 # Day of week factor (weekends have different patterns)
                 day_of_week = current_date.weekday()
                 if day_of_week >= 5:  # Weekend
                     day_multiplier = 1.1
                 else:
                     day_multiplier = 1.0
-                
+
                 # Random events (accidents, emergencies)
                 emergency_factor = np.random.exponential(0.1) if random.random() < 0.05 else 0
-                
+
                 # Weather impact (simplified)
                 weather_factor = np.random.normal(1.0, 0.1)
-                
+
                 # Calculate final demand
-                demand = int(base_demand * seasonal_multiplier * day_multiplier * 
+                demand = int(base_demand * seasonal_multiplier * day_multiplier *
                            weather_factor + emergency_factor * 100)
-                
+
                 # Ensure minimum demand
                 demand = max(demand, 5)
-                
+
                 # Supply availability (80-120% of demand typically)
                 supply = int(demand * np.random.uniform(0.8, 1.2))
-                
+
                 # Critical shortage flag
                 is_critical = supply < demand * 0.7
-                
+
                 data.append({
                     'date': current_date.strftime('%Y-%m-%d'),
                     'city': city,
@@ -100,9 +218,9 @@ def generate_blood_demand_dataset():
                     'seasonal_multiplier': seasonal_multiplier,
                     'weather_factor': weather_factor
                 })
-        
+
         current_date += timedelta(days=1)
-    
+
     return pd.DataFrame(data)
 
 def get_season(month):
@@ -116,25 +234,177 @@ def get_season(month):
     else:
         return 'Winter'
 
-def save_dataset():
-    """Generate and save the dataset"""
+def iter_dataset_chunks(start_date='2021-01-01', end_date='2024-12-31', cities=None, freq='D',
+                        seed=42, chunk='month', categorical=False):
+    """Generate the dataset one month or one city at a time.
+
+    Each chunk gets its own RNG stream spawned from `seed`, so output is
+    reproducible for a given chunking. Rows are date-major within a chunk;
+    city chunks therefore come out city by city.
+    """
+    cities = resolve_cities(cities)
+
+    if chunk == 'month':
+        months = pd.period_range(start_date, end_date, freq='M')
+        ranges = [(max(pd.Timestamp(start_date), month.start_time), min(pd.Timestamp(end_date), month.end_time.normalize()))
+                  for month in months]
+        parts = [(first, last, cities) for first, last in ranges]
+    elif chunk == 'city':
+        parts = [(start_date, end_date, {name: info}) for name, info in cities.items()]
+    else:
+        raise ValueError(f"Unsupported chunking {chunk!r}; use 'month' or 'city'")
+
+    seeds = np.random.SeedSequence(seed).spawn(len(parts))
+    for (first, last, part_cities), part_seed in zip(parts, seeds):
+        yield generate_blood_demand_dataset(first, last, part_cities, freq, part_seed, categorical=categorical)
+
+class DatasetSummary:
+    """Running statistics printed after a dataset is written"""
+
+    def __init__(self):
+        self.rows = 0
+        self.first_date = None
+        self.last_date = None
+        self.cities = {}
+        self.blood_types = {}
+        self.city_demand = None
+        self.season_demand = None
+
+    def update(self, df):
+        self.rows += len(df)
+        first, last = df['date'].min(), df['date'].max()
+        self.first_date = first if self.first_date is None else min(self.first_date, first)
+        self.last_date = last if self.last_date is None else max(self.last_date, last)
+        self.cities.update(dict.fromkeys(df['city'].unique()))
+        self.blood_types.update(dict.fromkeys(df['blood_type'].unique()))
+        self.city_demand = self.accumulate(self.city_demand, df.groupby('city', observed=True)['demand'].agg(['sum', 'count']))
+        self.season_demand = self.accumulate(self.season_demand, df.groupby('season', observed=True)['demand'].agg(['sum', 'count']))
+
+    @staticmethod
+    def accumulate(totals, chunk_totals):
+        return chunk_totals if totals is None else totals.add(chunk_totals, fill_value=0)
+
+    @staticmethod
+    def means(totals, name):
+        means = (totals['sum'] / totals['count']).round(2)
+        means.name = name
+        return means
+
+    def report(self):
+        print(f"Dataset saved with {self.rows} records")
+        print(f"Date range: {self.first_date} to {self.last_date}")
+        print(f"Cities: {list(self.cities)}")
+        print(f"Blood types: {list(self.blood_types)}")
+
+        # Display sample statistics
+        print("\nSample Statistics:")
+        print(self.means(self.city_demand.sort_index(), 'demand'))
+        print("\nSeasonal averages:")
+        print(self.means(self.season_demand.sort_index(), 'demand'))
+
+def open_writer(path, fmt, cities):
+    """Return (write_chunk, close) for a CSV, Parquet or Feather file
+
+    Columnar formats store categorical city/blood_type/season (with the
+    full `cities` list as categories) and a native datetime date.
+    """
+    if fmt == 'csv':
+        state = {'header': True}
+        def write_chunk(df):
+            df.to_csv(path, mode='w' if state['header'] else 'a', header=state['header'], index=False)
+            state['header'] = False
+        return write_chunk, lambda: None
+
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError(f"Writing {fmt} files requires pyarrow (pip install pyarrow)")
+
+    from dataset_io import to_columnar_types
+
+    writer = {}
+    def write_chunk(df):
+        table = pa.Table.from_pandas(to_columnar_types(df, list(cities)), preserve_index=False)
+        if not writer:
+            if fmt == 'parquet':
+                writer['file'] = pa.parquet.ParquetWriter(path, table.schema)
+            else:
+                # Feather v2 is the Arrow IPC file format
+                writer['file'] = pa.ipc.new_file(path, table.schema)
+        writer['file'].write_table(table)
+    def close():
+        if writer:
+            writer['file'].close()
+    return write_chunk, close
+
+def save_dataset(path='blood_demand_dataset.csv', fmt=None, chunk=None, **options):
+    """Generate and save the dataset
+
+    With chunk='month' or 'city' the data is generated and written one chunk
+    at a time and the summary is accumulated from the same stream, so peak
+    memory stays at one chunk regardless of the total size. Without chunking
+    the whole frame is generated at once (and returned). The format is
+    taken from the file extension unless `fmt` is given.
+    """
+    from dataset_io import dataset_format, save_dataset_frame
+
+    fmt = fmt or dataset_format(path)
+    if chunk is not None and options.get('legacy'):
+        raise ValueError("The legacy generator cannot stream chunks")
+    cities = options['cities'] = resolve_cities(options.get('cities'))
     print("Generating blood demand dataset...")
-    df = generate_blood_demand_dataset()
-    
-    # Save to CSV
-    df.to_csv('blood_demand_dataset.csv', index=False)
-    print(f"Dataset saved with {len(df)} records")
-    print(f"Date range: {df['date'].min()} to {df['date'].max()}")
-    print(f"Cities: {df['city'].unique()}")
-    print(f"Blood types: {df['blood_type'].unique()}")
-    
-    # Display sample statistics
-    print("\nSample Statistics:")
-    print(df.groupby('city')['demand'].mean().round(2))
-    print("\nSeasonal averages:")
-    print(df.groupby('season')['demand'].mean().round(2))
-    
+    summary = DatasetSummary()
+    if chunk is None:
+        df = generate_blood_demand_dataset(**options)
+        save_dataset_frame(df, path, fmt=fmt, cities=list(cities))
+        summary.update(df)
+    else:
+        df = None
+        write_chunk, close = open_writer(path, fmt, cities)
+        try:
+            for part in iter_dataset_chunks(chunk=chunk, **options):
+                write_chunk(part)
+                summary.update(part)
+        finally:
+            close()
+
+    print(f"Saved to {path} ({fmt})")
+    summary.report()
     return df
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a synthetic blood demand dataset")
+    parser.add_argument('--start', default='2021-01-01', help="First date (YYYY-MM-DD)")
+    parser.add_argument('--end', default=None, help="Last date (YYYY-MM-DD), default 2024-12-31")
+    parser.add_argument('--years', type=int, default=None, help="Generate this many years from --start instead of --end")
+    parser.add_argument('--cities', type=int, default=None, help="Number of cities (extra cities repeat the built-in profiles)")
+    parser.add_argument('--freq', choices=list(PERIODS_PER_DAY), default='D', help="Daily (D) or hourly (h) rows")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--legacy', action='store_true', help="Use the original row-by-row generator")
+    parser.add_argument('--output', default='blood_demand_dataset.csv', help="Output file (.csv, .parquet or .feather)")
+    parser.add_argument('--chunk', choices=['month', 'city'], default=None,
+                        help="Stream the dataset to disk one month or one city at a time")
+    args = parser.parse_args()
+    if args.legacy:
+        scale_args = {'--start': args.start != '2021-01-01', '--end': args.end is not None,
+                      '--years': args.years is not None, '--cities': args.cities is not None,
+                      '--freq': args.freq != 'D', '--chunk': args.chunk is not None}
+        given = [name for name, changed in scale_args.items() if changed]
+        if given:
+            parser.error(f"--legacy cannot be combined with {', '.join(given)}")
+    return args
+
+def end_date_from_args(args):
+    if args.years is not None:
+        return (pd.Timestamp(args.start) + pd.DateOffset(years=args.years) - pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+    return args.end or '2024-12-31'
+
 if __name__ == "__main__":
-    dataset = save_dataset()
+    args = parse_args()
+    options = dict(start_date=args.start, end_date=end_date_from_args(args), cities=args.cities,
+                   freq=args.freq, seed=args.seed)
+    if args.legacy:
+        options['legacy'] = True
+    dataset = save_dataset(args.output, chunk=args.chunk, **options)
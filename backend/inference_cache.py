@@ -0,0 +1,93 @@
+"""Result cache and latency tracking for app.py inference endpoints.
+
+Dashboards poll /predict with the same inputs over and over, so results
+are memoized in an LRU cache whose entries also expire after a TTL. Each
+cache is tied to a model version: the first lookup with a different
+version clears it, so a hot-reloaded model never serves stale results.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+class InferenceCache:
+    """Thread-safe LRU + TTL cache keyed on normalized request inputs"""
+
+    def __init__(self, maxsize=10000, ttl_seconds=300):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.model_version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_or_compute(self, key, model_version, compute):
+        """Cached value for key under model_version, computing it on a miss.
+
+        Returns (value, hit). compute() runs outside the lock, so two
+        concurrent misses on one key may both compute; the results are equal.
+        """
+        now = time.monotonic()
+        with self.lock:
+            if model_version != self.model_version:
+                if self.entries:
+                    self.invalidations += 1
+                self.entries.clear()
+                self.model_version = model_version
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], True
+            self.misses += 1
+
+        value = compute()
+        with self.lock:
+            if model_version == self.model_version:
+                self.entries[key] = (now + self.ttl_seconds, value)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+        return value, False
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'ttlSeconds': self.ttl_seconds,
+                'modelVersion': self.model_version,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+class LatencyTracker:
+    """Percentiles over the most recent request durations"""
+
+    def __init__(self, window=10000):
+        self.durations = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, seconds):
+        # deque.append is atomic, so no lock is needed
+        self.durations.append(seconds)
+        self.count += 1
+
+    def percentile(self, durations, q):
+        """Nearest-rank percentile of sorted durations, in milliseconds"""
+        rank = max(0, min(len(durations) - 1, int(round(q / 100 * len(durations) + 0.5)) - 1))
+        return round(durations[rank] * 1000, 3)
+
+    def stats(self):
+        durations = sorted(self.durations)
+        if not durations:
+            return {'count': self.count, 'p50Ms': None, 'p99Ms': None}
+        return {'count': self.count, 'window': len(durations),
+                'p50Ms': self.percentile(durations, 50), 'p99Ms': self.percentile(durations, 99)}
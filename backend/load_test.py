@@ -0,0 +1,148 @@
+"""Throughput of serve.py as the worker count grows.
+
+For each worker count, starts serve.py on a free port, waits until the
+models are warm, then drives it with client processes for a fixed time
+and reports requests/s, requests/s per worker and latency percentiles.
+
+    python load_test.py --workers 1 2 4 --threads 8 --clients 16 --duration 10
+    python load_test.py --target cached     # identical /predict bodies (cache hits)
+    python load_test.py --target top-donors
+
+The client processes share the machine with the server, so use fewer
+clients than cores when measuring scaling on small machines.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+CITIES = ['Delhi', 'Mumbai', 'Bangalore', 'Chennai', 'Kolkata', 'Hyderabad', 'Pune', 'Ahmedabad']
+BLOOD_TYPES = ['O+', 'A+', 'B+', 'AB+', 'O-', 'A-', 'B-', 'AB-']
+
+def request_body(target, i):
+    """(path, JSON body) of the i-th request for a target"""
+    if target == 'predict':
+        # Distinct inputs, so nearly every request misses the cache
+        day = i // (len(CITIES) * len(BLOOD_TYPES)) % 365
+        return '/predict', {
+            'Date': (date(2025, 1, 1) + timedelta(days=day)).isoformat(),
+            'city': CITIES[i % len(CITIES)],
+            'blood_type': BLOOD_TYPES[i // len(CITIES) % len(BLOOD_TYPES)]
+        }
+    if target == 'cached':
+        return '/predict', {'Date': '2025-01-01', 'city': 'Delhi', 'blood_type': 'O+'}
+    return '/api/top-donors', {'bloodGroup': BLOOD_TYPES[i % len(BLOOD_TYPES)]}
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_until_warm(base_url, timeout):
+    """Poll /ready until the models and donor index are loaded (chat is not needed)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/ready", timeout=2) as response:
+                status = json.load(response)
+        except urllib.error.HTTPError as e:
+            status = json.load(e)
+        except OSError:
+            status = None
+        if status and all(status['components'][name]['state'] == 'ready' for name in ('models', 'donor_index')):
+            return
+        time.sleep(0.5)
+    raise TimeoutError(f"Server at {base_url} did not warm up within {timeout}s")
+
+def client(args):
+    """Send requests until the deadline; returns (ok, errors, latencies)"""
+    base_url, target, client_id, deadline = args
+    ok, errors, latencies = 0, 0, []
+    i = client_id * 1000003
+    while time.time() < deadline:
+        path, body = request_body(target, i)
+        i += 1
+        request = urllib.request.Request(
+            base_url + path, data=json.dumps(body).encode(), headers={'Content-Type': 'application/json'}
+        )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+            ok += 1
+        except (urllib.error.HTTPError, OSError):
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+    return ok, errors, latencies
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] if values else float('nan')
+
+def run(workers, threads, clients, duration, target, warmup_timeout):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, 'serve.py', '--workers', str(workers), '--threads', str(threads), '--port', str(port)],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_until_warm(base_url, warmup_timeout)
+        deadline = time.time() + duration
+        with multiprocessing.Pool(clients) as pool:
+            results = pool.map(client, [(base_url, target, c, deadline) for c in range(clients)])
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+    ok = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    latencies = [latency for r in results for latency in r[2]]
+    return {
+        'workers': workers,
+        'threads': threads,
+        'clients': clients,
+        'requests': ok,
+        'errors': errors,
+        'requestsPerSecond': ok / duration,
+        'p50Ms': percentile(latencies, 50) * 1000,
+        'p99Ms': percentile(latencies, 99) * 1000
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test serve.py at several worker counts")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--target', choices=['predict', 'cached', 'top-donors'], default='predict')
+    parser.add_argument('--warmup-timeout', type=float, default=120)
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, target {args.target}, {args.clients} clients, {args.duration:.0f}s per run")
+    print(f"{'workers':>8} {'req/s':>9} {'req/s/worker':>13} {'scaling':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    results = []
+    for workers in args.workers:
+        result = run(workers, args.threads, args.clients, args.duration, args.target, args.warmup_timeout)
+        baseline = results[0]['requestsPerSecond'] / results[0]['workers'] if results else result['requestsPerSecond'] / workers
+        result['scaling'] = result['requestsPerSecond'] / baseline / workers if baseline else float('nan')
+        results.append(result)
+        print(f"{workers:>8} {result['requestsPerSecond']:>9.1f} {result['requestsPerSecond'] / workers:>13.1f} "
+              f"{result['scaling']:>7.0%} {result['p50Ms']:>8.1f} {result['p99Ms']:>8.1f} {result['errors']:>7}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Stage timers, request metrics and batch-job logs.
+
+    with stage('model.predict'):
+        model.predict(X)
+
+(or @timed_stage('model.load') on a function) times a block into the
+bloodbank_stage_seconds histogram. app.py adds per-route request counters
+and latency histograms and serves everything in the Prometheus text
+format on /metrics. Each process keeps its own
+numbers; under serve.py a scrape reports the worker that answered it.
+
+Batch scripts wrap a run in batch_job(name): every stage timed inside it
+is also collected, and the run is appended as one JSON line (start time,
+duration, status, stage timings) to METRICS_BATCH_LOG.
+
+METRICS_ENABLED=0 turns stage() and batch_job() into a shared no-op
+context manager, makes timed_stage() return functions unchanged and
+leaves the Flask hooks unregistered.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') != '0'
+BATCH_LOG = os.getenv('METRICS_BATCH_LOG', 'batch_jobs.jsonl')
+PREFIX = 'bloodbank_'
+# Seconds; upper bounds of the histogram buckets (+Inf is implied)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Registry:
+    """Counters and histograms keyed by (metric name, label pairs)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.help = {}
+
+    def describe(self, name, help_text):
+        self.help[name] = help_text
+
+    def inc(self, name, labels=(), value=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=()):
+        key = (name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, list(h.counts), h.sum, h.count, h.buckets)
+                                for key, h in self.histograms.items())
+        lines, seen = [], set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in self.help:
+                    lines.append(f"# HELP {PREFIX}{name} {self.help[name]}")
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f"{PREFIX}{name}{format_labels(labels)} {value}")
+        for (name, labels), counts, total, count, buckets in histograms:
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ['+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(f"{PREFIX}{name}_bucket{format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{PREFIX}{name}_sum{format_labels(labels)} {total}")
+            lines.append(f"{PREFIX}{name}_count{format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+registry = Registry()
+registry.describe('stage_seconds', "Duration of instrumented pipeline stages")
+registry.describe('http_requests_total', "Flask requests by route, method and status")
+registry.describe('http_request_seconds', "Flask request latency by route")
+
+# The batch job a thread is running, if any
+current = threading.local()
+
+class Timer:
+    """Context manager that records its block's duration as a stage"""
+
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.started
+        registry.observe('stage_seconds', seconds, (('stage', self.name),))
+        job = getattr(current, 'job', None)
+        if job is not None:
+            job.stages.append({'stage': self.name, 'seconds': round(seconds, 6)})
+        return False
+
+class NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_TIMER = NullTimer()
+
+def stage(name):
+    """Time a block as stage `name` (a no-op when metrics are disabled)"""
+    return Timer(name) if METRICS_ENABLED else NULL_TIMER
+
+def timed_stage(name):
+    """Decorator form of stage(); returns the function untouched when metrics are disabled"""
+    def decorate(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+class BatchJob:
+    """Stage timings of one batch run, appended to the batch log as a JSON line"""
+
+    def __init__(self, name, log_path=BATCH_LOG):
+        self.name = name
+        self.log_path = log_path
+        self.stages = []
+
+    def __enter__(self):
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self.started = time.perf_counter()
+        self.outer, current.job = getattr(current, 'job', None), self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        current.job = self.outer
+        record = {
+            'job': self.name,
+            'startedAt': self.started_at,
+            'seconds': round(time.perf_counter() - self.started, 6),
+            'status': 'ok' if exc_type is None else 'error',
+            'error': None if exc_type is None else f"{exc_type.__name__}: {exc}",
+            'stages': self.stages
+        }
+        registry.observe('stage_seconds', record['seconds'], (('stage', f"job.{self.name}"),))
+        with open(self.log_path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+        return False
+
+def batch_job(name, log_path=BATCH_LOG):
+    """Collect the stages of a batch run and log them when it ends (a no-op when disabled)"""
+    return BatchJob(name, log_path) if METRICS_ENABLED else NULL_TIMER
@@ -0,0 +1,387 @@
+"""Compact on-disk format for BloodDemandPredictor.
+
+An artifact is a directory:
+
+    blood_demand_model/
+        manifest.json        format version, engine, feature schema, metrics,
+                             training-data hash, encoders, scaler, feature store
+        <stamp>-left.npy     tree node arrays, one file per field
+        ...
+
+Every tree of the ensemble is flattened into shared node arrays (children,
+split feature, threshold, leaf value), keeping only what prediction needs:
+about a third of the bytes of sklearn's node records. CompactTreeEnsemble
+predicts straight from those arrays, so they are memory-mapped rather than
+unpickled: loading parses the manifest, pages are read on first use and
+shared by every process that maps the same file.
+
+float32=True stores thresholds and leaf values as float32. The forest and
+GradientBoosting already compare float32 inputs, so their thresholds are
+rounded down and every split stays exact. HistGradientBoosting thresholds
+are often training values themselves, so rounding down would move those
+values across the split; they are rounded to nearest and compared with
+float32 inputs instead, which only changes the split of values within one
+float32 step above a threshold. compress=True keeps the arrays in one
+compressed .npz, which is smaller but read eagerly.
+
+A new save writes fresh array files and then swaps the manifest in with
+os.replace, so a reader never sees a mix of two versions. The previous
+version's arrays are kept until the save after that, so a reader that read
+the old manifest just before the swap can still open its files.
+"""
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+ARTIFACT_FORMAT = 1
+MANIFEST = 'manifest.json'
+INDEX_FIELDS = ['left', 'right', 'feature', 'bitset']
+FLAG_FIELDS = ['missing_left', 'categorical']
+FLOAT_FIELDS = ['threshold', 'value']
+# (tree, row) pairs walked at once by predict; bounds its working memory
+PREDICT_BLOCK_PAIRS = 1 << 18
+
+def data_hash(df):
+    """Content hash of a training frame, recorded in the manifest"""
+    return hashlib.sha1(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()
+
+class CompactTreeEnsemble:
+    """A tree ensemble held in flat node arrays.
+
+    `kind` is 'mean' (a forest: the average of the trees) or 'sum'
+    (boosting: init plus the sum of the already shrunk leaf values). Child
+    indices are global, so every tree is walked at once, one level per step.
+    Leaves have left == -1; a categorical split sends a category left when
+    its bit is set in bitsets[bitset[node]]; missing values follow
+    missing_left.
+    """
+
+    def __init__(self, arrays, kind, init=0.0, float32_inputs=False):
+        self.arrays = arrays
+        self.kind = kind
+        self.init = float(init)
+        self.float32_inputs = float32_inputs
+
+    @property
+    def n_trees(self):
+        return len(self.arrays['roots'])
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays.values())
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if self.float32_inputs:
+            # sklearn's trees compare float32 copies of the inputs
+            X = X.astype(np.float32)
+        block = max(1, PREDICT_BLOCK_PAIRS // max(self.n_trees, 1))
+        if len(X) <= block:
+            return self.predict_block(X)
+        return np.concatenate([self.predict_block(X[start:start + block]) for start in range(0, len(X), block)])
+
+    def predict_block(self, X):
+        a = self.arrays
+        n_rows, n_features = X.shape
+        flat = np.ascontiguousarray(X).ravel()
+        has_missing = bool(np.isnan(flat).any())
+        has_categorical = len(a['bitsets']) > 0
+        left, right, feature, threshold = a['left'], a['right'], a['feature'], a['threshold']
+
+        # Every (tree, row) pair walks down together; pairs leave once they reach a leaf
+        node = np.repeat(np.asarray(a['roots'], dtype=np.int64), n_rows)
+        pair = np.arange(len(node))
+        leaf_value = np.empty(len(node))
+        while node.size:
+            children = left[node]
+            at_leaf = children < 0
+            if at_leaf.any():
+                leaf_value[pair[at_leaf]] = a['value'][node[at_leaf]]
+                inner = ~at_leaf
+                node, pair, children = node[inner], pair[inner], children[inner]
+                if not node.size:
+                    break
+
+            x = flat[(pair % n_rows) * n_features + feature[node]]
+            go_left = x <= threshold[node]
+            if has_categorical:
+                categorical = np.flatnonzero(a['categorical'][node])
+                if categorical.size:
+                    codes = x[categorical]
+                    known = (codes >= 0) & (codes < a['bitsets'].shape[1] * 32)
+                    codes = np.where(known, codes, 0).astype(np.int64)
+                    words = a['bitsets'][a['bitset'][node[categorical]], codes >> 5]
+                    # Out-of-range codes (and NaN, which fails both comparisons) count as missing
+                    go_left[categorical] = ((words >> (codes & 31)) & 1).astype(bool) & known
+                    if not known.all():
+                        unknown = categorical[~known]
+                        go_left[unknown] = a['missing_left'][node[unknown]].astype(bool)
+            if has_missing:
+                missing = np.flatnonzero(np.isnan(x))
+                go_left[missing] = a['missing_left'][node[missing]].astype(bool)
+            node = np.where(go_left, children, right[node])
+
+        total = leaf_value.reshape(self.n_trees, n_rows).sum(axis=0)
+        if self.kind == 'mean':
+            total /= self.n_trees
+        return self.init + total
+
+    def append(self, other):
+        """A new ensemble with other's trees added (boosting inits add up)"""
+        if other.kind != self.kind:
+            raise ValueError(f"Cannot append a {other.kind} ensemble to a {self.kind} ensemble")
+        a, b = self.arrays, other.arrays
+        n_nodes, n_bitsets = len(a['left']), len(a['bitsets'])
+        shifted = {
+            'left': np.where(b['left'] >= 0, b['left'] + n_nodes, -1),
+            'right': np.where(b['right'] >= 0, b['right'] + n_nodes, -1),
+            'bitset': b['bitset'] + n_bitsets,
+            'roots': b['roots'] + n_nodes
+        }
+        arrays = {name: np.concatenate([a[name], shifted.get(name, b[name])]) for name in a}
+        init = self.init + other.init if self.kind == 'sum' else self.init
+        return CompactTreeEnsemble(arrays, self.kind, init, self.float32_inputs)
+
+    def as_sum(self):
+        """The same predictions as a 'sum' ensemble (a forest's leaf values divided by its size)"""
+        if self.kind == 'sum':
+            return self
+        arrays = dict(self.arrays)
+        arrays['value'] = arrays['value'] / self.n_trees
+        return CompactTreeEnsemble(arrays, 'sum', self.init, self.float32_inputs)
+
+    def only_for(self, first, second, pairs, scaler=None):
+        """This 'sum' ensemble applied only to rows whose (X[first], X[second]) is one of pairs.
+
+        pairs are integer codes. Every tree gets a chain of threshold splits
+        in front of it that checks each code within +-0.5, and other rows
+        (and missing values) reach a zero leaf. The init is folded into the
+        first tree so it is restricted too. `scaler` (a fitted
+        StandardScaler) maps the thresholds when the trees see scaled inputs.
+        """
+        if self.kind != 'sum':
+            raise ValueError("Only a 'sum' ensemble can be restricted to some rows")
+        groups = {}
+        for a, b in pairs:
+            groups.setdefault(int(a), set()).add(int(b))
+
+        def bounds(feature, code):
+            low, high = code - 0.5, code + 0.5
+            if scaler is not None:
+                low, high = [(value - scaler.mean_[feature]) / scaler.scale_[feature] for value in (low, high)]
+            return low, high
+
+        arrays = dict(self.arrays)
+        if self.init:
+            first_tree = np.zeros(len(arrays['left']), dtype=bool)
+            first_tree[arrays['roots'][0]:arrays['roots'][1] if self.n_trees > 1 else None] = True
+            arrays['value'] = np.where(first_tree & (arrays['left'] < 0), arrays['value'] + self.init, arrays['value'])
+
+        nodes = {name: [] for name in INDEX_FIELDS + FLAG_FIELDS + FLOAT_FIELDS}
+        n_nodes = len(arrays['left'])
+
+        def add(left=-1, right=-1, feature=0, threshold=0.0):
+            for name, value in [('left', left), ('right', right), ('feature', feature), ('bitset', 0),
+                                ('missing_left', 0), ('categorical', 0), ('threshold', threshold), ('value', 0.0)]:
+                nodes[name].append(value)
+            return n_nodes + len(nodes['left']) - 1
+
+        def equals(feature, code, match, other):
+            """Node sending rows with X[feature] == code to match and the rest to other"""
+            low, high = bounds(feature, code)
+            return add(add(other, match, feature, low), other, feature, high)
+
+        roots = []
+        for root in arrays['roots']:
+            zero = add()
+            node = zero
+            for a, bs in reversed(list(groups.items())):
+                matched = zero
+                for b in sorted(bs, reverse=True):
+                    matched = equals(second, b, int(root), matched)
+                node = equals(first, a, matched, node)
+            roots.append(node)
+
+        for name, values in nodes.items():
+            arrays[name] = np.concatenate([arrays[name], np.asarray(values, dtype=arrays[name].dtype)])
+        arrays['roots'] = np.asarray(roots, dtype=np.int64)
+        return CompactTreeEnsemble(arrays, 'sum', 0.0, self.float32_inputs)
+
+    @classmethod
+    def from_estimator(cls, model):
+        """Flatten a fitted RandomForest, GradientBoosting or HistGradientBoosting regressor"""
+        name = type(model).__name__
+        if name == 'RandomForestRegressor':
+            trees = [sklearn_tree_nodes(estimator.tree_) for estimator in model.estimators_]
+            return cls(concatenate_trees(trees), 'mean', 0.0, float32_inputs=True)
+        if name == 'GradientBoostingRegressor':
+            trees = [sklearn_tree_nodes(estimator.tree_, model.learning_rate) for estimator in model.estimators_[:, 0]]
+            init = 0.0 if model.init_ == 'zero' else model.init_.constant_[0][0]
+            return cls(concatenate_trees(trees), 'sum', init, float32_inputs=True)
+        if name == 'HistGradientBoostingRegressor':
+            columns, categories = hist_input_columns(model)
+            trees = [hist_tree_nodes(predictors[0], columns, categories) for predictors in model._predictors]
+            return cls(concatenate_trees(trees), 'sum', model._baseline_prediction.ravel()[0])
+        raise ValueError(f"Unsupported model type for a compact artifact: {name}")
+
+def sklearn_tree_nodes(tree, scale=1.0):
+    """Node arrays of one sklearn Tree (leaf values multiplied by scale)"""
+    return {
+        'left': tree.children_left, 'right': tree.children_right, 'feature': tree.feature,
+        'threshold': tree.threshold, 'value': tree.value[:, 0, 0] * scale,
+        'missing_left': tree.missing_go_to_left, 'categorical': np.zeros(tree.node_count, dtype=np.uint8),
+        'bitset': np.zeros(tree.node_count, dtype=np.int64), 'bitsets': np.zeros((0, 8), dtype=np.uint32)
+    }
+
+def hist_input_columns(model):
+    """(original column of each feature the trees see, {tree feature: category values}).
+
+    With categorical features, HistGradientBoosting moves them to the front
+    and ordinal-encodes them before the trees see them.
+    """
+    if model._preprocessor is None:
+        return np.arange(model.n_features_in_), {}
+    columns, categories = [], {}
+    for name, transformer, selected in model._preprocessor.transformers_:
+        selected = np.asarray(selected)
+        selected = np.flatnonzero(selected) if selected.dtype == bool else selected
+        if name == 'encoder':
+            for i, values in enumerate(transformer.categories_):
+                categories[len(columns) + i] = values
+        if name != 'remainder':
+            columns.extend(selected)
+    return np.asarray(columns), categories
+
+def hist_tree_nodes(predictor, columns, categories):
+    """Node arrays of one HistGradientBoosting TreePredictor, in original columns and category values"""
+    nodes = predictor.nodes
+    leaf = nodes['is_leaf'].astype(bool)
+    feature = nodes['feature_idx']
+    categorical = np.flatnonzero(nodes['is_categorical'].astype(bool) & ~leaf)
+
+    # One bitset per categorical split, over raw category values instead of ordinal codes
+    bitsets = np.zeros((len(categorical), 8), dtype=np.uint32)
+    bitset = np.zeros(len(nodes), dtype=np.int64)
+    for row, i in enumerate(categorical):
+        # A NaN category (always last) is missing values, which follow missing_left
+        values = categories[feature[i]]
+        values = values[~np.isnan(values)]
+        if not (np.all(values == np.round(values)) and values.min() >= 0 and values.max() < 256):
+            raise ValueError("Compact artifacts need categories coded as integers in [0, 256)")
+        encoded = predictor.raw_left_cat_bitsets[nodes['bitset_idx'][i]]
+        left = [value for code, value in enumerate(values.astype(np.int64)) if (encoded[code >> 5] >> (code & 31)) & 1]
+        if nodes['missing_go_to_left'][i]:
+            # Unknown categories are treated as missing
+            left += sorted(set(range(256)) - set(values.astype(np.int64)))
+        for value in left:
+            bitsets[row, value >> 5] |= np.uint32(1 << (value & 31))
+        bitset[i] = row
+
+    return {
+        'left': np.where(leaf, -1, nodes['left'].astype(np.int64)),
+        'right': np.where(leaf, -1, nodes['right'].astype(np.int64)),
+        'feature': columns[feature], 'threshold': nodes['num_threshold'], 'value': nodes['value'],
+        'missing_left': nodes['missing_go_to_left'], 'categorical': nodes['is_categorical'] & ~leaf,
+        'bitset': bitset, 'bitsets': bitsets
+    }
+
+def concatenate_trees(trees):
+    """Join per-tree node arrays, offsetting child and bitset indices"""
+    parts = {name: [] for name in INDEX_FIELDS + FLAG_FIELDS + FLOAT_FIELDS + ['bitsets', 'roots']}
+    n_nodes = n_bitsets = 0
+    for tree in trees:
+        for name in ['left', 'right']:
+            parts[name].append(np.where(tree[name] >= 0, tree[name] + n_nodes, -1))
+        parts['bitset'].append(tree['bitset'] + n_bitsets)
+        for name in ['feature', 'missing_left', 'categorical', 'threshold', 'value', 'bitsets']:
+            parts[name].append(tree[name])
+        parts['roots'].append([n_nodes])
+        n_nodes += len(tree['left'])
+        n_bitsets += len(tree['bitsets'])
+
+    arrays = {name: np.concatenate(values) for name, values in parts.items()}
+    for name in INDEX_FIELDS + ['roots']:
+        arrays[name] = arrays[name].astype(np.int32 if name != 'roots' else np.int64)
+    for name in FLAG_FIELDS:
+        arrays[name] = arrays[name].astype(np.uint8)
+    for name in FLOAT_FIELDS:
+        arrays[name] = arrays[name].astype(np.float64)
+    arrays['bitsets'] = arrays['bitsets'].reshape(-1, 8).astype(np.uint32)
+    return arrays
+
+def to_float32(ensemble):
+    """The ensemble's arrays with float32 thresholds and leaf values"""
+    arrays = dict(ensemble.arrays)
+    threshold = arrays['threshold']
+    rounded = threshold.astype(np.float32)
+    if ensemble.float32_inputs:
+        # x <= t and x <= round_down(t) agree for every float32 x
+        rounded = np.where(rounded > threshold, np.nextafter(rounded, np.float32(-np.inf)), rounded)
+    arrays['threshold'] = rounded
+    arrays['value'] = arrays['value'].astype(np.float32)
+    return arrays
+
+def write_artifact(path, manifest, ensemble, float32=False, compress=False):
+    """Write the ensemble's arrays, then swap in a manifest that points at them"""
+    os.makedirs(path, exist_ok=True)
+    arrays = to_float32(ensemble) if float32 else ensemble.arrays
+    stamp = f"{time.time_ns():x}"
+
+    if compress:
+        files = {'arrays': f"{stamp}-arrays.npz"}
+        np.savez_compressed(os.path.join(path, files['arrays']), **arrays)
+    else:
+        files = {name: f"{stamp}-{name}.npy" for name in arrays}
+        for name, array in arrays.items():
+            np.save(os.path.join(path, files[name]), np.ascontiguousarray(array))
+
+    manifest = {
+        **manifest,
+        'format': ARTIFACT_FORMAT,
+        'ensemble': {'kind': ensemble.kind, 'init': ensemble.init, 'float32Inputs': ensemble.float32_inputs or float32,
+                     'trees': ensemble.n_trees, 'nodes': int(len(arrays['left']))},
+        'arrays': {'files': files, 'float32': float32, 'compressed': compress,
+                   'bytes': int(sum(array.nbytes for array in arrays.values()))}
+    }
+    manifest_path = os.path.join(path, MANIFEST)
+    try:
+        with open(manifest_path) as f:
+            previous = set(json.load(f)['arrays']['files'].values())
+    except (OSError, ValueError, KeyError):
+        previous = set()
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    # Arrays older than the previous version; processes that still map them keep their pages
+    keep = previous | set(files.values())
+    for filename in os.listdir(path):
+        if filename != MANIFEST and filename not in keep:
+            try:
+                os.remove(os.path.join(path, filename))
+            except OSError:
+                pass
+    return manifest
+
+def read_artifact(path, mmap=True):
+    """(manifest, CompactTreeEnsemble) from an artifact directory or its manifest.json"""
+    if os.path.basename(path) == MANIFEST:
+        path = os.path.dirname(path)
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(f"Unsupported artifact format {manifest.get('format')} in {path}")
+
+    files = manifest['arrays']['files']
+    if manifest['arrays']['compressed']:
+        with np.load(os.path.join(path, files['arrays'])) as npz:
+            arrays = {name: npz[name] for name in npz.files}
+    else:
+        arrays = {name: np.load(os.path.join(path, filename), mmap_mode='r' if mmap else None)
+                  for name, filename in files.items()}
+    meta = manifest['ensemble']
+    return manifest, CompactTreeEnsemble(arrays, meta['kind'], meta['init'], meta['float32Inputs'])
@@ -0,0 +1,174 @@
+"""Hot-reloadable registry of the pickled models app.py serves.
+
+Models are registered by name with a file in the models directory and are
+loaded on a background thread, so startup does not wait for them. The
+thread then polls the directory: when a file's (mtime, size) changes and
+stays unchanged for one more poll, the new version is loaded off the
+request path and swapped in under a lock. Requests that already hold the
+old object keep using it; the next get() returns the new one. The
+previous version is kept for rollback().
+"""
+import os
+import threading
+import time
+
+MODELS_DIR = 'models'
+POLL_SECONDS = 2.0
+
+def load_pickle(path):
+    import joblib  # Deferred: importing joblib pulls in numpy
+    return joblib.load(path)
+
+class ModelUnavailable(LookupError):
+    """A registered model is not loaded (missing file, load error or still loading)"""
+
+class ModelRegistry:
+    """Named models, each with a current and a previous loaded version"""
+
+    def __init__(self, models_dir=MODELS_DIR, poll_seconds=POLL_SECONDS):
+        self.models_dir = models_dir
+        self.poll_seconds = poll_seconds
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def register(self, name, filename, loader=load_pickle):
+        """Add a model; `loader(path)` returns the object get(name) serves"""
+        self.entries[name] = {
+            'path': os.path.join(self.models_dir, filename),
+            'loader': loader,
+            'current': None,
+            'previous': None,
+            'seen': None,       # (mtime_ns, size) from the last poll
+            'attempted': None,  # fingerprint of the last load attempt
+            'error': None,
+            'loads': 0,
+            'ready': threading.Event()
+        }
+
+    def start(self):
+        """Load every model and start watching, without blocking the caller"""
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self.watch, name='model-registry', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop watching and wait for an in-progress load to finish"""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def after_fork(self):
+        """Resume watching in a forked worker, keeping the models loaded before the fork.
+
+        Threads do not survive fork(), so the worker gets a fresh lock and
+        watcher; files that have not changed since their last load are not reloaded.
+        """
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.start()
+
+    def watch(self):
+        first = True
+        while not self.stopped.is_set():
+            for name in list(self.entries):
+                self.poll(name, first)
+            first = False
+            self.stopped.wait(self.poll_seconds)
+
+    def poll(self, name, first=False):
+        """Reload a model if its file changed and has settled since the last poll"""
+        entry = self.entries[name]
+        try:
+            stat = os.stat(entry['path'])
+            fingerprint = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            fingerprint = None
+
+        settled = first or fingerprint == entry['seen']
+        entry['seen'] = fingerprint
+        if fingerprint is None:
+            if entry['current'] is None:
+                entry['error'] = f"{entry['path']} not found"
+            entry['ready'].set()
+        elif settled and fingerprint != entry['attempted']:
+            self.load(name, fingerprint)
+
+    def load(self, name, fingerprint=None):
+        """Load the file now and swap it in; a failed load keeps the current version"""
+        entry = self.entries[name]
+        entry['attempted'] = fingerprint
+        started = time.perf_counter()
+        try:
+            model = entry['loader'](entry['path'])
+        except Exception as e:
+            entry['error'] = f"{type(e).__name__}: {e}"
+            print(f"Model registry: failed to load {name} from {entry['path']}: {entry['error']}")
+        else:
+            entry['loads'] += 1
+            version = {
+                'version': entry['loads'],
+                'model': model,
+                'loadedAt': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'loadSeconds': round(time.perf_counter() - started, 4),
+                'fileModified': fingerprint and time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(fingerprint[0] / 1e9))
+            }
+            with self.lock:
+                entry['previous'], entry['current'] = entry['current'], version
+                entry['error'] = None
+            print(f"Model registry: loaded {name} v{version['version']} in {version['loadSeconds']}s")
+        finally:
+            entry['ready'].set()
+
+    def wait_settled(self, timeout=None):
+        """Block until every model has had its first load attempt"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for entry in self.entries.values():
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            if not entry['ready'].wait(remaining):
+                return False
+        return True
+
+    def get(self, name, timeout=None):
+        """Current object for a model, waiting up to `timeout` seconds for its first load"""
+        return self.get_versioned(name, timeout)[0]
+
+    def get_versioned(self, name, timeout=None):
+        """(object, version) of the current model, read together so they always match"""
+        entry = self.entries[name]
+        entry['ready'].wait(timeout)
+        current = entry['current']
+        if current is None:
+            raise ModelUnavailable(f"Model {name} is not available: {entry['error'] or 'still loading'}")
+        return current['model'], current['version']
+
+    def version(self, name):
+        """Version number of the current object, or None when nothing is loaded"""
+        current = self.entries[name]['current']
+        return current['version'] if current else None
+
+    def rollback(self, name):
+        """Swap the previous version back in (until the file changes again)"""
+        entry = self.entries[name]
+        with self.lock:
+            if entry['previous'] is None:
+                raise ModelUnavailable(f"Model {name} has no previous version")
+            entry['current'], entry['previous'] = entry['previous'], entry['current']
+        return entry['current']['version']
+
+    def status(self):
+        """Per-model version, load time and state, as JSON-ready dicts"""
+        status = {}
+        for name, entry in self.entries.items():
+            current, previous = entry['current'], entry['previous']
+            status[name] = {
+                'file': entry['path'],
+                'loaded': current is not None,
+                'previousVersion': previous['version'] if previous else None,
+                'error': entry['error'],
+                **({key: value for key, value in current.items() if key != 'model'} if current else {})
+            }
+        return status
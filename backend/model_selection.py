@@ -0,0 +1,156 @@
+"""Model selection for BloodDemandPredictor.
+
+Every candidate (a model family with one point of its parameter grid) is
+scored with rolling-origin cross-validation: each fold trains on all days
+before a cut-off and tests on the days that follow, so no fold sees the
+future. All (candidate, fold) fits run single-threaded in one process pool
+capped at max_workers cores, and each result carries its fit time and
+per-row predict time next to MAE/RMSE/R².
+
+HistGradientBoosting bins the features and treats the encoded city,
+blood type and season as categories rather than ordered numbers; it needs
+no feature scaling and fits and predicts far faster than the forest on
+large datasets. --engines limits training to some of the candidates.
+
+    python train_model.py --max-cores 4 --folds 3 \
+        --grid '{"GradientBoosting": {"max_depth": [3, 5]}}'
+    python train_model.py --engines HistGradientBoosting
+"""
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, HistGradientBoostingRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+# Label-encoded columns that HistGradientBoosting splits on as categories
+CATEGORICAL_FEATURES = ['city_encoded', 'blood_type_encoded', 'season_encoded']
+
+# name -> (estimator class, fixed parameters, default grid, trained on scaled features)
+CANDIDATES = {
+    'RandomForest': (RandomForestRegressor, {'random_state': 42}, {'n_estimators': [100]}, False),
+    'GradientBoosting': (GradientBoostingRegressor, {'random_state': 42}, {'n_estimators': [100]}, True),
+    'HistGradientBoosting': (HistGradientBoostingRegressor,
+                             {'random_state': 42, 'categorical_features': CATEGORICAL_FEATURES},
+                             {'max_iter': [200]}, False)
+}
+DEFAULT_FOLDS = 3
+MAX_CORES = int(os.getenv('TRAIN_MAX_CORES', os.cpu_count() or 1))
+
+def regression_metrics(y_true, y_pred):
+    """MAE, RMSE and R² of a set of predictions"""
+    return {
+        'mae': float(mean_absolute_error(y_true, y_pred)),
+        'rmse': float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        'r2': float(r2_score(y_true, y_pred))
+    }
+
+def build_estimator(name, params, feature_names, n_jobs=1):
+    """Unfitted estimator for a candidate; n_jobs applies to models that take it.
+
+    Categorical features are given by name and passed on as column
+    positions in feature_names, so the model can predict on plain arrays.
+    """
+    estimator_class, fixed, _, _ = CANDIDATES[name]
+    kwargs = {**fixed, **params}
+    if 'categorical_features' in kwargs:
+        kwargs['categorical_features'] = [list(feature_names).index(f) for f in kwargs['categorical_features']]
+    if 'n_jobs' in estimator_class().get_params():
+        kwargs['n_jobs'] = n_jobs
+    return estimator_class(**kwargs)
+
+def expand_grids(grids=None, engines=None):
+    """(name, params) for every point of every candidate's grid.
+
+    `grids` maps candidate names to grids that override the defaults for
+    the parameters they list; candidates not in it keep their default grid.
+    `engines` limits the candidates to the names it lists.
+    """
+    unknown = (set(grids or {}) | set(engines or [])) - set(CANDIDATES)
+    if unknown:
+        raise ValueError(f"Unknown candidate models: {', '.join(sorted(unknown))}")
+    points = []
+    for name, (_, _, default_grid, _) in CANDIDATES.items():
+        if engines and name not in engines:
+            continue
+        grid = {**default_grid, **(grids or {}).get(name, {})}
+        keys = sorted(grid)
+        for values in itertools.product(*(grid[key] for key in keys)):
+            points.append((name, dict(zip(keys, values))))
+    return points
+
+def rolling_origin_folds(dates, n_splits=DEFAULT_FOLDS):
+    """(train rows, test rows) per fold, in time order; a day is never split across the two"""
+    days, day_index = np.unique(np.asarray(dates), return_inverse=True)
+    folds = []
+    for train_days, test_days in TimeSeriesSplit(n_splits).split(days):
+        train_rows = np.flatnonzero(day_index <= train_days[-1])
+        test_rows = np.flatnonzero((day_index >= test_days[0]) & (day_index <= test_days[-1]))
+        folds.append((train_rows, test_rows))
+    return folds
+
+# Training data of a pool worker, sent once per process instead of once per task
+worker_data = {}
+
+def init_worker(X, y, feature_names):
+    worker_data['X'] = X
+    worker_data['y'] = y
+    worker_data['feature_names'] = feature_names
+
+def fit_fold(task):
+    """Fit one candidate on one fold; returns its metrics and timings"""
+    index, name, params, train_rows, test_rows = task
+    X, y = worker_data['X'], worker_data['y']
+    model = build_estimator(name, params, worker_data['feature_names'])
+    if CANDIDATES[name][3]:
+        model = make_pipeline(StandardScaler(), model)
+
+    started = time.perf_counter()
+    model.fit(X[train_rows], y[train_rows])
+    fit_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    y_pred = model.predict(X[test_rows])
+    predict_seconds = time.perf_counter() - started
+    return index, regression_metrics(y[test_rows], y_pred), fit_seconds, predict_seconds / len(test_rows)
+
+def select_model(X, y, dates, grids=None, n_splits=DEFAULT_FOLDS, max_workers=None, engines=None):
+    """Cross-validate every candidate; returns one result per candidate, best MAE first.
+
+    X is a DataFrame of the feature columns.
+
+    Each result has the model name and params, MAE/RMSE/R² averaged over
+    the folds, the mean fit time per fold and the predict time per row.
+    """
+    feature_names = list(X.columns)
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    points = expand_grids(grids, engines)
+    folds = rolling_origin_folds(dates, n_splits)
+    tasks = [(i, name, params, train_rows, test_rows)
+             for i, (name, params) in enumerate(points)
+             for train_rows, test_rows in folds]
+    max_workers = max(1, min(max_workers or MAX_CORES, len(tasks)))
+
+    if max_workers == 1:
+        init_worker(X, y, feature_names)
+        outcomes = [fit_fold(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers, initializer=init_worker, initargs=(X, y, feature_names)) as pool:
+            outcomes = list(pool.map(fit_fold, tasks))
+
+    results = []
+    for i, (name, params) in enumerate(points):
+        runs = [outcome for outcome in outcomes if outcome[0] == i]
+        result = {'model': name, 'params': params, 'folds': len(runs)}
+        for metric in ['mae', 'rmse', 'r2']:
+            result[metric] = float(np.mean([run[1][metric] for run in runs]))
+        result['fitSeconds'] = round(float(np.mean([run[2] for run in runs])), 3)
+        result['predictMicrosecondsPerRow'] = round(float(np.mean([run[3] for run in runs])) * 1e6, 3)
+        results.append(result)
+    return sorted(results, key=lambda result: result['mae'])
@@ -7,14 +7,34 @@ const router = express.Router();
 
 // Blood Analytics API Routes
 
+// Parsed analytics_data.json, re-read only when the file's mtime or size changes
+const analyticsPath = path.join(__dirname, '../analytics_data.json');
+let analyticsCache = { mtimeMs: null, size: null, data: null };
+
+function readAnalyticsData() {
+  let stat;
+  try {
+    stat = fs.statSync(analyticsPath);
+  } catch (error) {
+    return null;
+  }
+  if (stat.mtimeMs !== analyticsCache.mtimeMs || stat.size !== analyticsCache.size) {
+    analyticsCache = {
+      mtimeMs: stat.mtimeMs,
+      size: stat.size,
+      data: JSON.parse(fs.readFileSync(analyticsPath, 'utf8'))
+    };
+  }
+  return analyticsCache.data;
+}
+
 // Get blood demand analytics data
 router.get('/blood-demand', async (req, res) => {
   try {
-    // Try to read pre-generated analytics data
-    const analyticsPath = path.join(__dirname, '../analytics_data.json');
+    // Try to read pre-generated analytics data (res.json adds an ETag and answers If-None-Match with 304)
+    const analyticsData = readAnalyticsData();
     
-    if (fs.existsSync(analyticsPath)) {
-      const analyticsData = JSON.parse(fs.readFileSync(analyticsPath, 'utf8'));
+    if (analyticsData) {
       res.json(analyticsData);
     } else {
       // Return fallback mock data if analytics data doesn't exist
@@ -2,10 +2,16 @@ const express = require('express');
 const { BloodDonationRecord, BloodRequestRecord, BloodInventory } = require('../models/RealTimeData');
 const { spawn } = require('child_process');
 const fs = require('fs');
+const net = require('net');
 const path = require('path');
 
 const router = express.Router();
 
+// Persistent Python worker (python update_realtime_model.py --worker)
+const WORKER_HOST = process.env.REALTIME_WORKER_HOST || '127.0.0.1';
+const WORKER_PORT = parseInt(process.env.REALTIME_WORKER_PORT || '5055', 10);
+const WORKER_TIMEOUT_MS = 1000;
+
 // Record a new blood donation
 router.post('/donation', async (req, res) => {
   try {
@@ -50,10 +56,10 @@ router.post('/donation', async (req, res) => {
     await updateBloodInventory(hospitalId, bloodType, unitsCollected || 1, 'add');
 
     // Add to ML dataset
-    await addToMLDataset('donation', donation);
+    const dataPoint = await addToMLDataset('donation', donation);
 
     // Trigger real-time analytics update
-    await updateRealTimeAnalytics();
+    await updateRealTimeAnalytics(dataPoint);
 
     res.status(201).json({
       success: true,
@@ -121,10 +127,10 @@ router.post('/request', async (req, res) => {
     }
 
     // Add to ML dataset
-    await addToMLDataset('request', request);
+    const dataPoint = await addToMLDataset('request', request);
 
     // Trigger real-time analytics update
-    await updateRealTimeAnalytics();
+    await updateRealTimeAnalytics(dataPoint);
 
     res.status(201).json({
       success: true,
@@ -259,6 +265,20 @@ router.get('/dashboard', async (req, res) => {
   }
 });
 
+// Get throughput and queue-depth counters from the real-time worker
+router.get('/worker-stats', async (req, res) => {
+  const reply = await sendToRealtimeWorker([{ command: 'stats' }], true);
+
+  if (!reply) {
+    return res.status(503).json({
+      success: false,
+      error: 'Real-time worker is not running'
+    });
+  }
+
+  res.json(reply);
+});
+
 // Helper functions
 async function updateBloodInventory(hospitalId, bloodType, units, operation) {
   try {
@@ -323,18 +343,65 @@ async function addToMLDataset(type, record) {
     }
 
     fs.appendFileSync(filePath, csvLine);
-    
+
+    return dataPoint;
   } catch (error) {
     console.error('Error adding to ML dataset:', error);
   }
 }
 
-async function updateRealTimeAnalytics() {
+// Send newline-delimited JSON messages to the real-time worker.
+// Resolves with the first reply line when expectReply is set, true once
+// the messages are flushed otherwise, and null if the worker is unreachable.
+function sendToRealtimeWorker(messages, expectReply = false) {
+  return new Promise((resolve) => {
+    let settled = false;
+    let buffer = '';
+    const finish = (result) => {
+      if (!settled) {
+        settled = true;
+        socket.destroy();
+        resolve(result);
+      }
+    };
+
+    const socket = net.createConnection({ host: WORKER_HOST, port: WORKER_PORT }, () => {
+      const payload = messages.map((message) => JSON.stringify(message) + '\n').join('');
+      if (expectReply) {
+        socket.write(payload);
+      } else {
+        socket.end(payload, () => finish(true));
+      }
+    });
+
+    socket.setTimeout(WORKER_TIMEOUT_MS);
+    socket.on('data', (chunk) => {
+      buffer += chunk.toString();
+      const newline = buffer.indexOf('\n');
+      if (newline !== -1) {
+        try {
+          finish(JSON.parse(buffer.slice(0, newline)));
+        } catch (error) {
+          finish(null);
+        }
+      }
+    });
+    socket.on('timeout', () => finish(null));
+    socket.on('error', () => finish(null));
+  });
+}
+
+async function updateRealTimeAnalytics(dataPoint) {
   try {
+    // Hand the event to the resident worker when it is running
+    if (dataPoint && await sendToRealtimeWorker([dataPoint])) {
+      return;
+    }
+
     // Trigger ML model update with new data
     console.log('Triggering real-time analytics update...');
     
-    // This could spawn a Python process to retrain or update predictions
+    // Fall back to a one-shot Python process when no worker is listening
     const pythonProcess = spawn('python', ['update_realtime_model.py'], {
       cwd: __dirname.replace('routes', ''),
       stdio: 'inherit'
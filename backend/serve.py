@@ -0,0 +1,143 @@
+"""Pre-fork multi-worker server for app.py.
+
+The master process imports the app, loads the models, scalers, donor
+index and donor scores once, freezes the garbage collector and then forks
+the workers. Workers share those objects copy-on-write instead of each
+loading its own copy; gc.freeze() keeps the collector from touching (and
+so copying) the pre-fork heap. Each worker serves the shared listening
+socket with a fixed-size thread pool.
+
+The chat service (its event loop thread and the Gemini client) is not
+fork-safe, so each worker builds its own on a background thread after
+the fork. Each worker also resumes watching the
+models directory, so a changed pickle is reloaded per worker.
+
+    python serve.py --workers 4 --threads 8 --port 5000
+
+Workers and threads default to SERVE_WORKERS (CPU count) and SERVE_THREADS (8).
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# Nothing is built at import; the master warms what is fork-safe below
+os.environ['APP_STARTUP_MODE'] = 'lazy'
+
+from werkzeug.serving import BaseWSGIServer
+
+import app as app_module
+
+# Built in every worker after the fork
+PER_WORKER_COMPONENTS = ('chat',)
+RESPAWN_DELAY_SECONDS = 1.0
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug WSGI server that handles connections on a bounded thread pool"""
+
+    multithread = True
+
+    def __init__(self, listener, app, threads):
+        host, port = listener.getsockname()[:2]
+        super().__init__(host, port, app, fd=listener.fileno())
+        # Every worker wakes for each connection; the ones that lose the accept()
+        # race must get EAGAIN instead of blocking (and missing shutdown)
+        self.socket.setblocking(False)
+        self.pool = ThreadPoolExecutor(threads, thread_name_prefix='wsgi')
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+def warm_master():
+    """Load everything that can be shared with the workers, then quiesce threads"""
+    started = time.perf_counter()
+    startup = app_module.startup
+    startup.warm_up([name for name in startup.components if name not in PER_WORKER_COMPONENTS])
+    # The registry's watcher thread would not survive fork(); workers restart it
+    app_module.models.stop()
+    startup.record('master warm-up', started)
+    print(f"Master warmed up in {time.perf_counter() - started:.2f}s")
+
+def run_worker(listener, threads):
+    app_module.models.after_fork()
+    # Builds the per-worker components (the chat service) in the background
+    app_module.startup.mode = 'warm'
+    app_module.startup.start()
+
+    server = PooledWSGIServer(listener, app_module.app, threads)
+    # shutdown() blocks until serve_forever() returns, so it cannot run on the serving thread
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(f"Worker {os.getpid()} serving with {threads} threads")
+    server.serve_forever()
+    server.pool.shutdown(wait=True)
+
+def spawn(listener, threads):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        try:
+            run_worker(listener, threads)
+        except BaseException:
+            traceback.print_exc()
+            os._exit(1)
+        os._exit(0)
+    return pid
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork multi-worker server for the Flask app")
+    parser.add_argument('--host', default=os.getenv('SERVE_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('SERVE_PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('SERVE_WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--threads', type=int, default=int(os.getenv('SERVE_THREADS', 8)))
+    args = parser.parse_args()
+    # Workers size the chat service's pending bound from it (see app.create_chat_service)
+    os.environ['SERVE_THREADS'] = str(args.threads)
+
+    listener = socket.create_server((args.host, args.port), backlog=1024, reuse_port=False)
+
+    warm_master()
+    # Objects allocated so far are never collected in the workers, so their pages stay shared
+    gc.freeze()
+
+    workers = {spawn(listener, args.threads) for _ in range(args.workers)}
+    print(f"Master {os.getpid()} serving http://{args.host}:{args.port} with {args.workers} workers")
+
+    stopping = False
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            os.kill(pid, signal.SIGTERM)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited with status {status}; restarting")
+            time.sleep(RESPAWN_DELAY_SECONDS)  # Avoid a tight loop if workers keep crashing
+            workers.add(spawn(listener, args.threads))
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
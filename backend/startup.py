@@ -0,0 +1,119 @@
+"""Deferred initialization and startup timings for app.py.
+
+Heavy imports (pandas, sklearn, the Gemini client) and artifact loads are
+wrapped in Components that are built on first use. APP_STARTUP_MODE picks
+when that happens:
+
+    lazy   - on the first request that needs the component
+    warm   - on a background thread started at import (default)
+    eager  - before the app module finishes importing (old behaviour)
+
+Every build and deferred import is timed, and status() backs the
+readiness endpoint.
+"""
+import importlib
+import os
+import threading
+import time
+
+STARTUP_MODES = ('lazy', 'warm', 'eager')
+
+class Component:
+    """A piece of app state built at most once, on first get() or by warm-up.
+
+    A failed build is recorded and retried on the next get().
+    """
+
+    def __init__(self, name, factory, required=True, on_ready=None):
+        self.name = name
+        self.factory = factory
+        self.required = required
+        self.on_ready = on_ready
+        self.lock = threading.Lock()
+        self.value = None
+        self.state = 'cold'
+        self.seconds = None
+        self.error = None
+
+    def get(self):
+        if self.state == 'ready':
+            return self.value
+        with self.lock:
+            if self.state != 'ready':
+                self.state = 'warming'
+                started = time.perf_counter()
+                try:
+                    self.value = self.factory()
+                except Exception as e:
+                    self.state = 'failed'
+                    self.error = f"{type(e).__name__}: {e}"
+                    raise
+                finally:
+                    self.seconds = round(time.perf_counter() - started, 4)
+                self.state = 'ready'
+                self.error = None
+            if self.on_ready:
+                self.on_ready()
+        return self.value
+
+    def status(self):
+        return {'state': self.state, 'required': self.required, 'seconds': self.seconds, 'error': self.error}
+
+class Startup:
+    """Components of the app plus how long importing and warming them took"""
+
+    def __init__(self, mode=None, started=None):
+        self.mode = mode or os.getenv('APP_STARTUP_MODE', 'warm')
+        if self.mode not in STARTUP_MODES:
+            raise ValueError(f"APP_STARTUP_MODE must be one of {', '.join(STARTUP_MODES)}")
+        self.started = started or time.perf_counter()
+        self.components = {}
+        self.timings = {}
+        self.ready_after = None
+
+    def component(self, name, factory, required=True):
+        self.components[name] = Component(name, factory, required, on_ready=self.is_ready)
+        return self.components[name]
+
+    def record(self, name, since):
+        self.timings[name] = round(time.perf_counter() - since, 4)
+
+    def import_module(self, name):
+        """importlib.import_module, timing the first import"""
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        self.timings.setdefault(f"import {name}", round(time.perf_counter() - started, 4))
+        return module
+
+    def warm_up(self, names=None):
+        """Build every component (or just `names`) now; failures are left for status() to report"""
+        for component in self.components.values():
+            if names is not None and component.name not in names:
+                continue
+            try:
+                component.get()
+            except Exception as e:
+                print(f"Startup: {component.name} failed to warm up: {e}")
+
+    def start(self):
+        """Apply the startup mode once the app module has registered its components"""
+        if self.mode == 'eager':
+            self.warm_up()
+        elif self.mode == 'warm':
+            threading.Thread(target=self.warm_up, name='warm-up', daemon=True).start()
+
+    def is_ready(self):
+        ready = all(c.state == 'ready' for c in self.components.values() if c.required)
+        if ready and self.ready_after is None:
+            self.ready_after = round(time.perf_counter() - self.started, 4)
+        return ready
+
+    def status(self):
+        return {
+            'ready': self.is_ready(),
+            'mode': self.mode,
+            'uptimeSeconds': round(time.perf_counter() - self.started, 4),
+            'readyAfterSeconds': self.ready_after,
+            'components': {name: component.status() for name, component in self.components.items()},
+            'timings': self.timings
+        }
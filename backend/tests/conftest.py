@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# The backend is a flat set of scripts run from its own directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_dataset import generate_blood_demand_dataset
+from train_model import BloodDemandPredictor
+
+@pytest.fixture(scope='session')
+def dataset():
+    """Two cities, January to April 2024"""
+    df = generate_blood_demand_dataset(start_date='2024-01-01', end_date='2024-04-30', cities=2)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+def trained(df, engine='HistGradientBoosting'):
+    """Predictor trained on the rows before April"""
+    predictor = BloodDemandPredictor()
+    predictor.train_model(df[df['date'] < '2024-04-01'], folds=2, max_workers=1, engines=[engine])
+    return predictor
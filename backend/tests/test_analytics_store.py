@@ -0,0 +1,44 @@
+import pandas as pd
+
+from analytics_store import AnalyticsStore
+from update_realtime_model import mark_ingested, new_ingest_state, read_realtime_increment
+
+BASE = {
+    'regionalDemand': {'labels': ['Delhi'], 'datasets': [{'data': [0]}]},
+    'bloodTypeDistribution': {'labels': ['A+'], 'datasets': [{'data': [100.0]}]}
+}
+
+def requests(*units):
+    return pd.DataFrame({'date': '2024-04-01', 'city': 'Delhi', 'blood_type': 'A+', 'demand': list(units),
+                         'supply': 0, 'is_critical': False})
+
+def delhi_demand(store):
+    return store.render()['regionalDemand']['datasets'][0]['data'][0]
+
+def test_rows_applied_during_a_retrain_are_counted_once(tmp_path):
+    store = AnalyticsStore(str(tmp_path / 'aggregates.db'))
+    store.set_base(BASE)
+    store.apply_events(requests(1, 2), first_row=0)
+
+    # The retrain reads the rows applied so far; a row arrives while it trains
+    epoch, applied_rows = store.start_epoch()
+    store.apply_events(requests(4), first_row=2)
+    assert applied_rows == 2
+    assert delhi_demand(store) == 7
+
+    # Its snapshot counts the first two rows; the counters add only the third
+    store.set_base({**BASE, 'regionalDemand': {'labels': ['Delhi'], 'datasets': [{'data': [3]}]}}, epoch)
+    assert delhi_demand(store) == 7
+    store.close()
+
+def test_read_stops_at_the_applied_rows(tmp_path):
+    log = tmp_path / 'realtime_data.csv'
+    row = '2024-04-01,Delhi,A+,request,{},normal\n'
+    log.write_text('date,city,blood_type,type,units,urgency\n' + ''.join(row.format(units) for units in (1, 2, 4)))
+
+    end = mark_ingested(new_ingest_state(), 2, log)['offset']
+    rows, state, _ = read_realtime_increment(new_ingest_state(), log, end)
+
+    assert rows['demand'].tolist() == [1, 2]
+    assert state['rows'] == 2
+    assert read_realtime_increment(state, log)[0]['demand'].tolist() == [4]
@@ -0,0 +1,50 @@
+import os
+import threading
+import time
+
+import pytest
+
+os.environ.update(APP_STARTUP_MODE='lazy', CHAT_BACKEND='stub', SERVE_THREADS='2')
+
+import app as app_module
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+def test_chat_holds_at_most_half_the_server_threads(client):
+    service = app_module.chat.get()
+    assert service.max_pending == 1
+    service.backend.latency = 0.5
+    try:
+        waiting = threading.Thread(target=client.post, args=("/chat",), kwargs={'json': {'message': "Regression Models"}})
+        waiting.start()
+        while service.pending == 0:
+            time.sleep(0.01)
+
+        started = time.perf_counter()
+        response = client.post("/chat", json={'message': "Anomaly Detection"})
+        assert response.status_code == 503
+        assert time.perf_counter() - started < 0.1
+        waiting.join()
+    finally:
+        service.backend.latency = 0
+
+def test_lazy_top_donors_build_shows_in_readiness(client, tmp_path, monkeypatch):
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    (tmp_path / 'models').symlink_to(os.path.join(backend, 'models'))
+    (tmp_path / 'updated_transfusion.csv').write_text(
+        "Recency (months),Frequency (times),Monetary (c.c. blood),Blood Group,ID\n"
+        "2,50,12500,O+,a1\n21,1,250,O+,a2\n4,10,2500,B-,a3"
+    )
+    monkeypatch.chdir(tmp_path)
+    assert app_module.startup.components['donor_index'].state == 'cold'
+
+    response = client.post("/api/top-donors", json={'bloodGroup': 'o+'})
+    assert response.status_code == 200
+    assert [donor['ID'] for donor in response.get_json()] == ['a1', 'a2']
+
+    app_module.chat.get()
+    status = client.get("/ready")
+    assert status.get_json()['components']['donor_index']['state'] == 'ready'
+    assert status.status_code == 200
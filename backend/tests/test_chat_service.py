@@ -0,0 +1,25 @@
+import threading
+import time
+
+import pytest
+
+from chat_service import ChatBusy, ChatService, StubBackend
+
+def test_callers_beyond_max_pending_are_rejected_at_once():
+    service = ChatService(StubBackend(latency=0.5), max_concurrency=1, max_pending=1)
+    waiting = threading.Thread(target=service.generate, args=("Regression Models",))
+    waiting.start()
+    while service.pending == 0:
+        time.sleep(0.01)
+
+    started = time.perf_counter()
+    with pytest.raises(ChatBusy):
+        service.generate("Anomaly Detection")
+    assert time.perf_counter() - started < 0.1
+    waiting.join()
+    assert service.pending == 0
+
+def test_slow_backend_times_out():
+    service = ChatService(StubBackend(latency=1), timeout_seconds=0.05)
+    with pytest.raises(TimeoutError):
+        service.generate("Regression Models")
@@ -0,0 +1,15 @@
+import pandas as pd
+
+from conftest import trained
+
+def test_forecast_starts_after_the_newest_observed_day(dataset):
+    forecast = trained(dataset).forecast(days=3)
+    assert forecast['date'].min() == pd.Timestamp('2024-04-01')
+    assert forecast['date'].max() == pd.Timestamp('2024-04-03')
+
+def test_later_start_rolls_forward_from_the_newest_observed_day(dataset):
+    predictor = trained(dataset)
+    rolled = predictor.forecast(days=20)
+    later = predictor.forecast('2024-04-11', days=5)
+    expected = rolled[rolled['date'] >= '2024-04-11'].head(len(later)).reset_index(drop=True)
+    pd.testing.assert_frame_equal(later, expected)
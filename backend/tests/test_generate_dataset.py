@@ -0,0 +1,9 @@
+import pytest
+
+from generate_dataset import generate_blood_demand_dataset
+
+def test_legacy_rejects_scale_arguments():
+    with pytest.raises(ValueError):
+        generate_blood_demand_dataset(cities=2, legacy=True)
+    with pytest.raises(ValueError):
+        generate_blood_demand_dataset(end_date='2021-12-31', legacy=True)
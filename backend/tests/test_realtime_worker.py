@@ -0,0 +1,52 @@
+import json
+import threading
+
+import update_realtime_model as realtime
+
+HEADER = 'date,city,blood_type,type,units,urgency,is_emergency,weather,age,gender\n'
+
+def event_line(units):
+    return f'2024-04-01,Delhi,A+,request,{units},normal,false,sunny,30,M\n'
+
+def event(units):
+    return {'date': '2024-04-01', 'city': 'Delhi', 'blood_type': 'A+', 'type': 'request', 'units': units}
+
+def test_mark_ingested_skips_only_the_received_rows(tmp_path):
+    log = tmp_path / 'realtime_data.csv'
+    log.write_text(HEADER + event_line(1) + event_line(2) + event_line(3))
+
+    state = realtime.mark_ingested(realtime.new_ingest_state(), 2, log)
+    state['rows'] = 2
+    new_rows, state, rescanned = realtime.read_realtime_increment(state, log)
+
+    assert not rescanned
+    assert new_rows['demand'].tolist() == [3]
+    assert state['rows'] == 3
+
+def test_retrain_runs_off_the_consumer_thread(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'analytics_data.json').write_text(json.dumps({
+        'regionalDemand': {'labels': ['Delhi'], 'datasets': [{'data': [10]}]},
+        'bloodTypeDistribution': {'labels': ['A+'], 'datasets': [{'data': [100.0]}]}
+    }))
+    (tmp_path / 'realtime_data.csv').write_text(HEADER)
+    release = threading.Event()
+    monkeypatch.setattr(realtime, 'retrain_with_realtime_data', lambda: release.wait(5))
+
+    worker = realtime.RealtimeWorker(retrain_threshold=2)
+    with open('realtime_data.csv', 'a') as f:
+        f.write(event_line(1) + event_line(2))
+    worker.apply_batch([event(1), event(2)])
+
+    # The batch is applied while the retrain is still running
+    assert worker.retraining
+    assert worker.state['rows'] == 2
+    assert worker.stats()['retrains'] == 0
+
+    release.set()
+    for thread in threading.enumerate():
+        if thread.name == 'realtime-retrain':
+            thread.join(5)
+    assert not worker.retraining
+    assert worker.state['rows_at_retrain'] == 2
+    assert worker.stats()['retrains'] == 1
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import trained
+
+def series_queries(df, keys):
+    rows = df[pd.MultiIndex.from_frame(df[['city', 'blood_type']]).isin(keys) & (df['date'] == '2024-04-01')]
+    return rows[['city', 'blood_type', 'date', 'population', 'hospitals']]
+
+@pytest.mark.parametrize('engine', ['HistGradientBoosting', 'GradientBoosting', 'RandomForest'])
+def test_warm_start_leaves_untouched_series_unchanged(dataset, engine):
+    predictor = trained(dataset, engine)
+    city = dataset['city'].iloc[0]
+    touched = [(city, 'O+'), (city, 'A+')]
+    untouched = [key for key in dataset[['city', 'blood_type']].drop_duplicates().itertuples(index=False, name=None)
+                 if key not in touched]
+    april = dataset[dataset['date'] >= '2024-04-01']
+    new_rows = april[pd.MultiIndex.from_frame(april[['city', 'blood_type']]).isin(touched)]
+
+    X_untouched = predictor.batch_features(series_queries(dataset, untouched))
+    before = predictor.predict_matrix(X_untouched)
+    X, y = predictor.prepare_features(new_rows, predictor.feature_store)
+    error_before = predictor.evaluate(X, y)['mae']
+
+    assert predictor.warm_start(X, y)
+    np.testing.assert_allclose(predictor.predict_matrix(X_untouched), before, rtol=1e-9)
+    assert predictor.evaluate(X, y)['mae'] < error_before
+
+def test_warm_start_skips_windows_smaller_than_two_leaves(dataset):
+    predictor = trained(dataset, 'HistGradientBoosting')
+    city = dataset['city'].iloc[0]
+    new_rows = dataset[(dataset['date'] >= '2024-04-01') & (dataset['city'] == city)].head(13)
+    X, y = predictor.prepare_features(new_rows, predictor.feature_store)
+    model = predictor.model
+
+    assert len(X) < predictor.warm_start_rows()
+    assert not predictor.warm_start(X, y)
+    assert predictor.model is model
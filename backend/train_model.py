@@ -1,24 +1,59 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+import argparse
 import joblib
 import json
-from datetime import datetime, timedelta
+import os
+from analytics_cube import CUBE_PATH, AnalyticsCube
+from analytics_store import AnalyticsStore
+from dataset_io import find_dataset, load_dataset
+from feature_engine import add_demand_features, OnlineFeatureStore, SeriesBuffer
+from metrics import batch_job, stage, timed_stage
+from model_artifact import CompactTreeEnsemble, data_hash, read_artifact, write_artifact
+from model_selection import CANDIDATES, DEFAULT_FOLDS, MAX_CORES, build_estimator, regression_metrics, select_model
+from generate_dataset import CITIES, BLOOD_TYPES, SEASONS, SEASON_CODE_BY_MONTH, SEASONAL_MULTIPLIER_BY_MONTH
+from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+# Incremental retraining (see warm_start)
+WARM_START_TREES = 10
+MAX_ESTIMATORS = 300
+
+# Dashboard next-month prediction (see next_month_predictions)
+FORECAST_DAYS = 30
+TREND_THRESHOLD = 0.05
+# Most days a forecast rolls forward past the newest observation before its start (see forecast)
+MAX_FORECAST_GAP_DAYS = 3 * 366
+
 class BloodDemandPredictor:
     def __init__(self):
         self.model = None
         self.label_encoders = {}
         self.scaler = StandardScaler()
         self.feature_columns = []
+        self.feature_store = None
+        self.encodings = {}
+        self.metrics = None
+        self.scaled = False
+        self.selection = []
+        self.model_params = {}
+        self.data_hash = None
+        
+    def prepare_features(self, df, feature_store=None):
+        """Prepare features for machine learning.
         
-    def prepare_features(self, df):
-        """Prepare features for machine learning"""
+        With a feature_store, df holds only rows that follow the store's
+        history: lag/rolling features come from the store (which observes
+        the rows) and labels must already be known to the fitted encoders.
+        """
+        df = self.feature_frame(df, feature_store)
+        return df[self.feature_columns], df['demand']
+    
+    @timed_stage('features.prepare')
+    def feature_frame(self, df, feature_store=None):
+        """df with every feature column added and rows lacking lag history dropped"""
         df = df.copy()
         
         # Convert date to datetime
@@ -37,25 +72,13 @@ class BloodDemandPredictor:
         df['day_sin'] = np.sin(2 * np.pi * df['day_of_week'] / 7)
         df['day_cos'] = np.cos(2 * np.pi * df['day_of_week'] / 7)
         
-        # Lag features (previous demand)
-        df = df.sort_values(['city', 'blood_type', 'date'])
-        df['demand_lag_1'] = df.groupby(['city', 'blood_type'])['demand'].shift(1)
-        df['demand_lag_7'] = df.groupby(['city', 'blood_type'])['demand'].shift(7)
-        df['demand_lag_30'] = df.groupby(['city', 'blood_type'])['demand'].shift(30)
-        
-        # Rolling averages (simplified to avoid index issues)
-        df = df.sort_values(['city', 'blood_type', 'date']).reset_index(drop=True)
-        df['demand_ma_7'] = df.groupby(['city', 'blood_type'])['demand'].transform(lambda x: x.rolling(7, min_periods=1).mean())
-        df['demand_ma_30'] = df.groupby(['city', 'blood_type'])['demand'].transform(lambda x: x.rolling(30, min_periods=1).mean())
+        # Lag features (previous demand) and rolling averages, in one sorted pass
+        df = add_demand_features(df) if feature_store is None else feature_store.replay(df)
         
         # Encode categorical variables
         categorical_columns = ['city', 'blood_type', 'season']
         for col in categorical_columns:
-            if col not in self.label_encoders:
-                self.label_encoders[col] = LabelEncoder()
-                df[f'{col}_encoded'] = self.label_encoders[col].fit_transform(df[col])
-            else:
-                df[f'{col}_encoded'] = self.label_encoders[col].transform(df[col])
+            df[f'{col}_encoded'] = self.encode_column(col, df[col])
         
         # Select features for training
         feature_columns = [
@@ -71,93 +94,329 @@ class BloodDemandPredictor:
         df = df.dropna()
         
         self.feature_columns = feature_columns
-        return df[feature_columns], df['demand']
+        return df
     
-    def train_model(self, df):
-        """Train the machine learning model"""
+    def train_model(self, df, grids=None, folds=DEFAULT_FOLDS, max_workers=None, engines=None):
+        """Train the machine learning model.
+        
+        Candidates from model_selection.CANDIDATES (only `engines` when
+        given, with `grids` overriding their parameter grids) are
+        cross-validated on time-ordered folds in parallel, then the one
+        with the lowest MAE is refit on all rows.
+        """
         print("Preparing features...")
-        X, y = self.prepare_features(df)
+        frame = self.feature_frame(df)
+        X, y = frame[self.feature_columns], frame['demand']
+        max_workers = max_workers or MAX_CORES
         
         print(f"Training on {len(X)} samples with {len(X.columns)} features")
+        print(f"Cross-validating on {folds} rolling-origin folds with up to {max_workers} cores...")
+        with stage('train.cross_validate'):
+            self.selection = select_model(X, y, frame['date'], grids, folds, max_workers, engines)
         
-        # Split the data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42, shuffle=True
-        )
+        print(f"{'model':<22} {'params':<40} {'MAE':>7} {'RMSE':>7} {'R²':>6} {'fit (s)':>8} {'predict (us/row)':>17}")
+        for result in self.selection:
+            print(f"{result['model']:<22} {json.dumps(result['params']):<40} {result['mae']:>7.2f} "
+                  f"{result['rmse']:>7.2f} {result['r2']:>6.3f} {result['fitSeconds']:>8.2f} "
+                  f"{result['predictMicrosecondsPerRow']:>17.2f}")
         
-        # Scale features
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
+        best = self.selection[0]
+        self.model_name = best['model']
+        self.model_params = best['params']
+        self.data_hash = data_hash(df)
+        self.scaled = CANDIDATES[self.model_name][3]
+        # Cross-validated error of the chosen model, also the drift baseline of incremental updates
+        self.metrics = {metric: best[metric] for metric in ['mae', 'rmse', 'r2']}
         
-        # Train multiple models and choose the best
-        models = {
-            'RandomForest': RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1),
-            'GradientBoosting': GradientBoostingRegressor(n_estimators=100, random_state=42)
-        }
+        print(f"Refitting {self.model_name} on all samples...")
+        with stage('train.fit'):
+            if self.scaled:
+                self.scaler = StandardScaler().fit(X)
+            self.model = build_estimator(self.model_name, best['params'], self.feature_columns, n_jobs=max_workers)
+            self.model.fit(self.scaler.transform(X) if self.scaled else X, y)
+        
+        # Seed serving-time lag/rolling features with the latest history
+        self.feature_store = OnlineFeatureStore.from_frame(df)
+        self.encodings = {}
         
-        best_model = None
-        best_score = float('inf')
-        best_model_name = None
-        
-        for name, model in models.items():
-            print(f"Training {name}...")
-            if name == 'RandomForest':
-                model.fit(X_train, y_train)
-                y_pred = model.predict(X_test)
-            else:
-                model.fit(X_train_scaled, y_train)
-                y_pred = model.predict(X_test_scaled)
-            
-            mae = mean_absolute_error(y_test, y_pred)
-            rmse = np.sqrt(mean_squared_error(y_test, y_pred))
-            r2 = r2_score(y_test, y_pred)
-            
-            print(f"{name} - MAE: {mae:.2f}, RMSE: {rmse:.2f}, R²: {r2:.3f}")
-            
-            if mae < best_score:
-                best_score = mae
-                best_model = model
-                best_model_name = name
-        
-        self.model = best_model
-        self.model_name = best_model_name
-        
-        print(f"\nBest model: {best_model_name} with MAE: {best_score:.2f}")
-        return best_model, best_score
+        print(f"\nBest model: {self.model_name} {json.dumps(best['params'])} with MAE: {best['mae']:.2f}")
+        return self.model, best['mae']
+    
+    def online_features(self, city, blood_type, date, population, hospitals):
+        """Feature row for one prediction, read from the online feature store"""
+        if self.feature_store is None:
+            raise ValueError("Model has no online feature store; retrain it with this version")
+        
+        date = pd.Timestamp(date)
+        month = date.month
+        day_of_week = date.weekday()
+        season = self.get_season(month)
+        
+        features = self.feature_store.features(city, blood_type)
+        features.update({
+            'population': population,
+            'hospitals': hospitals,
+            'month': month,
+            'day_of_week': day_of_week,
+            'quarter': date.quarter,
+            'month_sin': np.sin(2 * np.pi * month / 12),
+            'month_cos': np.cos(2 * np.pi * month / 12),
+            'day_sin': np.sin(2 * np.pi * day_of_week / 7),
+            'day_cos': np.cos(2 * np.pi * day_of_week / 7),
+            'seasonal_multiplier': SEASONAL_MULTIPLIER_BY_MONTH[month],
+            'weather_factor': 1.0,  # Default value
+            'city_encoded': self.encode('city', city),
+            'blood_type_encoded': self.encode('blood_type', blood_type),
+            'season_encoded': self.encode('season', season)
+        })
+        return np.array([[features[column] for column in self.feature_columns]])
+    
+    def encode_column(self, column, values):
+        """LabelEncoder codes of a column, fitting the encoder on first use.
+        
+        The codes are the model's category ids for every engine (and the
+        label map saved with it), so each engine gets them. A categorical
+        column is encoded through its categories: only the few distinct
+        labels go through the encoder, the rows just index the result.
+        """
+        if column not in self.label_encoders:
+            self.label_encoders[column] = LabelEncoder().fit(np.asarray(values.unique()))
+        encoder = self.label_encoders[column]
+        if not isinstance(values.dtype, pd.CategoricalDtype) or (values.cat.codes < 0).any():
+            return encoder.transform(values)
+        
+        used = np.unique(values.cat.codes.to_numpy())
+        codes = np.zeros(len(values.cat.categories), dtype=np.int64)
+        codes[used] = encoder.transform(np.asarray(values.cat.categories[used]))
+        return codes[values.cat.codes.to_numpy()]
+    
+    def encoding(self, column):
+        """Cached {label: code} mapping of a fitted LabelEncoder"""
+        if column not in self.encodings:
+            classes = self.label_encoders[column].classes_
+            self.encodings[column] = {label: code for code, label in enumerate(classes)}
+        return self.encodings[column]
+    
+    def encode(self, column, value):
+        """Label-encode one value without going through LabelEncoder.transform"""
+        try:
+            return self.encoding(column)[value]
+        except KeyError:
+            raise ValueError(f"Unknown {column}: {value}")
+    
+    def observe_demand(self, city, blood_type, demand):
+        """Record a day of observed demand so lag/rolling features stay current"""
+        self.feature_store.observe(city, blood_type, float(demand))
+    
+    def predict_matrix(self, X):
+        """Raw model output for a feature matrix in feature_columns order"""
+        if self.model is None:
+            raise ValueError("Model not trained yet!")
+        if self.scaled:
+            with stage('scaler.transform'):
+                X = self.scaler.transform(X)
+        with stage('model.predict'):
+            return self.model.predict(X)
     
     def predict_demand(self, city, blood_type, date, population, hospitals):
         """Predict blood demand for specific parameters"""
         if self.model is None:
             raise ValueError("Model not trained yet!")
         
-        # Create prediction data
-        pred_data = pd.DataFrame({
-            'date': [date],
-            'city': [city],
-            'blood_type': [blood_type],
-            'population': [population],
-            'hospitals': [hospitals],
-            'month': [pd.to_datetime(date).month],
-            'day_of_week': [pd.to_datetime(date).weekday()],
-            'season': [self.get_season(pd.to_datetime(date).month)],
-            'seasonal_multiplier': [1.0],  # Default value
-            'weather_factor': [1.0],  # Default value
-            'demand': [0]  # Placeholder
-        })
+        # Lag and moving-average features come from recent observed demand
+        X = self.online_features(city, blood_type, date, population, hospitals)
+        return max(0, int(self.predict_matrix(X)[0]))
+    
+    def evaluate(self, X, y):
+        """Current model's MAE/RMSE/R² on prepared features"""
+        return regression_metrics(y, self.predict_matrix(X))
+    
+    def warm_start_rows(self):
+        """Fewest new rows a warm start fits on: two of the engine's smallest leaves.
+        
+        With fewer rows no stage can split, so the update would be one
+        constant shift of the series it touches.
+        """
+        params = build_estimator(self.model_name, self.model_params, self.feature_columns).get_params()
+        return 2 * params.get('min_samples_leaf', 1)
+    
+    @timed_stage('train.warm_start')
+    def warm_start(self, X, y, n_estimators=WARM_START_TREES):
+        """Add n_estimators trees (or boosting stages) fitted on X, y only.
         
-        # Add dummy historical data for lag features
-        X, _ = self.prepare_features(pred_data)
+        Existing trees are kept, so the cost depends on the size of the new
+        window, not on the history the model was first trained on. The new
+        trees fit what the current model gets wrong on X, starting from zero
+        (HistGradientBoosting's own baseline counts as one shrunk stage), and
+        apply only to the (city, blood_type) series in X: other series keep
+        their predictions exactly. The model becomes a 'sum'
+        CompactTreeEnsemble. Returns False, leaving the model unchanged, when
+        X has fewer than warm_start_rows() rows or MAX_ESTIMATORS is reached.
+        """
+        if self.model is None:
+            raise ValueError("Model not trained yet!")
+        if len(X) < self.warm_start_rows():
+            return False
+        ensemble = self.model
+        if not isinstance(ensemble, CompactTreeEnsemble):
+            ensemble = CompactTreeEnsemble.from_estimator(self.model)
+        if ensemble.n_trees + n_estimators > MAX_ESTIMATORS:
+            return False
         
-        # Handle missing lag features by filling with median values
-        X = X.fillna(X.median())
+        target = np.asarray(y, dtype=np.float64) - self.predict_matrix(X)
+        model = build_estimator(self.model_name, self.model_params, self.feature_columns)
+        # Boosting iterations for HistGradientBoosting, trees/stages otherwise
+        count = 'max_iter' if 'max_iter' in model.get_params() else 'n_estimators'
+        model.set_params(**{count: n_estimators})
+        if 'init' in model.get_params():
+            model.set_params(init='zero')
+        # Keep the scaler fitted on the full history
+        model.fit(self.scaler.transform(X) if self.scaled else np.asarray(X, dtype=np.float64), target)
         
-        if self.model_name == 'RandomForest':
-            prediction = self.model.predict(X)[0]
-        else:
-            X_scaled = self.scaler.transform(X)
-            prediction = self.model.predict(X_scaled)[0]
+        update = CompactTreeEnsemble.from_estimator(model).as_sum()
+        update.init *= model.get_params().get('learning_rate', 1.0)
+        series = np.unique(np.asarray(X[['city_encoded', 'blood_type_encoded']], dtype=np.int64), axis=0)
+        update = update.only_for(self.feature_columns.index('city_encoded'),
+                                 self.feature_columns.index('blood_type_encoded'), series,
+                                 self.scaler if self.scaled else None)
+        self.model = ensemble.as_sum().append(update)
+        return True
+    
+    def calendar_features(self, queries):
+        """Every feature except demand lags/moving averages, as columns for a frame of queries"""
+        dates = pd.to_datetime(queries['date'])
+        month = dates.dt.month.to_numpy()
+        day_of_week = dates.dt.weekday.to_numpy()
+        return {
+            'population': queries['population'].to_numpy(),
+            'hospitals': queries['hospitals'].to_numpy(),
+            'month': month,
+            'day_of_week': day_of_week,
+            'quarter': dates.dt.quarter.to_numpy(),
+            'month_sin': np.sin(2 * np.pi * month / 12),
+            'month_cos': np.cos(2 * np.pi * month / 12),
+            'day_sin': np.sin(2 * np.pi * day_of_week / 7),
+            'day_cos': np.cos(2 * np.pi * day_of_week / 7),
+            'seasonal_multiplier': SEASONAL_MULTIPLIER_BY_MONTH[month],
+            'weather_factor': np.ones(len(queries)),
+            'city_encoded': self.encode_many('city', queries['city']),
+            'blood_type_encoded': self.encode_many('blood_type', queries['blood_type']),
+            'season_encoded': self.encode_many('season', pd.Series(SEASONS)[SEASON_CODE_BY_MONTH[month]])
+        }
+    
+    def batch_features(self, queries):
+        """Feature matrix for a frame of queries (city, blood_type, date, population, hospitals)"""
+        if self.feature_store is None:
+            raise ValueError("Model has no online feature store; retrain it with this version")
+        columns = self.calendar_features(queries)
+        
+        # Lag/rolling features are looked up once per series, then broadcast
+        series = pd.MultiIndex.from_arrays([queries['city'], queries['blood_type']])
+        codes, uniques = pd.factorize(series)
+        per_series = [self.feature_store.features(city, blood_type) for city, blood_type in uniques]
+        for name in per_series[0]:
+            columns[name] = np.array([features[name] for features in per_series])[codes]
+        
+        return np.column_stack([columns[column] for column in self.feature_columns])
+    
+    def encode_many(self, column, values):
+        """Label-encode an array of values with the cached encodings"""
+        codes = pd.Series(np.asarray(values)).map(self.encoding(column))
+        if codes.isna().any():
+            raise ValueError(f"Unknown {column}: {np.asarray(values)[codes.isna().to_numpy()][0]}")
+        return codes.to_numpy()
+    
+    def predict_batch(self, queries):
+        """Predict demand for many queries with a single model call.
+        
+        `queries` is a DataFrame or list of dicts with city, blood_type, date,
+        population and hospitals; population/hospitals default to the city
+        profile in generate_dataset.CITIES. Returns the queries with a
+        predicted_demand column.
+        """
+        queries = pd.DataFrame(queries).reset_index(drop=True)
+        if queries.empty:
+            # Same columns as a non-empty result, so callers can index them
+            columns = ['city', 'blood_type', 'date', 'population', 'hospitals']
+            return queries.reindex(columns=list(dict.fromkeys(columns + list(queries.columns)))).assign(
+                predicted_demand=pd.Series(dtype='int64'))
+        
+        queries = self.with_city_profiles(queries)
+        predictions = self.predict_matrix(self.batch_features(queries))
+        queries['predicted_demand'] = np.maximum(predictions, 0).astype('int64')
+        return queries
+    
+    def with_city_profiles(self, queries):
+        """Fill missing population/hospitals from the city profiles in generate_dataset.CITIES"""
+        for column in ['population', 'hospitals']:
+            defaults = queries['city'].map({city: profile[column] for city, profile in CITIES.items()})
+            queries[column] = queries[column].fillna(defaults) if column in queries else defaults
+            if queries[column].isna().any():
+                raise ValueError(f"No {column} given for city {queries.loc[queries[column].isna(), 'city'].iloc[0]}")
+        return queries
+    
+    @timed_stage('model.forecast')
+    def forecast(self, start_date=None, days=30, cities=None, blood_types=None):
+        """Daily demand forecast for every city x blood type over `days` days.
+        
+        Defaults to every series in the feature store, starting the day after
+        the store's newest observed day. The forecast is recursive: each day
+        is one model call for all series, and its predictions become the
+        next day's lag/rolling inputs, as if they had been observed. A later
+        start_date is reached the same way: the days in between are forecast
+        and fed back but not returned. An earlier one uses the newest
+        lag/rolling state as is. Predictions outside a series' historical
+        demand range are clipped to it before they are fed back, so one bad
+        day cannot compound.
+        """
+        if self.feature_store is None:
+            raise ValueError("Model has no online feature store; retrain it with this version")
+        newest = self.feature_store.newest_day()
+        # Stores saved before days were tracked do not know their newest day
+        first = pd.Timestamp(newest) if newest is not None else pd.Timestamp.now().normalize()
+        first += pd.Timedelta(days=1)
+        start_date = pd.Timestamp(start_date) if start_date is not None else first
+        skipped = max((start_date - first).days, 0)
+        if skipped > MAX_FORECAST_GAP_DAYS:
+            raise ValueError(f"start date is more than {MAX_FORECAST_GAP_DAYS} days after the newest observed day {newest}")
+        if not skipped:
+            first = start_date
+        series = list(self.feature_store.series)
+        cities = cities or sorted({city for city, _ in series})
+        blood_types = blood_types or [b for b in BLOOD_TYPES if any(b == s[1] for s in series)]
+        
+        # Day-major grid: rows [day * n, (day + 1) * n) are every series on one day
+        n = len(cities) * len(blood_types)
+        days += skipped
+        dates = pd.date_range(first, periods=days, freq='D')
+        grid = self.with_city_profiles(pd.DataFrame({
+            'date': np.repeat(dates, n),
+            'city': np.tile(np.repeat(cities, len(blood_types)), days),
+            'blood_type': np.tile(blood_types, days * len(cities))
+        }))
+        if grid.empty:
+            return grid.assign(predicted_demand=pd.Series(dtype='int64'))
+        
+        calendar = self.calendar_features(grid)
+        buffer = SeriesBuffer(self.feature_store, list(zip(grid['city'][:n], grid['blood_type'][:n])), days)
+        demand_columns = [i for i, column in enumerate(self.feature_columns) if column not in calendar]
+        X = np.column_stack([calendar.get(column, np.zeros(len(grid))) for column in self.feature_columns])
+        
+        predictions = np.empty(len(grid))
+        clipped = 0
+        for day in range(days):
+            rows = slice(day * n, (day + 1) * n)
+            features = buffer.features()
+            for i in demand_columns:
+                X[rows, i] = features[self.feature_columns[i]]
+            predictions[rows], outside = buffer.clip(np.maximum(self.predict_matrix(X[rows]), 0))
+            clipped += outside
+            buffer.observe(predictions[rows])
+        if clipped:
+            print(f"Forecast: clipped {clipped} of {len(grid)} predictions to their series' historical range")
         
-        return max(0, int(prediction))
+        grid['predicted_demand'] = predictions.astype('int64')
+        return grid.iloc[skipped * n:].reset_index(drop=True)
     
     def get_season(self, month):
         """Map month to season"""
@@ -170,43 +429,160 @@ class BloodDemandPredictor:
         else:
             return 'Winter'
     
-    def save_model(self, filepath='blood_demand_model.pkl'):
-        """Save the trained model"""
-        model_data = {
-            'model': self.model,
-            'label_encoders': self.label_encoders,
-            'scaler': self.scaler,
-            'feature_columns': self.feature_columns,
-            'model_name': self.model_name
+    @timed_stage('model.save')
+    def save_model(self, filepath='blood_demand_model', float32=False, compress=False):
+        """Save the trained model as an artifact directory (see model_artifact).
+        
+        float32 and compress shrink the node arrays; a path ending in .pkl
+        writes the older single joblib pickle instead.
+        """
+        if filepath.endswith('.pkl'):
+            model_data = {
+                'model': self.model,
+                'label_encoders': self.label_encoders,
+                'scaler': self.scaler,
+                'feature_columns': self.feature_columns,
+                'model_name': self.model_name,
+                'model_params': self.model_params,
+                'scaled': self.scaled,
+                'feature_store': self.feature_store,
+                'metrics': self.metrics,
+                'selection': self.selection
+            }
+            # Write then rename, so a server watching the models directory never loads a partial file
+            joblib.dump(model_data, filepath + '.tmp')
+            os.replace(filepath + '.tmp', filepath)
+            print(f"Model saved to {filepath}")
+            return
+        
+        ensemble = self.model
+        if not isinstance(ensemble, CompactTreeEnsemble):
+            ensemble = CompactTreeEnsemble.from_estimator(self.model)
+        manifest = {
+            'modelName': self.model_name,
+            'modelParams': self.model_params,
+            'featureColumns': self.feature_columns,
+            'metrics': self.metrics,
+            'selection': self.selection,
+            'dataHash': self.data_hash,
+            'createdAt': datetime.now().isoformat(timespec='seconds'),
+            'labelClasses': {column: encoder.classes_.tolist() for column, encoder in self.label_encoders.items()},
+            'scaler': {
+                'mean': self.scaler.mean_.tolist(),
+                'scale': self.scaler.scale_.tolist(),
+                'var': self.scaler.var_.tolist(),
+                'samplesSeen': int(self.scaler.n_samples_seen_)
+            } if self.scaled else None,
+            'featureStore': self.feature_store.to_dict() if self.feature_store is not None else None
         }
-        joblib.dump(model_data, filepath)
-        print(f"Model saved to {filepath}")
+        manifest = write_artifact(filepath, manifest, ensemble, float32, compress)
+        print(f"Model saved to {filepath} ({manifest['arrays']['bytes'] / 1e6:.1f} MB of node arrays)")
     
-    def load_model(self, filepath='blood_demand_model.pkl'):
-        """Load a trained model"""
-        model_data = joblib.load(filepath)
-        self.model = model_data['model']
-        self.label_encoders = model_data['label_encoders']
-        self.scaler = model_data['scaler']
-        self.feature_columns = model_data['feature_columns']
-        self.model_name = model_data['model_name']
+    @timed_stage('model.load')
+    def load_model(self, filepath='blood_demand_model', mmap=True):
+        """Load a trained model from an artifact directory (or its manifest.json) or a .pkl file.
+        
+        Artifact node arrays are memory-mapped unless mmap is False.
+        """
+        if filepath.endswith('.pkl'):
+            model_data = joblib.load(filepath)
+            self.model = model_data['model']
+            self.label_encoders = model_data['label_encoders']
+            self.scaler = model_data['scaler']
+            self.feature_columns = model_data['feature_columns']
+            self.model_name = model_data['model_name']
+            self.model_params = model_data.get('model_params', {})
+            self.scaled = model_data.get('scaled', self.model_name != 'RandomForest')
+            self.selection = model_data.get('selection', [])
+            self.feature_store = model_data.get('feature_store')
+            self.metrics = model_data.get('metrics')
+            self.data_hash = None
+            self.encodings = {}
+            print(f"Model loaded from {filepath}")
+            return
+        
+        manifest, self.model = read_artifact(filepath, mmap)
+        self.model_name = manifest['modelName']
+        self.model_params = manifest['modelParams']
+        self.feature_columns = manifest['featureColumns']
+        self.metrics = manifest['metrics']
+        self.selection = manifest['selection']
+        self.data_hash = manifest['dataHash']
+        self.label_encoders = {}
+        for column, classes in manifest['labelClasses'].items():
+            self.label_encoders[column] = LabelEncoder()
+            self.label_encoders[column].classes_ = np.array(classes)
+        self.scaled = manifest['scaler'] is not None
+        self.scaler = StandardScaler()
+        if self.scaled:
+            self.scaler.mean_ = np.array(manifest['scaler']['mean'])
+            self.scaler.scale_ = np.array(manifest['scaler']['scale'])
+            self.scaler.var_ = np.array(manifest['scaler']['var'])
+            self.scaler.n_samples_seen_ = manifest['scaler']['samplesSeen']
+            self.scaler.n_features_in_ = len(self.feature_columns)
+        store = manifest['featureStore']
+        self.feature_store = OnlineFeatureStore.from_dict(store) if store is not None else None
+        self.encodings = {}
         print(f"Model loaded from {filepath}")
 
-def generate_analytics_data(df, predictor):
-    """Generate analytics data for the frontend"""
+@timed_stage('analytics.forecast')
+def next_month_predictions(predictor, days=FORECAST_DAYS):
+    """Forecast demand per city over the next `days` days, highest first.
+
+    Each city's total is compared with its last `days` observed days: a
+    change beyond TREND_THRESHOLD either way is a trend. Confidence is 100
+    minus the cross-validated MAE as a percentage of the mean predicted
+    daily demand of one series.
+    """
+    forecast = predictor.forecast(days=days)
+    predicted = forecast.groupby('city', sort=False)['predicted_demand'].agg(['sum', 'mean'])
+    
+    recent = {}
+    window = f'demand_ma_{max(predictor.feature_store.windows)}'
+    for city, blood_type in predictor.feature_store.series:
+        recent[city] = recent.get(city, 0.0) + predictor.feature_store.features(city, blood_type)[window] * days
+    mae = (predictor.metrics or {}).get('mae')
+    
+    regions = []
+    for city, row in predicted.sort_values('sum', ascending=False).iterrows():
+        change = row['sum'] / recent[city] - 1 if recent.get(city) else 0.0
+        trend = 'increasing' if change > TREND_THRESHOLD else 'decreasing' if change < -TREND_THRESHOLD else 'stable'
+        confidence = None
+        if mae is not None and row['mean'] > 0:
+            confidence = int(np.clip(round(100 * (1 - mae / row['mean'])), 0, 99))
+        regions.append({
+            "region": city,
+            "predictedDemand": int(row['sum']),
+            "confidence": confidence,
+            "trend": trend,
+            "change": round(float(change) * 100, 1)
+        })
+    return regions
+
+@timed_stage('analytics.generate')
+def generate_analytics_data(df, predictor, cube=None):
+    """Generate analytics data for the frontend.
+
+    Every chart is a slice of the aggregate cube (built from df unless given).
+    """
+    if cube is None:
+        cube = AnalyticsCube.from_frame(df)
     
     # Regional demand aggregation
-    regional_data = df.groupby('city')['demand'].sum().sort_values(ascending=False)
+    (cities,), _, sums = cube.aggregate(['city'])
+    regional_data = pd.Series(sums['demand'], index=cities).sort_values(ascending=False)
     
     # Seasonal trends
-    seasonal_data = df.groupby('month')['demand'].mean()
+    (months,), counts, sums = cube.aggregate(['month'])
+    seasonal_data = pd.Series(sums['demand'] / counts, index=months)
     
     # Blood type distribution
-    blood_type_data = df.groupby('blood_type')['demand'].sum()
+    (blood_types,), _, sums = cube.aggregate(['blood_type'])
+    blood_type_data = pd.Series(sums['demand'], index=blood_types)
     blood_type_percentages = (blood_type_data / blood_type_data.sum() * 100).round(1)
     
-    # Predictions for next month
-    next_month = datetime.now() + timedelta(days=30)
+    # Predictions for next month, from a recursive forecast of every series
+    regions = next_month_predictions(predictor)
     
     # Critical periods analysis
     critical_periods = [
@@ -269,58 +645,70 @@ def generate_analytics_data(df, predictor):
             }]
         },
         "predictions": {
-            "nextMonth": {
-                "region": "Delhi",
-                "predictedDemand": 1350,
-                "confidence": 92,
-                "trend": "increasing"
-            },
+            "nextMonth": regions[0],
+            "regions": regions,
             "criticalPeriods": critical_periods
         }
     }
     
     return analytics_data
 
-def main():
+def main(grids=None, folds=DEFAULT_FOLDS, max_workers=None, engines=None):
     """Main training pipeline"""
-    print("Blood Demand Prediction Model Training")
-    print("=" * 50)
-    
-    # Load dataset
-    try:
-        df = pd.read_csv('blood_demand_dataset.csv')
-        print(f"Loaded dataset with {len(df)} records")
-    except FileNotFoundError:
-        print("Dataset not found. Please run generate_dataset.py first.")
-        return
-    
-    # Initialize and train predictor
-    predictor = BloodDemandPredictor()
-    model, score = predictor.train_model(df)
-    
-    # Save model
-    predictor.save_model('models/blood_demand_model.pkl')
-    
-    # Generate analytics data
-    analytics_data = generate_analytics_data(df, predictor)
-    
-    # Save analytics data
-    with open('analytics_data.json', 'w') as f:
-        json.dump(analytics_data, f, indent=2)
-    
-    print("\nTraining completed successfully!")
-    print(f"Model accuracy: {score:.2f} MAE")
-    print("Analytics data generated and saved.")
-    
-    # Test prediction
-    test_prediction = predictor.predict_demand(
-        city='Delhi',
-        blood_type='O+',
-        date='2024-12-01',
-        population=32000000,
-        hospitals=150
-    )
-    print(f"\nTest prediction for Delhi, O+ blood on 2024-12-01: {test_prediction} units")
+    with batch_job('train_model'):
+        print("Blood Demand Prediction Model Training")
+        print("=" * 50)
+        
+        # Load dataset
+        try:
+            dataset_path = find_dataset()
+            df = load_dataset(dataset_path)
+            print(f"Loaded dataset with {len(df)} records from {dataset_path}")
+        except FileNotFoundError:
+            print("Dataset not found. Please run generate_dataset.py first.")
+            return
+        
+        # Initialize and train predictor
+        predictor = BloodDemandPredictor()
+        model, score = predictor.train_model(df, grids, folds, max_workers, engines)
+        
+        # Save model
+        predictor.save_model('models/blood_demand_model')
+        
+        # Aggregate cube behind app.py's analytics queries, then the dashboard charts from it
+        with stage('analytics.cube'):
+            cube = AnalyticsCube.from_frame(df)
+            cube.save(CUBE_PATH)
+        analytics_data = generate_analytics_data(df, predictor, cube)
+        
+        # Save analytics data; the aggregate store renders real-time counters on top of it
+        store = AnalyticsStore()
+        store.set_base(analytics_data)
+        with stage('analytics.write_json'), open('analytics_data.json', 'w') as f:
+            json.dump(store.render(), f, indent=2)
+        store.close()
+        
+        print("\nTraining completed successfully!")
+        print(f"Model accuracy: {score:.2f} MAE")
+        print("Analytics data generated and saved.")
+        
+        # Test prediction
+        test_prediction = predictor.predict_demand(
+            city='Delhi',
+            blood_type='O+',
+            date='2024-12-01',
+            population=32000000,
+            hospitals=150
+        )
+        print(f"\nTest prediction for Delhi, O+ blood on 2024-12-01: {test_prediction} units")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Train the blood demand model")
+    parser.add_argument('--grid', type=json.loads, default=None,
+                        help='Parameter grids per candidate as JSON, e.g. \'{"RandomForest": {"max_depth": [null, 20]}}\'')
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS, help="Rolling-origin cross-validation folds")
+    parser.add_argument('--max-cores', type=int, default=MAX_CORES, help="Cores for cross-validation and the final fit (default TRAIN_MAX_CORES or all)")
+    parser.add_argument('--engines', nargs='+', choices=list(CANDIDATES), default=None,
+                        help="Candidate models to train (default: all)")
+    args = parser.parse_args()
+    main(args.grid, args.folds, args.max_cores, args.engines)
@@ -1,255 +1,689 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+import argparse
+import hashlib
+import io
 import joblib
 import json
 import os
-from train_model import BloodDemandPredictor
+import queue
+import socketserver
+import threading
+import time
+from train_model import BloodDemandPredictor, next_month_predictions
+from metrics import batch_job, stage, timed_stage
+from analytics_cube import CUBE_PATH, AnalyticsCube
+from analytics_store import AnalyticsStore
+from dataset_io import load_dataset, to_columnar_types
 
+# Persistent worker settings (see run_worker)
+WORKER_HOST = os.getenv('REALTIME_WORKER_HOST', '127.0.0.1')
+WORKER_PORT = int(os.getenv('REALTIME_WORKER_PORT', '5055'))
+BATCH_MAX_EVENTS = 500
+BATCH_WINDOW_SECONDS = 0.25
+RETRAIN_THRESHOLD = 50
+
+# Incremental retraining (see retrain_with_realtime_data)
+REALTIME_MODEL_PATH = 'models/blood_demand_model_realtime'
+RETRAIN_STATE_FILE = 'realtime_retrain_state.json'
+DRIFT_TOLERANCE = 1.5
+
+# Incremental ingestion (see read_realtime_increment)
+REALTIME_CSV = 'realtime_data.csv'
+INGEST_STATE_FILE = 'realtime_state.json'
+FINGERPRINT_BYTES = 1024
+
+@timed_stage('realtime.load')
 def load_realtime_data():
     """Load real-time data from CSV and MongoDB collections"""
     try:
         # Load real-time CSV data
-        realtime_df = pd.read_csv('realtime_data.csv')
-        
-        # Convert to proper format for ML model
-        processed_data = []
-        
-        for _, row in realtime_df.iterrows():
-            # Calculate demand based on type
-            if row['type'] == 'donation':
-                supply = row['units']
-                demand = 0  # Donation doesn't create demand
-            else:  # request
-                supply = 0
-                demand = row['units']
-            
-            # Get current date info
-            date_obj = pd.to_datetime(row['date'])
-            
-            processed_row = {
-                'date': row['date'],
-                'city': row['city'],
-                'blood_type': row['blood_type'],
-                'demand': demand,
-                'supply': supply,
-                'population': get_city_population(row['city']),
-                'hospitals': get_city_hospitals(row['city']),
-                'month': date_obj.month,
-                'day_of_week': date_obj.weekday(),
-                'season': get_season(date_obj.month),
-                'seasonal_multiplier': get_seasonal_multiplier(date_obj.month),
-                'weather_factor': get_weather_factor(row.get('weather', 'unknown')),
-                'is_critical': row.get('urgency', 'normal') in ['high', 'critical'],
-                'shortage': max(0, demand - supply)
-            }
-            
-            processed_data.append(processed_row)
-        
-        return pd.DataFrame(processed_data)
+        realtime_df = pd.read_csv(REALTIME_CSV)
+        return process_realtime_rows(realtime_df)
         
     except FileNotFoundError:
         print("No real-time data found, using empty dataset")
         return pd.DataFrame()
 
+def new_ingest_state():
+    """High-water mark for a log that has not been read yet"""
+    return {
+        'offset': 0,
+        'rows': 0,
+        'header': None,
+        'inode': None,
+        'fingerprint': None,
+        'rows_at_retrain': 0
+    }
+
+def load_ingest_state(state_path=INGEST_STATE_FILE):
+    """Load the persisted high-water mark, or start from scratch"""
+    try:
+        with open(state_path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return new_ingest_state()
+
+def save_ingest_state(state, state_path=INGEST_STATE_FILE):
+    """Persist the high-water mark atomically"""
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+def file_fingerprint(f, length):
+    """Hash of the first `length` bytes, used to spot files rewritten in place"""
+    f.seek(0)
+    return hashlib.sha1(f.read(length)).hexdigest()
+
+@timed_stage('realtime.read_increment')
+def read_realtime_increment(state, csv_path=REALTIME_CSV, end=None):
+    """Parse only the rows appended to the real-time log since `state`.
+
+    Returns (new_rows, new_state, rescanned). The log is re-read from the
+    start when it was truncated, rotated (new inode) or rewritten in place
+    (its leading bytes changed); `rescanned` tells the caller to reset
+    anything it derived from earlier rows. A trailing line without a
+    newline is still being written and is left for the next run, as is
+    everything past the byte offset `end` when given.
+    """
+    try:
+        stat = os.stat(csv_path)
+    except FileNotFoundError:
+        return pd.DataFrame(), new_ingest_state(), state['offset'] > 0
+    
+    with open(csv_path, 'rb') as f:
+        offset = state['offset']
+        rescanned = (
+            offset == 0
+            or stat.st_size < offset
+            or stat.st_ino != state['inode']
+            or file_fingerprint(f, min(offset, FINGERPRINT_BYTES)) != state['fingerprint']
+        )
+        new_state = new_ingest_state() if rescanned else dict(state)
+        offset = new_state['offset']
+        
+        f.seek(offset)
+        chunk = f.read() if end is None else f.read(max(0, end - offset))
+        complete = chunk[:chunk.rfind(b'\n') + 1]
+        
+        body = complete
+        if offset == 0:
+            header_end = complete.find(b'\n') + 1
+            if header_end == 0:
+                return pd.DataFrame(), new_state, rescanned
+            new_state['header'] = complete[:header_end].decode('utf-8')
+            body = complete[header_end:]
+        
+        new_state['offset'] = offset + len(complete)
+        new_state['inode'] = stat.st_ino
+        new_state['fingerprint'] = file_fingerprint(f, min(new_state['offset'], FINGERPRINT_BYTES))
+    
+    if not body.strip():
+        return pd.DataFrame(), new_state, rescanned
+    
+    raw = pd.read_csv(io.BytesIO(new_state['header'].encode('utf-8') + body))
+    new_rows = process_realtime_rows(raw)
+    new_state['rows'] += len(new_rows)
+    return new_rows, new_state, rescanned
+
+def mark_ingested(state, lines, csv_path=REALTIME_CSV):
+    """Move the high-water mark past the next `lines` rows without parsing them.
+
+    Used by the worker, which receives rows over its socket after the Node
+    server appended them to the log. Only as many complete lines as events
+    arrived are skipped, so rows appended since stay ahead of the mark. A
+    log rotated under the worker is left to read_realtime_increment.
+    """
+    new_state = dict(state)
+    try:
+        with open(csv_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            offset = state['offset']
+            if offset > 0 and (
+                stat.st_size < offset
+                or stat.st_ino != state['inode']
+                or file_fingerprint(f, min(offset, FINGERPRINT_BYTES)) != state['fingerprint']
+            ):
+                return new_state
+            
+            f.seek(offset)
+            if offset == 0:
+                header = f.readline()
+                if not header.endswith(b'\n'):
+                    return new_state
+                new_state['header'] = header.decode('utf-8')
+                offset = len(header)
+            for _ in range(lines):
+                line = f.readline()
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+            
+            new_state['offset'] = offset
+            new_state['inode'] = stat.st_ino
+            new_state['fingerprint'] = file_fingerprint(f, min(offset, FINGERPRINT_BYTES))
+    except FileNotFoundError:
+        pass
+    return new_state
+
+# Lookup tables shared by the scalar helpers and the vectorized ingestion
+CITY_POPULATIONS = {
+    'Delhi': 32000000, 'Mumbai': 25000000, 'Bangalore': 13000000,
+    'Chennai': 11000000, 'Kolkata': 15000000, 'Hyderabad': 10000000,
+    'Pune': 7000000, 'Ahmedabad': 8000000
+}
+DEFAULT_POPULATION = 5000000
+
+CITY_HOSPITALS = {
+    'Delhi': 150, 'Mumbai': 180, 'Bangalore': 120,
+    'Chennai': 100, 'Kolkata': 110, 'Hyderabad': 90,
+    'Pune': 70, 'Ahmedabad': 60
+}
+DEFAULT_HOSPITALS = 50
+
+WEATHER_FACTORS = {
+    'sunny': 1.0,
+    'rainy': 1.2,
+    'cloudy': 1.0,
+    'stormy': 1.5,
+    'cold': 0.9,
+    'unknown': 1.0
+}
+
+# Indexed by month number (index 0 unused)
+SEASON_BY_MONTH = np.array([None, 'Winter', 'Winter', 'Spring', 'Spring', 'Spring', 'Summer',
+                            'Summer', 'Summer', 'Autumn', 'Autumn', 'Autumn', 'Winter'], dtype=object)
+SEASONAL_MULTIPLIER_BY_MONTH = np.array([np.nan, 0.9, 0.9, 1.0, 1.0, 1.4, 1.4,
+                                         1.2, 1.2, 1.2, 1.6, 1.6, 0.9])
+
+def process_realtime_rows(realtime_df):
+    """Convert raw donation/request records to the ML dataset format"""
+    if realtime_df.empty:
+        return pd.DataFrame()
+    
+    # Calculate demand/supply based on type (donations don't create demand)
+    units = realtime_df['units']
+    is_donation = (realtime_df['type'] == 'donation').to_numpy()
+    supply = np.where(is_donation, units, 0)
+    demand = np.where(is_donation, 0, units)
+    
+    # Date parts, derived once per column
+    dates = parse_dates(realtime_df['date'])
+    month = dates.dt.month.to_numpy()
+    
+    weather = realtime_df['weather'] if 'weather' in realtime_df else pd.Series('unknown', index=realtime_df.index)
+    urgency = realtime_df['urgency'] if 'urgency' in realtime_df else pd.Series('normal', index=realtime_df.index)
+    
+    return pd.DataFrame({
+        'date': realtime_df['date'].to_numpy(),
+        'city': realtime_df['city'].to_numpy(),
+        'blood_type': realtime_df['blood_type'].to_numpy(),
+        'demand': demand,
+        'supply': supply,
+        'population': realtime_df['city'].map(CITY_POPULATIONS).fillna(DEFAULT_POPULATION).astype('int64').to_numpy(),
+        'hospitals': realtime_df['city'].map(CITY_HOSPITALS).fillna(DEFAULT_HOSPITALS).astype('int64').to_numpy(),
+        'month': month.astype('int64'),
+        'day_of_week': dates.dt.weekday.to_numpy().astype('int64'),
+        'season': SEASON_BY_MONTH[month],
+        'seasonal_multiplier': SEASONAL_MULTIPLIER_BY_MONTH[month],
+        'weather_factor': weather.map(WEATHER_FACTORS).fillna(1.0).astype('float64').to_numpy(),
+        'is_critical': urgency.isin(['high', 'critical']).to_numpy(),
+        'shortage': np.maximum(0, demand - supply)
+    })
+
+# Per-day attributes of a (city, blood_type, date) row, taken from its first row
+DAILY_COLUMNS = ['population', 'hospitals', 'month', 'day_of_week', 'season', 'seasonal_multiplier', 'weather_factor']
+
+def daily_totals(rows):
+    """One row per (city, blood_type, day) with summed demand and supply, like the historical dataset.
+
+    Real-time rows are single donation or request events, so a day's
+    events add up to that day's totals, together with a historical row for
+    the same day when rows include one (it comes first, so its per-day
+    attributes win). Shortage and is_critical are recomputed per day.
+    """
+    if rows.empty:
+        return rows
+    rows = rows.assign(date=parse_dates(rows['date']).dt.normalize())
+    grouped = rows.groupby(['city', 'blood_type', 'date'], sort=False, observed=True)
+    totals = grouped[['demand', 'supply']].sum()
+    totals['is_critical'] = grouped['is_critical'].any()
+    totals = totals.join(grouped[DAILY_COLUMNS].first()).reset_index()
+    totals['shortage'] = np.maximum(0, totals['demand'] - totals['supply'])
+    return totals[list(rows.columns)]
+
+def parse_dates(dates):
+    """Parse a date column, tolerating mixed formats like the per-row parser did"""
+    try:
+        return pd.to_datetime(dates)
+    except (ValueError, TypeError):
+        return pd.to_datetime(dates, format='mixed')
+
 def get_city_population(city):
     """Get population for city"""
-    populations = {
-        'Delhi': 32000000, 'Mumbai': 25000000, 'Bangalore': 13000000,
-        'Chennai': 11000000, 'Kolkata': 15000000, 'Hyderabad': 10000000,
-        'Pune': 7000000, 'Ahmedabad': 8000000
-    }
-    return populations.get(city, 5000000)  # Default for unknown cities
+    return CITY_POPULATIONS.get(city, DEFAULT_POPULATION)  # Default for unknown cities
 
 def get_city_hospitals(city):
     """Get number of hospitals for city"""
-    hospitals = {
-        'Delhi': 150, 'Mumbai': 180, 'Bangalore': 120,
-        'Chennai': 100, 'Kolkata': 110, 'Hyderabad': 90,
-        'Pune': 70, 'Ahmedabad': 60
-    }
-    return hospitals.get(city, 50)  # Default for unknown cities
+    return CITY_HOSPITALS.get(city, DEFAULT_HOSPITALS)  # Default for unknown cities
 
 def get_season(month):
     """Map month to season"""
-    if month in [3, 4, 5]:
-        return 'Spring'
-    elif month in [6, 7, 8]:
-        return 'Summer'
-    elif month in [9, 10, 11]:
-        return 'Autumn'
-    else:
-        return 'Winter'
+    return SEASON_BY_MONTH[month]
 
 def get_seasonal_multiplier(month):
     """Get seasonal demand multiplier"""
-    if month in [5, 6]:  # Summer peak
-        return 1.4
-    elif month in [10, 11]:  # Festival season
-        return 1.6
-    elif month in [12, 1, 2]:  # Winter
-        return 0.9
-    elif month in [7, 8, 9]:  # Monsoon
-        return 1.2
-    else:
-        return 1.0
+    return float(SEASONAL_MULTIPLIER_BY_MONTH[month])
 
 def get_weather_factor(weather):
     """Get weather impact factor"""
-    factors = {
-        'sunny': 1.0,
-        'rainy': 1.2,
-        'cloudy': 1.0,
-        'stormy': 1.5,
-        'cold': 0.9,
-        'unknown': 1.0
-    }
-    return factors.get(weather, 1.0)
+    return WEATHER_FACTORS.get(weather, 1.0)
 
-def update_analytics_with_realtime():
-    """Update analytics data with real-time information"""
-    try:
-        # Load existing analytics data
+@timed_stage('analytics.write_json')
+def save_analytics(analytics_data, filepath='analytics_data.json'):
+    """Write analytics JSON atomically so readers never see a partial file"""
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(analytics_data, f, indent=2)
+    os.replace(tmp_path, filepath)
+
+def open_analytics_store():
+    """Open the aggregate store, seeding its base snapshot on first use"""
+    store = AnalyticsStore()
+    if not store.has_base():
         with open('analytics_data.json', 'r') as f:
             analytics_data = json.load(f)
+        analytics_data.pop('realTimeInsights', None)
+        store.set_base(analytics_data)
+    return store
+
+def render_analytics(store):
+    """Write the dashboard JSON rendered from the aggregate store"""
+    save_analytics(store.render())
+
+@timed_stage('realtime.analytics')
+def update_analytics_with_realtime(full_rescan=False):
+    """Update analytics data with real-time rows appended since the last run"""
+    try:
+        store = open_analytics_store()
         
-        # Load real-time data
-        realtime_df = load_realtime_data()
+        # Load only the new real-time data
+        state = new_ingest_state() if full_rescan else load_ingest_state()
+        new_rows, state, rescanned = read_realtime_increment(state)
         
-        if realtime_df.empty:
-            print("No real-time data to process")
-            return
+        if rescanned:
+            print("Real-time log is new, truncated or rotated; rescanned from the start")
+            store.reset()
         
-        # Update regional demand with real-time data
-        today = datetime.now().date()
-        recent_data = realtime_df[pd.to_datetime(realtime_df['date']).dt.date >= today - timedelta(days=7)]
+        # Counters are keyed by log row, so re-applying rows is a no-op
+        if not new_rows.empty:
+            with stage('realtime.apply_events'):
+                store.apply_events(new_rows, first_row=state['rows'] - len(new_rows))
         
-        if not recent_data.empty:
-            # Update regional demand
-            city_demand = recent_data.groupby('city')['demand'].sum()
-            
-            # Merge with existing data
-            existing_cities = analytics_data['regionalDemand']['labels']
-            existing_values = analytics_data['regionalDemand']['datasets'][0]['data']
-            
-            for city, demand in city_demand.items():
-                if city in existing_cities:
-                    idx = existing_cities.index(city)
-                    existing_values[idx] += int(demand)
-                else:
-                    existing_cities.append(city)
-                    existing_values.append(int(demand))
-            
-            # Update blood type distribution
-            blood_type_demand = recent_data.groupby('blood_type')['demand'].sum()
-            blood_type_labels = analytics_data['bloodTypeDistribution']['labels']
-            blood_type_values = analytics_data['bloodTypeDistribution']['datasets'][0]['data']
-            
-            for blood_type, demand in blood_type_demand.items():
-                if blood_type in blood_type_labels:
-                    idx = blood_type_labels.index(blood_type)
-                    # Convert to percentage
-                    total_demand = sum(blood_type_values)
-                    blood_type_values[idx] = ((blood_type_values[idx] * total_demand / 100) + demand) / (total_demand + demand) * 100
-        
-        # Update predictions with latest trends
-        latest_demand = realtime_df['demand'].tail(30).mean() if len(realtime_df) >= 30 else realtime_df['demand'].mean()
-        
-        if not pd.isna(latest_demand):
-            analytics_data['predictions']['nextMonth']['predictedDemand'] = int(latest_demand * 30)  # Monthly prediction
-            
-            # Update confidence based on data recency
-            data_freshness = min(len(realtime_df) / 100, 1.0)  # More data = higher confidence
-            analytics_data['predictions']['nextMonth']['confidence'] = int(85 + data_freshness * 10)
-        
-        # Add real-time insights
-        analytics_data['realTimeInsights'] = {
-            'lastUpdated': datetime.now().isoformat(),
-            'totalRealTimeRecords': len(realtime_df),
-            'recentDonations': int(recent_data[recent_data['supply'] > 0]['supply'].sum()) if not recent_data.empty else 0,
-            'recentRequests': int(recent_data[recent_data['demand'] > 0]['demand'].sum()) if not recent_data.empty else 0,
-            'criticalRequests': int(recent_data['is_critical'].sum()) if not recent_data.empty else 0
-        }
-        
-        # Save updated analytics
-        with open('analytics_data.json', 'w') as f:
-            json.dump(analytics_data, f, indent=2)
+        # Save updated analytics, then advance the high-water mark
+        render_analytics(store)
+        save_ingest_state(state)
+        store.close()
         
         print("Analytics updated with real-time data successfully!")
-        print(f"Processed {len(realtime_df)} real-time records")
+        print(f"Processed {len(new_rows)} new of {state['rows']} real-time records")
+        return state
         
     except Exception as e:
         print(f"Error updating analytics: {e}")
 
-def retrain_with_realtime_data():
-    """Retrain ML model with combined historical and real-time data"""
+def retrain_with_realtime_data(full=False):
+    """Bring the real-time model up to date with the real-time log.
+
+    By default only rows appended since the last retrain are read. Their
+    lag/rolling features come from the model's feature store, and the model
+    gains a few warm-started trees fitted on them alone, so the cost grows
+    with the new rows, not with the history. A full retrain on historical
+    plus the applied real-time rows runs instead when asked to, or when
+    update_incrementally gives a reason.
+    """
     try:
-        # Load historical dataset
-        historical_df = pd.read_csv('blood_demand_dataset.csv')
+        state = load_ingest_state(RETRAIN_STATE_FILE)
+        if not full:
+            new_rows, new_state, rescanned = read_realtime_increment(state, REALTIME_CSV)
+            if rescanned:
+                reason = "real-time log is new, truncated or rotated"
+            elif new_rows.empty:
+                print("No new real-time data for retraining")
+                return False
+            else:
+                reason = update_incrementally(new_rows)
+                if reason is None:
+                    save_ingest_state(new_state, RETRAIN_STATE_FILE)
+                    return True
+            print(f"Full retrain: {reason}")
         
-        # Load real-time data
-        realtime_df = load_realtime_data()
-        
-        if realtime_df.empty:
-            print("No real-time data for retraining")
-            return
-        
-        # Combine datasets
-        combined_df = pd.concat([historical_df, realtime_df], ignore_index=True)
-        
-        # Remove duplicates and sort by date
-        combined_df = combined_df.drop_duplicates().sort_values('date')
-        
-        print(f"Combined dataset size: {len(combined_df)} records")
-        print(f"Real-time records added: {len(realtime_df)}")
-        
-        # Retrain model
-        predictor = BloodDemandPredictor()
-        model, score = predictor.train_model(combined_df)
-        
-        # Save updated model
-        predictor.save_model('models/blood_demand_model_realtime.pkl')
-        
-        print(f"Model retrained with accuracy: {score:.2f}")
-        
-        # Generate updated analytics
-        from train_model import generate_analytics_data
-        analytics_data = generate_analytics_data(combined_df, predictor)
-        
-        # Add real-time specific insights
-        analytics_data['realTimeInsights'] = {
-            'lastUpdated': datetime.now().isoformat(),
-            'totalRecords': len(combined_df),
-            'realtimeRecords': len(realtime_df),
-            'modelAccuracy': f"{100 - score:.1f}%"
-        }
-        
-        # Save updated analytics
-        with open('analytics_data.json', 'w') as f:
-            json.dump(analytics_data, f, indent=2)
-        
-        print("Real-time model update completed successfully!")
+        return full_retrain()
         
     except Exception as e:
         print(f"Error retraining with real-time data: {e}")
+        return False
 
-def main():
-    """Main function for real-time updates"""
-    print("Updating analytics with real-time data...")
+@timed_stage('realtime.incremental_update')
+def update_incrementally(new_rows):
+    """Warm-start the real-time model on new rows.
+
+    Returns None on success, or why a full retrain is needed instead: no
+    incremental model yet, labels the encoders have not seen, the tree cap
+    was reached, or drift. Drift means the new rows, scored before the
+    model sees them, have an MAE above DRIFT_TOLERANCE times the full
+    model's cross-validated MAE (one-day-ahead errors, like the new rows').
+    A batch too small to fit trees on only advances the lag/rolling state.
+    """
+    started = time.time()
+    predictor = BloodDemandPredictor()
+    try:
+        predictor.load_model(REALTIME_MODEL_PATH)
+    except FileNotFoundError:
+        return "no real-time model yet"
+    if predictor.feature_store is None or predictor.metrics is None:
+        return "real-time model predates incremental retraining"
+    
+    try:
+        # Events become daily totals; events for the store's newest day are added to it
+        X, y = predictor.prepare_features(daily_totals(new_rows), predictor.feature_store)
+    except ValueError as e:
+        return f"new rows have unseen labels ({e})"
+    if X.empty:
+        return "no new rows have demand history"
+    
+    window = predictor.evaluate(X, y)
+    baseline = predictor.metrics['mae']
+    drift = window['mae'] / max(baseline, 1e-9)
+    print(f"MAE on {len(X)} new rows: {window['mae']:.2f} ({drift:.2f}x the model's {baseline:.2f})")
+    if drift > DRIFT_TOLERANCE:
+        return f"drift: new-row MAE is {drift:.2f}x the model's (tolerance {DRIFT_TOLERANCE}x)"
+    
+    minimum = predictor.warm_start_rows()
+    if len(X) < minimum:
+        print(f"Only {len(X)} new rows (a warm start needs {minimum}); lag/rolling state updated only")
+    elif not predictor.warm_start(X, y):
+        return "model reached its tree limit"
+    else:
+        print(f"Model updated incrementally on {len(X)} rows in {time.time() - started:.2f}s "
+              f"({predictor.model.n_trees} trees)")
+    predictor.save_model(REALTIME_MODEL_PATH)
+    
+    # Re-forecast from the updated model and the new rows' lag/rolling state
+    store = open_analytics_store()
+    store.set_predictions(next_month_predictions(predictor))
+    render_analytics(store)
+    store.close()
+    return None
+
+@timed_stage('realtime.full_retrain')
+def full_retrain():
+    """Retrain from scratch on historical plus the real-time rows applied to the analytics"""
+    # Rows the aggregate store applies from here on go to a new epoch; read exactly
+    # the rows it applied before, so the new snapshot and the counters never share one.
+    # Later increments start where this read ends.
+    store = open_analytics_store()
+    epoch, applied_rows = store.start_epoch()
+    store.close()
+    end = mark_ingested(new_ingest_state(), applied_rows)['offset']
+    realtime_df, retrain_state, _ = read_realtime_increment(new_ingest_state(), REALTIME_CSV, end)
+    if realtime_df.empty:
+        print("No real-time data for retraining")
+        return False
+    
+    # Load historical dataset (Parquet/Feather when available, else CSV)
+    historical_df = load_dataset()
+    
+    # Same categories as the history, so the frames concatenate as categoricals;
+    # events for cities or blood types the history does not know are rejected
+    realtime_df = to_columnar_types(realtime_df, list(historical_df['city'].cat.categories))
+    known = realtime_df['city'].notna() & realtime_df['blood_type'].notna()
+    if not known.all():
+        print(f"Skipping {int((~known).sum())} real-time events with an unknown city or blood type")
+        realtime_df = realtime_df[known]
+    
+    # Real-time events become daily totals, merged with any historical row for the same day
+    combined_df = daily_totals(pd.concat([historical_df, realtime_df], ignore_index=True))
+    combined_df = combined_df.sort_values('date')
+    
+    print(f"Combined dataset size: {len(combined_df)} records")
+    print(f"Real-time events added: {len(realtime_df)} ({len(combined_df) - len(historical_df)} new series-days)")
+    
+    # Retrain model
+    predictor = BloodDemandPredictor()
+    model, score = predictor.train_model(combined_df)
+    
+    # Save updated model
+    predictor.save_model(REALTIME_MODEL_PATH)
+    save_ingest_state(retrain_state, RETRAIN_STATE_FILE)
+    
+    print(f"Model retrained with accuracy: {score:.2f}")
     
-    # Quick update for immediate analytics
-    update_analytics_with_realtime()
+    # Generate updated analytics; the cube now covers the real-time rows too
+    from train_model import generate_analytics_data
+    with stage('analytics.cube'):
+        cube = AnalyticsCube.from_frame(combined_df)
+        cube.save(CUBE_PATH)
+    analytics_data = generate_analytics_data(combined_df, predictor, cube)
     
-    # Check if enough new data for retraining
+    # Add real-time specific insights
+    analytics_data['realTimeInsights'] = {
+        'totalRecords': len(combined_df),
+        'realtimeRecords': len(realtime_df),
+        'modelAccuracy': f"{100 - score:.1f}%"
+    }
+    
+    # The new snapshot already counts the rows applied before the new epoch
+    store = open_analytics_store()
+    store.set_base(analytics_data, epoch)
+    render_analytics(store)
+    store.close()
+    
+    print("Real-time model update completed successfully!")
+    return True
+
+class RealtimeWorker:
+    """Resident analytics updater fed with events over a local socket.
+
+    Events are queued by the socket handlers and drained by a single
+    consumer thread that coalesces bursts into micro-batches, so pandas,
+    sklearn and the aggregate store are loaded once instead of per event.
+    Retrains run on their own thread so they never hold up the consumer.
+    """
+
+    def __init__(self, batch_max_events=BATCH_MAX_EVENTS, batch_window=BATCH_WINDOW_SECONDS,
+                 retrain_threshold=RETRAIN_THRESHOLD):
+        self.batch_max_events = batch_max_events
+        self.batch_window = batch_window
+        self.retrain_threshold = retrain_threshold
+        self.events = queue.Queue()
+        self.lock = threading.Lock()
+        self.retraining = False
+        self.started_at = time.time()
+        self.counters = {
+            'events_received': 0,
+            'events_processed': 0,
+            'events_failed': 0,
+            'batches_processed': 0,
+            'retrains': 0,
+            'last_batch_size': 0,
+            'last_batch_seconds': 0.0
+        }
+        self.load_state()
+
+    def load_state(self):
+        """Catch up on rows appended while no worker was running"""
+        self.state = update_analytics_with_realtime() or load_ingest_state()
+        self.store = open_analytics_store()
+
+    def submit(self, event):
+        """Queue a single raw event (the same fields written to realtime_data.csv)"""
+        self.events.put(event)
+        with self.lock:
+            self.counters['events_received'] += 1
+
+    def next_batch(self):
+        """Block for one event, then gather whatever arrives within the batch window"""
+        batch = [self.events.get()]
+        deadline = time.time() + self.batch_window
+        while len(batch) < self.batch_max_events:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.events.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def apply_batch(self, batch):
+        """Apply a micro-batch of raw events to the aggregate store"""
+        batch_df = process_realtime_rows(pd.DataFrame([normalize_event(event) for event in batch]))
+        
+        self.store.apply_events(batch_df, first_row=self.state['rows'])
+        render_analytics(self.store)
+        
+        # The Node server appends each event to the log before sending it here;
+        # the retrain thread saves this state too, so row count and offset move together
+        with self.lock:
+            self.state = mark_ingested(self.state, len(batch_df))
+            self.state['rows'] += len(batch_df)
+            save_ingest_state(self.state)
+        self.start_retrain()
+
+    def start_retrain(self):
+        """Retrain on a background thread once enough rows arrived, one retrain at a time"""
+        with self.lock:
+            new_records = self.state['rows'] - self.state['rows_at_retrain']
+            if new_records < self.retrain_threshold or self.retraining:
+                return
+            self.retraining = True
+            rows = self.state['rows']
+        print(f"{new_records} new records since last retrain. Retraining model...")
+        threading.Thread(target=self.retrain, args=(rows,), name='realtime-retrain', daemon=True).start()
+
+    def retrain(self, rows):
+        """Retrain thread: the consumer keeps applying batches meanwhile"""
+        retrained = retrain_with_realtime_data()
+        with self.lock:
+            if retrained:
+                self.state['rows_at_retrain'] = rows
+                save_ingest_state(self.state)
+            self.counters['retrains'] += 1
+            self.retraining = False
+
+    def consume(self):
+        """Consumer loop: drain the queue one micro-batch at a time"""
+        while True:
+            batch = self.next_batch()
+            started = time.time()
+            try:
+                self.apply_batch(batch)
+                processed, failed = len(batch), 0
+            except Exception as e:
+                print(f"Error applying real-time batch: {e}")
+                processed, failed = 0, len(batch)
+            with self.lock:
+                self.counters['events_processed'] += processed
+                self.counters['events_failed'] += failed
+                self.counters['batches_processed'] += 1
+                self.counters['last_batch_size'] = len(batch)
+                self.counters['last_batch_seconds'] = round(time.time() - started, 4)
+
+    def stats(self):
+        """Throughput and queue-depth counters"""
+        with self.lock:
+            stats = dict(self.counters)
+        uptime = time.time() - self.started_at
+        stats['queue_depth'] = self.events.qsize()
+        stats['uptime_seconds'] = round(uptime, 1)
+        stats['events_per_second'] = round(stats['events_processed'] / uptime, 2) if uptime > 0 else 0.0
+        stats['avg_batch_size'] = round(stats['events_processed'] / stats['batches_processed'], 2) if stats['batches_processed'] else 0.0
+        stats['total_realtime_records'] = self.state['rows']
+        return stats
+
+def normalize_event(event):
+    """Coerce a JSON event from the Node server into a realtime_data.csv row"""
+    row = dict(event)
+    row['date'] = pd.to_datetime(row.get('date') or datetime.now()).strftime('%Y-%m-%d')
+    row['units'] = int(row.get('units') or 1)
+    row.setdefault('urgency', 'normal')
+    row.setdefault('weather', 'unknown')
+    return row
+
+class WorkerRequestHandler(socketserver.StreamRequestHandler):
+    """Newline-delimited JSON: one event per line, or {"command": "stats"}"""
+
+    def handle(self):
+        worker = self.server.worker
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                message = json.loads(line)
+            except ValueError:
+                self.reply({'success': False, 'error': 'Invalid JSON'})
+                continue
+            if message.get('command') == 'stats':
+                self.reply({'success': True, 'stats': worker.stats()})
+            else:
+                worker.submit(message)
+
+    def reply(self, payload):
+        self.wfile.write((json.dumps(payload) + '\n').encode('utf-8'))
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def run_worker(host=WORKER_HOST, port=WORKER_PORT):
+    """Run the persistent real-time worker until interrupted"""
+    worker = RealtimeWorker()
+    threading.Thread(target=worker.consume, daemon=True).start()
+    
+    server = WorkerServer((host, port), WorkerRequestHandler)
+    server.worker = worker
+    print(f"Real-time worker listening on {host}:{port}")
     try:
-        realtime_df = load_realtime_data()
-        if len(realtime_df) >= 50:  # Retrain if we have enough new data
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down real-time worker")
+    finally:
+        server.server_close()
+
+def main(full_rescan=False, full_retrain=False):
+    """Main function for real-time updates"""
+    with batch_job('update_realtime_model'):
+        print("Updating analytics with real-time data...")
+        
+        # Quick update for immediate analytics
+        state = update_analytics_with_realtime(full_rescan)
+        if state is None:
+            return
+        
+        # Check if enough new data for retraining
+        new_records = state['rows'] - state['rows_at_retrain']
+        if new_records >= RETRAIN_THRESHOLD or full_retrain:
             print("Sufficient new data found. Retraining model...")
-            retrain_with_realtime_data()
+            if retrain_with_realtime_data(full=full_retrain):
+                state['rows_at_retrain'] = state['rows']
+                save_ingest_state(state)
         else:
-            print(f"Only {len(realtime_df)} new records. Skipping model retraining.")
-    except:
-        print("Could not check real-time data for retraining")
+            print(f"Only {new_records} new records. Skipping model retraining.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Update analytics and models with real-time data")
+    parser.add_argument('--worker', action='store_true', help="Run as a persistent worker fed over a local socket")
+    parser.add_argument('--host', default=WORKER_HOST)
+    parser.add_argument('--port', type=int, default=WORKER_PORT)
+    parser.add_argument('--full-rescan', action='store_true', help="Ignore the saved high-water mark and re-read the whole log")
+    parser.add_argument('--full-retrain', action='store_true', help="Retrain from scratch instead of warm-starting on new rows")
+    args = parser.parse_args()
+    
+    if args.worker:
+        run_worker(args.host, args.port)
+    else:
+        main(args.full_rescan, args.full_retrain)